@@ -0,0 +1,82 @@
+'''
+Measure HTTPHandler's parser, without a network.
+
+Each case is a message delivered to on_data in reads of a fixed size
+(as recv would deliver it):
+
+    get      - small GET requests, several per read
+    post     - a 1 MB POST with Content-Length, in 64K reads
+    chunked  - a 1 MB response in 1K chunks, in 64K reads
+
+    python -m bench.http_parse --repeat 3
+'''
+import time
+
+from rhc.httphandler import HTTPHandler
+
+
+class Parser(HTTPHandler):
+
+    def __init__(self):
+        super(Parser, self).__init__(None)
+        self.messages = 0
+
+    def on_http_data(self):
+        self.messages += 1
+
+
+GET = (
+    'GET /api/v1/things/1234?verbose=true HTTP/1.1\r\n'
+    'Host: localhost:8080\r\n'
+    'User-Agent: bench/1.0\r\n'
+    'Accept: application/json\r\n'
+    'Accept-Encoding: gzip, deflate\r\n'
+    'Connection: keep-alive\r\n'
+    '\r\n'
+)
+
+
+def post(size):
+    return 'POST /upload HTTP/1.1\r\nHost: localhost\r\nContent-Length: %d\r\n\r\n%s' % (size, 'x' * size)
+
+
+def chunked(size, chunk):
+    body = ''.join('%x\r\n%s\r\n' % (chunk, 'x' * chunk) for _ in range(size / chunk))
+    return 'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n%s0\r\n\r\n' % body
+
+
+def reads(message, size):
+    return [message[i:i + size] for i in range(0, len(message), size)]
+
+
+def run(data, count):
+    ''' return (messages per second, MB per second) '''
+    total = sum(len(d) for d in data) * count
+    start = time.time()
+    for _ in range(count):
+        parser = Parser()
+        for d in data:
+            parser.on_data(d)
+    elapsed = time.time() - start
+    return parser.messages * count / elapsed, total / elapsed / 1000000.0
+
+
+if __name__ == '__main__':
+    import argparse
+
+    aparser = argparse.ArgumentParser(
+        description='measure http parsing speed',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    aparser.add_argument('--repeat', type=int, default=3, help='number of runs per case')
+    args = aparser.parse_args()
+
+    cases = (
+        ('get', reads(GET * 100, 4096), 100),
+        ('post', reads(post(1024 * 1024), 65536), 20),
+        ('chunked', reads(chunked(1024 * 1024, 1024), 65536), 10),
+    )
+    for name, data, count in cases:
+        for _ in range(args.repeat):
+            messages, rate = run(data, count)
+            print '%-8s %10.1f messages/s %8.1f MB/s' % (name, messages, rate)
@@ -0,0 +1,83 @@
+'''
+Measure HTTPHandler.send_server for small responses, without a network.
+
+The bytes that would be written to the socket are counted and dropped.
+
+    small    - a short json response with a Content-Type header
+    headers  - the same, with a few more response headers
+    block    - the same, with the extra headers serialized once (as a
+               RESTMapper route's headers are)
+
+    python -m bench.http_send --repeat 3
+'''
+import time
+
+from rhc.httphandler import HTTPHandler, serialize_headers
+from rhc.tcpsocket import BasicHandler
+
+
+class Sink(BasicHandler):
+
+    def send(self, data):
+        self.sent += len(data)
+
+    def send_buffers(self, buffers):
+        self.sent += sum(len(b) for b in buffers)
+
+
+class Sender(HTTPHandler, Sink):
+
+    def __init__(self):
+        super(Sender, self).__init__(None)
+        self.sent = 0
+
+
+CONTENT = '{"id": 1234, "name": "thing", "ok": true}'
+HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Frame-Options': 'DENY',
+    'X-Content-Type-Options': 'nosniff',
+    'Server': 'rhc',
+}
+
+
+def small(sender):
+    sender.send_server(CONTENT, headers={'Content-Type': 'application/json; charset=utf-8'})
+
+
+def headers(sender):
+    h = dict(HEADERS)
+    h['Content-Type'] = 'application/json; charset=utf-8'
+    sender.send_server(CONTENT, headers=h)
+
+
+BLOCK = serialize_headers(HEADERS)
+
+
+def block(sender):
+    sender.send_server(CONTENT, headers={'Content-Type': 'application/json; charset=utf-8'}, header_block=BLOCK)
+
+
+def run(case, count):
+    ''' return responses per second '''
+    sender = Sender()
+    start = time.time()
+    for _ in xrange(count):
+        case(sender)
+    return count / (time.time() - start)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    aparser = argparse.ArgumentParser(
+        description='measure http response header serialization speed',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    aparser.add_argument('--count', type=int, default=100000, help='responses per run')
+    aparser.add_argument('--repeat', type=int, default=3, help='number of runs per case')
+    args = aparser.parse_args()
+
+    for name, case in (('small', small), ('headers', headers), ('block', block)):
+        for _ in range(args.repeat):
+            print '%-8s %10.1f responses/s' % (name, run(case, args.count))
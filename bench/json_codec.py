@@ -0,0 +1,66 @@
+'''
+Measure time spent in JSON encoding and decoding, per path.
+
+A typical REST document is encoded and decoded on each path, --count
+times, with the CODEC configured as the standard library default, compact,
+and (if installed) a plugged-in library named with --plugin.
+
+RESTResult ('rest.response') and async's _Context ('request.content') are
+constructed as they are when serving and connecting. The paths that need a
+connection or a database ('rest.request', 'connect.request',
+'connect.response', 'dao.save', 'dao.load') call the CODEC directly, with
+the same document and path name as the code that uses them.
+
+    python -m bench.json_codec --count 20000 --plugin ujson
+'''
+from rhc import jsoncodec
+from rhc.async import _Context
+from rhc.jsoncodec import CODEC
+from rhc.resthandler import RESTResult
+
+
+DOCUMENT = {
+    'id': 12345,
+    'name': 'a thing with a name',
+    'tags': ['one', 'two', 'three'],
+    'items': [{'sku': 'abc%d' % i, 'price': i * 1.25, 'active': i % 2 == 0} for i in range(20)],
+}
+
+
+def run(count):
+    ''' return {path: microseconds per call} '''
+    text = jsoncodec.dumps(DOCUMENT)
+    CODEC.start_timing()
+    for _ in xrange(count):
+        RESTResult(content=DOCUMENT)
+        CODEC.loads(text, 'rest.request')
+        CODEC.dumps(DOCUMENT, 'connect.request')
+        CODEC.loads(text, 'connect.response')
+        _Context('localhost', '/', None, DOCUMENT, None, 'POST', 5.0, False, False, None, None)
+        CODEC.dumps(DOCUMENT, 'dao.save')
+        CODEC.loads(text, 'dao.load')
+    times = CODEC.stop_timing()
+    return dict((path, seconds / calls * 1000000) for path, (calls, seconds) in times.items())
+
+
+if __name__ == '__main__':
+    import argparse
+
+    aparser = argparse.ArgumentParser(
+        description='measure json codec cost per path',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    aparser.add_argument('--count', type=int, default=20000, help='documents per measurement')
+    aparser.add_argument('--plugin', help='module with dumps and loads (eg, ujson)')
+    args = aparser.parse_args()
+
+    configs = [('default', {}), ('compact', dict(compact=True))]
+    if args.plugin:
+        configs.append((args.plugin, dict(dumps=args.plugin + '.dumps', loads=args.plugin + '.loads')))
+
+    print '%-10s %-16s %10s' % ('codec', 'path', 'us/call')
+    for name, kwargs in configs:
+        jsoncodec.configure(**kwargs)
+        for path, us in sorted(run(args.count).items()):
+            print '%-10s %-16s %10.2f' % (name, path, us)
+    jsoncodec.configure()
@@ -0,0 +1,112 @@
+'''
+Compare tcpsocket pollers under a mostly-idle connection load.
+
+A loopback echo server is loaded with a number of idle connections (which
+never send anything) and a smaller number of active connections (which
+ping-pong a small message as fast as possible). The number of round trips
+completed in a fixed period is reported for each poller.
+
+    python -m bench.poller --idle 10000 --active 1000 --duration 5
+
+Note: each connection uses two file descriptors (client and server side),
+so the open file limit must be large enough; the script attempts to raise
+the soft limit to the hard limit.
+'''
+import resource
+import select
+import time
+
+import rhc.tcpsocket as network
+
+
+class EchoServer(network.BasicHandler):
+
+    def on_data(self, data):
+        self.send(data)
+
+
+class IdleClient(network.BasicHandler):
+
+    def on_ready(self):
+        self.is_ready = True
+
+
+class ActiveClient(network.BasicHandler):
+
+    MESSAGE = b'x' * 64
+
+    def on_ready(self):
+        self.is_ready = True
+        self.round_trips = 0
+        self.send(self.MESSAGE)
+
+    def on_data(self, data):
+        self.round_trips += 1
+        self.send(data)
+
+
+def raise_file_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+def open_connections(server, port, handler, count, batch=100):
+    connections = []
+    while len(connections) < count:
+        group = [server.add_connection(('127.0.0.1', port), handler) for _ in range(min(batch, count - len(connections)))]
+        while not all(getattr(c, 'is_ready', False) or c.closed for c in group):
+            server.service(.01, max_iterations=1)
+        connections.extend(group)
+    return connections
+
+
+def run(poller, port, idle, active, duration):
+    server = network.Server(poller())
+    server.add_server(port, EchoServer)
+
+    idle_connections = open_connections(server, port, IdleClient, idle)
+    active_connections = open_connections(server, port, ActiveClient, active)
+    for c in active_connections:
+        c.round_trips = 0
+
+    iterations = 0
+    start = time.time()
+    while time.time() - start < duration:
+        server._service(.01)
+        iterations += 1
+    elapsed = time.time() - start
+
+    round_trips = sum(c.round_trips for c in active_connections)
+    closed = len([c for c in idle_connections + active_connections if c.closed])
+    server.close()
+    return round_trips / elapsed, iterations / elapsed, closed
+
+
+if __name__ == '__main__':
+    import argparse
+
+    aparser = argparse.ArgumentParser(
+        description='compare tcpsocket pollers',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    aparser.add_argument('--port', type=int, default=12345, help='listening port')
+    aparser.add_argument('--idle', type=int, default=10000, help='number of idle connections')
+    aparser.add_argument('--active', type=int, default=1000, help='number of active connections')
+    aparser.add_argument('--duration', type=float, default=5.0, help='seconds to run each poller')
+    args = aparser.parse_args()
+
+    limit = raise_file_limit()
+    needed = (args.idle + args.active) * 2 + 10
+    if limit < needed:
+        raise SystemExit('open file limit is %d; need at least %d' % (limit, needed))
+
+    pollers = [('poll', network.PollPoller)]
+    if hasattr(select, 'epoll'):
+        pollers.append(('epoll', network.EPollPoller))
+
+    print 'idle=%d, active=%d, duration=%.1fs' % (args.idle, args.active, args.duration)
+    for name, poller in pollers:
+        rate, loops, closed = run(poller, args.port, args.idle, args.active, args.duration)
+        print '%-6s round trips/s=%10.1f  loop iterations/s=%8.1f  unexpected closes=%d' % (name, rate, loops, closed)
@@ -0,0 +1,74 @@
+'''
+Measure loopback upload throughput through BasicHandler's read path.
+
+A client sends a fixed amount of data to a server which counts the bytes
+it receives. The upload is timed with the legacy read settings (one
+1024 byte read per wakeup) and with the defaults (adaptive read size,
+drain until empty or RECV_BUDGET).
+
+    python -m bench.recv --size 100 --repeat 3
+'''
+import time
+
+import rhc.tcpsocket as network
+
+
+class Sink(network.BasicHandler):
+
+    def on_init(self):
+        settings = self.context['settings']
+        if settings:
+            self.RECV_LEN, self.MAX_RECV_LEN, self.RECV_BUDGET = settings
+        self.context['handler'] = self
+        self.count = 0
+        self.reads = 0
+
+    def on_data(self, data):
+        self.count += len(data)
+        self.reads += 1
+
+
+class Source(network.BasicHandler):
+
+    CHUNK = b'x' * 65536
+
+    def on_ready(self):
+        self.is_ready = True
+        for _ in range(self.context['size'] / len(self.CHUNK)):
+            self.send(self.CHUNK)
+
+
+def run(port, size, settings):
+    server = network.Server()
+    context = {'settings': settings, 'handler': None}
+    server.add_server(port, Sink, context)
+    server.add_connection(('127.0.0.1', port), Source, {'size': size})
+
+    iterations = 0
+    start = time.time()
+    while context['handler'] is None or context['handler'].count < size:
+        server._service(.1)
+        iterations += 1
+    elapsed = time.time() - start
+    reads = context['handler'].reads
+    server.close()
+    return size / elapsed / 1000000.0, iterations, reads
+
+
+if __name__ == '__main__':
+    import argparse
+
+    aparser = argparse.ArgumentParser(
+        description='measure loopback read throughput',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    aparser.add_argument('--port', type=int, default=12345, help='listening port')
+    aparser.add_argument('--size', type=int, default=100, help='upload size in MB')
+    aparser.add_argument('--repeat', type=int, default=3, help='number of uploads per setting')
+    args = aparser.parse_args()
+
+    size = args.size * 1024 * 1024
+    for name, settings in (('legacy', (1024, 0, 1024)), ('adaptive', None)):
+        for _ in range(args.repeat):
+            rate, iterations, reads = run(args.port, size, settings)
+            print '%-8s %8.1f MB/s  loop iterations=%8d  on_data calls=%8d' % (name, rate, iterations, reads)
@@ -0,0 +1,59 @@
+r'''
+Measure RESTMapper lookups against the number of routes.
+
+Each route is like '/api/v1/thing17/(\d+)$' (GET). Lookups are of the
+first route, the last route and a resource that matches nothing; the
+linear case is the original scan of every mapping's regex in order.
+
+    python -m bench.router --routes 10 100 300
+'''
+import time
+
+from rhc.resthandler import RESTMapper, RESTMapping
+
+
+def mapper(count):
+    m = RESTMapper()
+    for i in range(count):
+        m.add(r'/api/v1/thing%d/(\d+)$' % i, get=i + 1, put=i + 1)
+    m.compile()
+    return m
+
+
+def linear(mappings, resource, method):
+    for mapping in mappings:
+        m = mapping.pattern.match(resource)
+        if m:
+            handler = mapping.method.get(method.lower())
+            if handler:
+                return handler, m.groups()
+    return None, None
+
+
+def run(fn, resource, count):
+    ''' return microseconds per lookup '''
+    start = time.time()
+    for _ in xrange(count):
+        fn(resource, 'GET')
+    return (time.time() - start) / count * 1000000
+
+
+if __name__ == '__main__':
+    import argparse
+
+    aparser = argparse.ArgumentParser(
+        description='measure rest route lookup cost',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    aparser.add_argument('--routes', type=int, nargs='+', default=[10, 100, 300], help='route counts')
+    aparser.add_argument('--count', type=int, default=20000, help='lookups per measurement')
+    args = aparser.parse_args()
+
+    print '%6s %-6s %10s %10s' % ('routes', 'lookup', 'linear us', 'compiled us')
+    for routes in args.routes:
+        m = mapper(routes)
+        mappings = [RESTMapping(r'/api/v1/thing%d/(\d+)$' % i, i + 1, None, i + 1, None) for i in range(routes)]
+        for name, resource in (('first', '/api/v1/thing0/1'), ('last', '/api/v1/thing%d/1' % (routes - 1)), ('miss', '/api/v2/none')):
+            before = run(lambda r, method: linear(mappings, r, method), resource, args.count)
+            after = run(m._match, resource, args.count)
+            print '%6d %-6s %10.2f %10.2f' % (routes, name, before, after)
@@ -0,0 +1,99 @@
+'''
+The MIT License (MIT)
+
+Copyright (c) 2013-2017 Robert H Chase
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+'''
+import math
+import time
+
+from metrics import METRICS
+
+
+_SHED_CONCURRENCY = METRICS.counter('rhc_rest_shed_concurrency', 'requests rejected with 503 (too many in progress)')
+_SHED_RATE = METRICS.counter('rhc_rest_shed_rate', 'requests rejected with 429 (rate limit)')
+
+
+class TokenBucket(object):
+
+    '''
+      Allow rate events per second, with bursts of up to burst events.
+
+      The bucket holds up to burst tokens, and refills at rate tokens per
+      second; an event takes one token.
+    '''
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst) if burst else max(1.0, self.rate)
+        self.tokens = self.burst
+        self._t = time.time()
+
+    def take(self):
+        ''' take a token and return 0, or return the seconds until one is available '''
+        now = time.time()
+        self.tokens = min(self.burst, self.tokens + (now - self._t) * self.rate)
+        self._t = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class Admission(object):
+
+    '''
+      Concurrency and rate limits for a set of requests (a route, or a
+      whole server; see RESTMapper).
+
+      concurrency - maximum number of requests in progress (admitted and
+                    not yet responded to)
+      rate        - maximum requests per second (see TokenBucket)
+      burst       - requests allowed at once, above rate (default: rate)
+
+      admit returns None if the request is admitted, which must be followed
+      by a call to release; otherwise, it returns (code, message,
+      Retry-After) for the rejection: 503 when there are too many
+      requests in progress, and 429 when the rate is exceeded.
+
+      shed counts the requests rejected by this Admission.
+    '''
+    def __init__(self, concurrency=None, rate=None, burst=None, retry_after=1):
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.retry_after = retry_after
+        self.active = 0
+        self.shed = 0
+
+    def admit(self):
+        if self.concurrency is not None and self.active >= self.concurrency:
+            self.shed += 1
+            _SHED_CONCURRENCY.inc()
+            return 503, 'Service Unavailable', str(self.retry_after)
+        if self.bucket:
+            wait = self.bucket.take()
+            if wait:
+                self.shed += 1
+                _SHED_RATE.inc()
+                return 429, 'Too Many Requests', str(int(math.ceil(wait)))
+        self.active += 1
+        return None
+
+    def release(self):
+        self.active -= 1
@@ -22,7 +22,6 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 '''
 import functools
-import json
 import string
 import time
 import types
@@ -32,6 +31,8 @@ from urllib import urlencode
 from urlparse import urlparse
 
 from rhc.httphandler import HTTPHandler
+import rhc.jsoncodec as jsoncodec
+from rhc.loop import Loop
 from rhc.tcpsocket import SERVER
 from rhc.task import Task
 from rhc.timer import TIMERS
@@ -41,7 +42,10 @@ import logging
 log = logging.getLogger(__name__)
 
 
-def connect(callback, url, method='GET', body=None, headers=None, is_json=True, is_debug=False, timeout=5.0, wrapper=None, handler=None, **kwargs):
+MAX_DECOMPRESSED = 100 * 1024 * 1024  # largest decompressed response accepted by ConnectHandler
+
+
+def connect(callback, url, method='GET', body=None, headers=None, is_json=True, is_debug=False, timeout=5.0, wrapper=None, handler=None, compress=False, **kwargs):
     '''
         Make an async rest connection, executing callback on completion
 
@@ -61,6 +65,9 @@ def connect(callback, url, method='GET', body=None, headers=None, is_json=True,
             wrapper - if successful, wrap result in wrapper before callback (default=None)
             handler - handler class for connection (default=None)
                       a subclass of ConnectionHandler with special logic in setup or evaluate
+            compress - if True, send 'Accept-Encoding: gzip, deflate' (default=False)
+                       a compressed response is decoded as it arrives, up to
+                       MAX_DECOMPRESSED bytes
             kwargs - see notes about automatic generation of document body
 
         Notes:
@@ -72,7 +79,7 @@ def connect(callback, url, method='GET', body=None, headers=None, is_json=True,
                header is added.
     '''
     p = _URLParser(url)
-    _connect(callback, url, p.host, p.address, p.port, p.resource, p.is_ssl, method, body, headers, is_json, is_debug, timeout, wrapper, None, handler, False, kwargs)
+    _connect(callback, url, p.host, p.address, p.port, p.resource, p.is_ssl, method, body, headers, is_json, is_debug, timeout, wrapper, None, handler, False, kwargs, compress)
 
 
 def partial(fn):
@@ -166,6 +173,7 @@ class Connection(object):
             handler - handler class for connection
                       a subclass of ConnectionHandler with special logic in setup or evaluate
             headers - dict of headers to be included in all connections
+            compress - if True, ask for (and decode) compressed responses
 
         Notes:
 
@@ -182,7 +190,7 @@ class Connection(object):
                 Connection init.
     '''
 
-    def __init__(self, url, is_json=True, is_debug=False, timeout=5.0, is_form=False, wrapper=None, setup=None, handler=None, headers=None):
+    def __init__(self, url, is_json=True, is_debug=False, timeout=5.0, is_form=False, wrapper=None, setup=None, handler=None, headers=None, compress=False):
         self._url = url
         self._last_url = None
         if not callable(url):
@@ -195,6 +203,7 @@ class Connection(object):
         self.setup = setup
         self.handler = handler
         self.headers = headers
+        self.compress = compress
 
         self.mock = None
 
@@ -338,7 +347,7 @@ class Connection(object):
             return Mock()
         if not self.is_url_parsed:
             return None
-        return _connect(callback, self.url, self.host, self.address, self.port, path, self.is_ssl, method, body, headers, is_json, _is_debug, _timeout, wrapper, setup, handler, _trace, kwargs)
+        return _connect(callback, self.url, self.host, self.address, self.port, path, self.is_ssl, method, body, headers, is_json, _is_debug, _timeout, wrapper, setup, handler, _trace, kwargs, self.compress)
 
     def connect(self, method, callback, path, *args, **kwargs):
         is_json = kwargs.pop('is_json', self.is_json)
@@ -346,21 +355,22 @@ class Connection(object):
         timeout = kwargs.pop('timeout', self.timeout)
         wrapper = kwargs.pop('wrapper', self.wrapper)
         handler = kwargs.pop('handler', self.handler)
+        compress = kwargs.pop('compress', self.compress)
 
         url = self.url + path
         body = kwargs.pop('body', None)
         headers = kwargs.pop('headers', None)
-        return _connect(callback, url, self.host, self.address, self.port, path, self.is_ssl, method, body, headers, is_json, is_debug, timeout, wrapper, None, handler, False, kwargs)
+        return _connect(callback, url, self.host, self.address, self.port, path, self.is_ssl, method, body, headers, is_json, is_debug, timeout, wrapper, None, handler, False, kwargs, compress)
 
 
-def _connect(callback, url, host, address, port, path, is_ssl, method, body, headers, is_json, is_debug, timeout, wrapper, setup, handler, trace, kwargs):
-    c = ConnectContext(callback, url, method, path, host, headers, body, is_json, is_debug, timeout, wrapper, setup, kwargs, trace)
+def _connect(callback, url, host, address, port, path, is_ssl, method, body, headers, is_json, is_debug, timeout, wrapper, setup, handler, trace, kwargs, compress=False):
+    c = ConnectContext(callback, url, method, path, host, headers, body, is_json, is_debug, timeout, wrapper, setup, kwargs, trace, compress)
     return SERVER.add_connection((address, port), ConnectHandler if handler is None else handler, c, ssl=is_ssl)
 
 
 class ConnectContext(object):
 
-    def __init__(self, callback, url, method, path, host, headers, body, is_json, is_debug, timeout, wrapper, setup, kwargs, trace):
+    def __init__(self, callback, url, method, path, host, headers, body, is_json, is_debug, timeout, wrapper, setup, kwargs, trace, compress=False):
         self.callback = callback
         self.url = url
         self.method = method
@@ -375,6 +385,7 @@ class ConnectContext(object):
         self.setup = setup
         self.kwargs = kwargs
         self.trace = trace
+        self.compress = compress
 
 
 class ConnectHandler(HTTPHandler):
@@ -387,6 +398,7 @@ class ConnectHandler(HTTPHandler):
 
     def on_init(self):
         self.is_done = False
+        self.http_max_decompressed_length = MAX_DECOMPRESSED
         self.setup()
         self.timer = TIMERS.add(self.context.timeout * 1000, self.on_timeout).start()
 
@@ -410,7 +422,7 @@ class ConnectHandler(HTTPHandler):
 
         if isinstance(context.body, (dict, list, tuple, float, bool, int)):
             try:
-                context.body = json.dumps(context.body)
+                context.body = jsoncodec.dumps(context.body, 'connect.request')
             except Exception:
                 context.body = str(context.body)
             else:
@@ -474,6 +486,7 @@ class ConnectHandler(HTTPHandler):
             headers=context.headers,
             content=context.body,
             close=True,
+            compress=context.compress,
         )
 
     def on_http_send(self, headers, content):
@@ -500,7 +513,7 @@ class ConnectHandler(HTTPHandler):
 
         if self.context.is_json and result is not None and len(result):
             try:
-                result = json.loads(result)
+                result = jsoncodec.loads(result, 'connect.response')
             except Exception as e:
                 return self.done(str(e), 1)
 
@@ -592,7 +605,7 @@ class _Context(object):
             content = urlencode(content)
 
         if type(content) in (types.DictType, types.ListType, types.FloatType, types.BooleanType):
-            content = json.dumps(content)
+            content = jsoncodec.dumps(content, 'request.content')
             if 'Content-Type' not in headers:
                 headers['Content-Type'] = 'application/json'
 
@@ -710,12 +723,14 @@ class _URLParser(object):
         self.resource = u.path + ('?%s' % u.query if u.query else '')
 
 
-def run(command, delay=.01, loop=0):
-    ''' helper function: loop through SERVER/TIMER until command.is_done is True '''
+def run(command, delay=None, loop=0):
+    '''
+        helper function: run the event loop until command.is_done is True
 
-    while not command.is_done:
-        SERVER.service(delay=delay, max_iterations=loop)
-        TIMERS.service()
+        if delay (seconds) is specified, no single wait for network activity
+        is longer than that. loop is ignored (kept for backward compatibility).
+    '''
+    Loop(max_delay=delay).run(until=lambda: command.is_done)
 
 
 if __name__ == '__main__':
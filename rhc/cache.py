@@ -0,0 +1,154 @@
+'''
+The MIT License (MIT)
+
+Copyright (c) 2013-2017 Robert H Chase
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+'''
+import collections
+import hashlib
+import time
+
+from metrics import METRICS
+
+
+_HITS = METRICS.counter('rhc_response_cache_hits', 'GET responses sent from the cache')
+_MISSES = METRICS.counter('rhc_response_cache_misses', 'GET responses not in the cache (the handler is run)')
+_NOT_MODIFIED = METRICS.counter('rhc_response_cache_not_modified', '304 responses to If-None-Match')
+
+
+CachedResponse = collections.namedtuple('CachedResponse', 'content headers etag expires')
+
+
+def make_etag(content):
+    '''
+      a weak ETag for the content
+
+      weak, because the same ETag is used whether or not the response is
+      compressed (see HTTPHandler.http_compress_threshold).
+    '''
+    if isinstance(content, unicode):
+        content = content.encode('utf8')
+    return 'W/"%s"' % hashlib.sha1(content).hexdigest()[:24]
+
+
+def etag_match(if_none_match, etag):
+    ''' True if the If-None-Match header value matches etag (weak comparison) '''
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    etag = etag[2:] if etag.startswith('W/') else etag
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if (tag[2:] if tag.startswith('W/') else tag) == etag:
+            return True
+    return False
+
+
+class ResponseCache(object):
+
+    '''
+      LRU cache of GET responses, keyed by (resource, query string, scope).
+
+      scope keeps apart responses that have the same resource and query
+      string but come from different places; RESTHandler uses the
+      RESTMapping, so that two servers (or two routes) sharing CACHE
+      never answer with each other's responses.
+
+      A RESTMapper route added with cache=seconds (or 'GET path cache=30'
+      in a micro file) has its 200 responses stored here, and the handler
+      is not run again until the entry expires; RESTHandler answers
+      If-None-Match with 304 using the entry's ETag.
+
+      size is the maximum total length of the cached content; content
+      longer than max_item is not cached (it still gets an ETag).
+
+      Entries can be dropped before they expire with invalidate, for
+      instance by the handler of a PUT to the same resource (in any
+      scope).
+    '''
+    def __init__(self, size=16 * 1024 * 1024, max_item=1024 * 1024):
+        self.size = size
+        self.max_item = max_item
+        self._bytes = 0
+        self._items = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def setup(self, size=None, max_item=None):
+        if size is not None:
+            self.size = size
+        if max_item is not None:
+            self.max_item = max_item
+        self._trim()
+        return self
+
+    def get(self, resource, query='', scope=None):
+        ''' return an unexpired CachedResponse, or None '''
+        key = (resource, query, scope)
+        entry = self._items.pop(key, None)
+        if entry is None or entry.expires <= time.time():
+            if entry is not None:
+                self._bytes -= len(entry.content)
+            _MISSES.inc()
+            return None
+        _HITS.inc()
+        self._items[key] = entry  # most recently used is last
+        return entry
+
+    def add(self, resource, query, content, headers, seconds, scope=None):
+        ''' cache content (and headers) for seconds; return the CachedResponse '''
+        entry = CachedResponse(content, dict(headers) if headers else {}, make_etag(content), time.time() + seconds)
+        if len(content) <= self.max_item:
+            key = (resource, query, scope)
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old.content)
+            self._items[key] = entry
+            self._bytes += len(content)
+            self._trim()
+        return entry
+
+    def not_modified(self, entry, if_none_match):
+        ''' True if a response with If-None-Match can be 304 Not Modified '''
+        if etag_match(if_none_match, entry.etag):
+            _NOT_MODIFIED.inc()
+            return True
+        return False
+
+    def invalidate(self, prefix=''):
+        ''' drop entries for resources starting with prefix; return the number dropped '''
+        keys = [key for key in self._items if key[0].startswith(prefix)]
+        for key in keys:
+            self._bytes -= len(self._items.pop(key).content)
+        return len(keys)
+
+    def clear(self):
+        self._items.clear()
+        self._bytes = 0
+
+    def _trim(self):
+        while self._bytes > self.size:
+            _, entry = self._items.popitem(last=False)
+            self._bytes -= len(entry.content)
+
+
+CACHE = ResponseCache()
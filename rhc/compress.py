@@ -0,0 +1,197 @@
+'''
+The MIT License (MIT)
+
+Copyright (c) 2013-2017 Robert H Chase
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+'''
+import collections
+import zlib
+
+from metrics import METRICS
+
+
+_WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,  # HTTP's deflate is the zlib format
+}
+
+_HITS = METRICS.counter('rhc_compress_cache_hits', 'responses compressed from the cache')
+_MISSES = METRICS.counter('rhc_compress_cache_misses', 'responses compressed and added to the cache')
+_BYTES_IN = METRICS.counter('rhc_compress_bytes_in', 'response bytes before compression')
+_BYTES_OUT = METRICS.counter('rhc_compress_bytes_out', 'response bytes after compression')
+
+
+def accepted_encoding(accept_encoding):
+    '''
+      Accept-Encoding header value -> 'gzip', 'deflate' or None
+
+      gzip is preferred to deflate, unless it has a lower q-value. encodings
+      with q=0 are not acceptable.
+    '''
+    if not accept_encoding:
+        return None
+    best, best_q = None, 0
+    for item in accept_encoding.split(','):
+        params = item.split(';')
+        coding = params[0].strip().lower()
+        if coding == '*':
+            coding = 'gzip'
+        if coding not in _WBITS:
+            continue
+        q = 1.0
+        for param in params[1:]:
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0
+        if q > best_q or (q and q == best_q and coding == 'gzip'):
+            best, best_q = coding, q
+    return best
+
+
+def compress(content, encoding, level=6):
+    ''' compress a string as gzip or deflate '''
+    c = zlib.compressobj(level, zlib.DEFLATED, _WBITS[encoding])
+    result = c.compress(content) + c.flush()
+    _BYTES_IN.inc(len(content))
+    _BYTES_OUT.inc(len(result))
+    return result
+
+
+def compress_iter(chunks, encoding, level=6):
+    ''' compress an iterable of strings as one gzip or deflate stream (yields '' while the compressor buffers) '''
+    c = zlib.compressobj(level, zlib.DEFLATED, _WBITS[encoding])
+    for chunk in chunks:
+        if isinstance(chunk, unicode):
+            chunk = chunk.encode('utf8')
+        _BYTES_IN.inc(len(chunk))
+        chunk = c.compress(chunk)
+        _BYTES_OUT.inc(len(chunk))
+        yield chunk
+    chunk = c.flush()
+    _BYTES_OUT.inc(len(chunk))
+    yield chunk
+
+
+class DecompressionError(ValueError):
+    pass
+
+
+class Decompressor(object):
+
+    '''
+      Incremental gzip or deflate decoder.
+
+      Data is decoded as it arrives (decompress, then flush at the end), so
+      the compressed content is never held in full. If max_size is not None,
+      DecompressionError is raised as soon as the decoded content is larger
+      than max_size bytes, which stops a small message from expanding into a
+      huge one.
+
+      A deflate body is usually in the zlib format, but some servers send raw
+      deflate data; the first two bytes tell them apart.
+    '''
+    def __init__(self, encoding, max_size=None):
+        self.max_size = max_size
+        self.size = 0
+        self._d = zlib.decompressobj(_WBITS[encoding])
+        self._head = '' if encoding == 'deflate' else None
+
+    def decompress(self, data):
+        if self._head is not None:
+            self._head += str(data)
+            if len(self._head) < 2:
+                return ''
+            data, self._head = self._head, None
+            if ord(data[0]) & 0x0f != 8 or (ord(data[0]) << 8 | ord(data[1])) % 31:
+                self._d = zlib.decompressobj(-zlib.MAX_WBITS)  # no zlib header
+        limit = 0 if self.max_size is None else self.max_size - self.size + 1
+        try:
+            result = self._d.decompress(data, limit)
+        except zlib.error as e:
+            raise DecompressionError(str(e))
+        return self._count(result)
+
+    def flush(self):
+        if self._head:
+            raise DecompressionError('incomplete compressed content')
+        try:
+            result = self._d.flush()
+        except zlib.error as e:
+            raise DecompressionError(str(e))
+        return self._count(result)
+
+    def _count(self, result):
+        self.size += len(result)
+        if self.max_size is not None and self.size > self.max_size:
+            raise DecompressionError('decompressed content exceeds %d bytes' % self.max_size)
+        return result
+
+
+class CompressionCache(object):
+
+    '''
+      LRU cache of compressed content, keyed by (content, encoding, level).
+
+      Responses that are the same from request to request (a constant, or
+      a string cached by the application) are compressed once. The lookup
+      hashes the content, which is much cheaper than compressing it, and
+      python caches a string's hash, so the same string object costs nothing
+      after the first time.
+
+      size is the maximum total length of the cached strings (content and
+      compressed content);
+      content longer than max_item is compressed without being cached.
+    '''
+    def __init__(self, size=16 * 1024 * 1024, max_item=1024 * 1024):
+        self.size = size
+        self.max_item = max_item
+        self._bytes = 0
+        self._items = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def compress(self, content, encoding, level=6):
+        if len(content) > self.max_item:
+            return compress(content, encoding, level)
+        key = (content, encoding, level)
+        result = self._items.pop(key, None)
+        if result is None:
+            _MISSES.inc()
+            result = compress(content, encoding, level)
+            self._bytes += len(content) + len(result)
+        else:
+            _HITS.inc()
+        self._items[key] = result  # most recently used is last
+
+        while self._bytes > self.size:
+            (old, _, _), compressed = self._items.popitem(last=False)
+            self._bytes -= len(old) + len(compressed)
+        return result
+
+    def clear(self):
+        self._items.clear()
+        self._bytes = 0
+
+
+COMPRESSED = CompressionCache()
@@ -0,0 +1,185 @@
+'''
+The MIT License (MIT)
+
+Copyright (c) 2013-2017 Robert H Chase
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+'''
+import functools
+import sys
+import types
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class Return(Exception):
+
+    '''
+      Finish a coroutine with a result.
+
+      A python 2 generator can't return a value, so a coroutine raises
+      Return(value) instead:
+
+          @coroutine
+          def fetch_name(id):
+              user = yield load_user(id)
+              raise Return(user.name)
+    '''
+    def __init__(self, value=None):
+        super(Return, self).__init__(value)
+        self.value = value
+
+
+class PartialError(Exception):
+
+    '''
+      Raised inside a coroutine when a yielded partial completes with rc != 0.
+
+      The partial's result is available as the result attribute.
+    '''
+    def __init__(self, result):
+        super(PartialError, self).__init__(result)
+        self.result = result
+
+
+def coroutine(fn):
+    '''
+      Turn a generator function into a partial factory.
+
+      Inside the generator, any partial (a function that takes a
+      callback_fn and eventually calls it with (rc, result)) can be
+      yielded; this includes the results of async.partial, task.partial,
+      task.wrap and other coroutines. The generator resumes with result
+      when rc == 0; otherwise PartialError is raised at the yield.
+
+      Calling the decorated function returns a partial, so that the
+      coroutine can itself be yielded, or started with a callback:
+
+          @coroutine
+          def add_user(name):
+              id = yield async.wrap(...)  # any partial
+              raise Return(id)
+
+          add_user('fred')(callback_fn)
+
+      The callback_fn is called with (0, value) if the coroutine raises
+      Return(value) or finishes (value is None), with (rc, result) if a
+      PartialError escapes the coroutine, or with (1, str(exception)) on
+      any other exception, which is also logged.
+    '''
+    @functools.wraps(fn)
+    def _args(*args, **kwargs):
+        def _callback(callback_fn):
+            return run(fn(*args, **kwargs), callback_fn)
+        return _callback
+    return _args
+
+
+def run(generator, callback_fn, on_exception=None):
+    '''
+      Drive a generator as a coroutine (see coroutine).
+
+      If on_exception is specified, it is called with sys.exc_info() instead
+      of logging the exception and calling callback_fn with (1, message).
+    '''
+    if not isinstance(generator, types.GeneratorType):
+        callback_fn(0, generator)  # not a generator function: nothing to drive
+        return None
+    runner = _Runner(generator, callback_fn, on_exception)
+    runner.step()
+    return runner
+
+
+class _Runner(object):
+
+    def __init__(self, generator, callback_fn, on_exception):
+        self.generator = generator
+        self.callback_fn = callback_fn
+        self.on_exception = on_exception
+        self.is_done = False
+        self._next = None
+        self._is_stepping = False
+
+    def step(self, value=None, error=None):
+        '''
+          resume the generator with value (or by raising error)
+
+          a partial that completes synchronously calls step while the
+          previous step is still running; in that case, the value is saved
+          and picked up by the loop below instead of recursing.
+        '''
+        self._next = (value, error)
+        if self._is_stepping:
+            return
+        self._is_stepping = True
+        try:
+            while self._next is not None and not self.is_done:
+                value, error = self._next
+                self._next = None
+                try:
+                    if error is not None:
+                        yielded = self.generator.throw(error)
+                    else:
+                        yielded = self.generator.send(value)
+                except StopIteration:
+                    self._done(0, None)
+                except Return as e:
+                    self._done(0, e.value)
+                except PartialError as e:
+                    self._done(1, e.result)
+                except Exception as e:
+                    self._exception(e)
+                else:
+                    self._resolve(yielded)
+        finally:
+            self._is_stepping = False
+
+    def _resolve(self, partial):
+        completed = []
+
+        def on_complete(rc, result):
+            if completed:
+                return  # a misbehaving partial called back twice
+            completed.append(True)
+            if rc == 0:
+                self.step(result)
+            else:
+                self.step(error=PartialError(result))
+
+        if not callable(partial):
+            return self.step(error=TypeError('coroutine yielded a non-partial: %r' % (partial,)))
+        try:
+            partial(on_complete)
+        except Exception as e:
+            if not completed:
+                completed.append(True)
+                self.step(error=e)
+
+    def _done(self, rc, result):
+        self.is_done = True
+        self.callback_fn(rc, result)
+
+    def _exception(self, e):
+        self.is_done = True
+        if self.on_exception:
+            self.on_exception(*sys.exc_info())
+        else:
+            log.exception('unhandled exception in coroutine')
+            self.callback_fn(1, str(e))
@@ -23,10 +23,10 @@ THE SOFTWARE.
 '''
 from datetime import datetime, date
 from itertools import chain
-import json
 
 from rhc.database.db import DB
 from rhc.database.query import Query
+import rhc.jsoncodec as jsoncodec
 
 
 class DAO(object):
@@ -122,7 +122,7 @@ class DAO(object):
     def _jsonify(self, kwargs):
         for f in self.JSON_FIELDS:
             if kwargs[f]:
-                kwargs[f] = json.loads(kwargs[f])
+                kwargs[f] = jsoncodec.loads(kwargs[f], 'dao.load')
 
     @staticmethod
     def _import(target):
@@ -187,7 +187,7 @@ class DAO(object):
             if jsonify:
                 for n in self.JSON_FIELDS:
                     v = self._orig.get(n)
-                    self._orig[n] = json.dumps(self.on_json_save(n, v))
+                    self._orig[n] = jsoncodec.dumps(self.on_json_save(n, v), 'dao.save')
 
     @property
     def _update_fields(self):
@@ -203,7 +203,7 @@ class DAO(object):
         for n in self.JSON_FIELDS:
             v = cache[n] = getattr(self, n)
             if v is not None:
-                setattr(self, n, json.dumps(self.on_json_save(n, v)))
+                setattr(self, n, jsoncodec.dumps(self.on_json_save(n, v), 'dao.save'))
         try:
             self.before_save()
             self._save(insert)
@@ -29,8 +29,15 @@ class _DB(object):
 
     def __init__(self):
         self.__kwargs = None
-        self.__transaction = 0
-        self.__connection = None
+        self.__local = threading.local()  # connection and transaction depth are per-thread (see rhc.threadpool)
+
+    @property
+    def _local(self):
+        local = self.__local
+        if not hasattr(local, 'connection'):
+            local.connection = None
+            local.transaction = 0
+        return local
 
     def __enter__(self):
         self.start_transaction()
@@ -60,14 +67,14 @@ class _DB(object):
         return self.__delta
 
     def _connection(self):
-        connection = self.__connection
+        connection = self._local.connection
         if connection:
             connection.ping()
         else:
             if not self.__kwargs:
                 raise Exception('must call setup before using DB')
             connection = pymysql.connect(**self.__kwargs)
-            self.__connection = connection
+            self._local.connection = connection
         return connection
 
     def close(self):
@@ -83,13 +90,14 @@ class _DB(object):
         self._connection().rollback()
 
     def start_transaction(self):
-        self.__transaction += 1
+        self._local.transaction += 1
 
     def stop_transaction(self, commit=True):
-        if self.__transaction == 0:
+        local = self._local
+        if local.transaction == 0:
             raise Exception('attempting to stop transaction when none is started')
-        self.__transaction -= 1
-        if self.__transaction == 0:
+        local.transaction -= 1
+        if local.transaction == 0:
             if commit and self.__commit:
                 self._commit()
             else:
@@ -0,0 +1,142 @@
+'''
+The MIT License (MIT)
+
+Copyright (c) 2013-2017 Robert H Chase
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+'''
+
+
+class HTTPHeaders(object):
+
+    '''
+      Case-insensitive container of HTTP headers.
+
+      Works like a dict of header name -> value, where the name can be
+      given in any case ('content-type' finds 'Content-Type'); keys, items
+      and iteration use the name as it was first added. A header which is
+      repeated in a message (Set-Cookie, for instance) keeps every value:
+      add appends a value, get_all returns all of them, and lookups return
+      the last one (as a dict would have).
+
+      Each header is stored once, under its lower-case name.
+    '''
+    __slots__ = ('_headers',)
+    __hash__ = None
+
+    def __init__(self, headers=None, **kwargs):
+        self._headers = {}  # lower-case name -> [name, value, ...]
+        if headers:
+            self.update(headers)
+        if kwargs:
+            self.update(kwargs)
+
+    def add(self, name, value):
+        ''' add a value, keeping any existing values for name '''
+        item = self._headers.get(name.lower())
+        if item is None:
+            self._headers[name.lower()] = [name, value]
+        else:
+            item.append(value)
+
+    def get_all(self, name):
+        ''' all the values for name, in the order they were added '''
+        item = self._headers.get(name.lower())
+        return item[1:] if item else []
+
+    def multi_items(self):
+        ''' (name, value) for every value '''
+        return [(item[0], value) for item in self._headers.itervalues() for value in item[1:]]
+
+    def __getitem__(self, name):
+        return self._headers[name.lower()][-1]
+
+    def __setitem__(self, name, value):
+        key = name.lower()
+        item = self._headers.get(key)
+        self._headers[key] = [item[0] if item else name, value]
+
+    def __delitem__(self, name):
+        del self._headers[name.lower()]
+
+    def __contains__(self, name):
+        return name.lower() in self._headers
+
+    def __len__(self):
+        return len(self._headers)
+
+    def __iter__(self):
+        return (item[0] for item in self._headers.itervalues())
+
+    def __eq__(self, other):
+        if isinstance(other, HTTPHeaders):
+            return self._headers == other._headers
+        if isinstance(other, dict):
+            return dict(self.items()) == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __repr__(self):
+        return 'HTTPHeaders(%r)' % dict(self.items())
+
+    def get(self, name, default=None):
+        item = self._headers.get(name.lower())
+        return item[-1] if item else default
+
+    def pop(self, name, *default):
+        item = self._headers.pop(name.lower(), None)
+        if item is None:
+            if default:
+                return default[0]
+            raise KeyError(name)
+        return item[-1]
+
+    def setdefault(self, name, value=None):
+        item = self._headers.get(name.lower())
+        if item:
+            return item[-1]
+        self[name] = value
+        return value
+
+    def update(self, headers):
+        for name, value in headers.items():
+            self[name] = value
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [item[-1] for item in self._headers.itervalues()]
+
+    def items(self):
+        return [(item[0], item[-1]) for item in self._headers.itervalues()]
+
+    def iteritems(self):
+        return ((item[0], item[-1]) for item in self._headers.itervalues())
+
+    def copy(self):
+        result = HTTPHeaders()
+        result._headers = dict((key, list(item)) for key, item in self._headers.iteritems())
+        return result
+
+    def clear(self):
+        self._headers.clear()
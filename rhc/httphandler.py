@@ -22,11 +22,19 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 '''
 from tcpsocket import BasicHandler
+from compress import COMPRESSED, Decompressor, DecompressionError, accepted_encoding, compress_iter
+from headers import HTTPHeaders
+from multipart import HTTPPart, MultipartParser, MultipartError  # HTTPPart used to be defined here
 
 from StringIO import StringIO
+import sys
+import tempfile
 import time
 import urlparse
-import gzip
+
+
+MAX_PREALLOCATE = 1024 * 1024  # largest body buffer allocated before the body arrives; it grows from there
+MAX_DECOMPRESSED = 100 * 1024 * 1024  # default http_max_decompressed_length
 
 
 class HTTPHandler(BasicHandler):
@@ -38,7 +46,7 @@ class HTTPHandler(BasicHandler):
                 available variables (on_http_data)
 
                     http_message - entire message
-                    http_headers - dictionary of headers
+                    http_headers - HTTPHeaders (case-insensitive, dict-like)
                     http_content - content
                     error - any error message
 
@@ -57,20 +65,96 @@ class HTTPHandler(BasicHandler):
                         if charset:
                             http_content: decoded http_content
 
+                    a body with 'Content-Encoding: gzip' (or deflate) is
+                    decompressed as it arrives. if the decompressed content
+                    is larger than http_max_decompressed_length (default
+                    MAX_DECOMPRESSED; None means no limit), the connection is
+                    closed with an error.
+
+                lean mode (http_lean = True), for servers with many requests
+                in flight:
+
+                    http_message is not kept (always empty)
+                    http_query is parsed from http_query_string on first use
+                    http_content is not decoded (see RESTRequest.http_content)
+
+                streaming mode (http_stream = True), for large request bodies:
+
+                    the body is passed to on_http_body_chunk as it arrives,
+                    instead of being collected in http_content (which stays
+                    empty). by default, the chunks are written to http_body,
+                    a file which stays in memory up to http_spill_threshold
+                    bytes and moves to disk after that; at on_http_data,
+                    http_body is positioned at the start of the body.
+                    Content-Encoding is not decoded.
+
+                    a multipart/form-data body is parsed as it arrives, and
+                    http_multipart is filled in instead of http_body. each
+                    part's data is written to part.file, which is, by
+                    default, spooled like http_body; on_http_part can
+                    supply a different file (for instance, to write an
+                    upload directly to its destination).
+
+                    http_stream can also be set from on_http_headers, to
+                    stream selected requests only.
+
                 on_http_send(self, headers, content) - useful for debugging
                 on_http_data(self) - when data is available
+                on_http_body_chunk(self, data) - streaming mode: part of the body
+                on_http_part(self, part) - streaming mode: multipart part headers parsed;
+                                           return a writable file for the data or None
+                on_http_part_end(self, part) - streaming mode: multipart part complete
                 on_http_error(self)
+
+            Response compression (server):
+
+                if http_compress_threshold is not None, send_server compresses
+                string content of at least that many bytes with gzip or
+                deflate, as allowed by the request's Accept-Encoding header,
+                at http_compress_level. compressed content is cached in
+                http_compress_cache (see rhc.compress.CompressionCache), so
+                identical responses are only compressed once. chunked
+                responses are compressed as a stream, regardless of size.
+
+            Chunked responses:
+
+                send_server_chunked sends a response with 'Transfer-Encoding:
+                chunked', pulling each chunk from an iterable only after the
+                previous one has been written to the socket (on_send_complete),
+                so that a large response is never held in memory. Until the
+                last chunk is sent, is_sending_chunked is True.
         '''
         super(HTTPHandler, self).__init__(socket, context)
         self.t_http_data = 0
-        self.__data = ''
+        self.__data = bytearray()  # unparsed data starts at __cursor
+        self.__cursor = 0
         self._setup()
 
         self.http_max_content_length = None
         self.http_max_line_length = 10000
         self.http_max_header_count = 100
+        self.http_lean = False
+        self.http_stream = False
+        self.http_spill_threshold = 1024 * 1024
+        self.http_compress_threshold = None
+        self.http_compress_level = 6
+        self.http_compress_cache = COMPRESSED
+        self.http_max_decompressed_length = MAX_DECOMPRESSED
 
         self.__http_close_on_complete = False
+        self.__chunks = None  # iterator for a chunked response in progress
+        self.__pulling = False
+        self.__drained = False
+
+    @property
+    def http_query(self):
+        if self._http_query is None:
+            self._http_query = parse_query(self.http_query_string)
+        return self._http_query
+
+    @http_query.setter
+    def http_query(self, value):
+        self._http_query = value
 
     @property
     def charset(self):
@@ -87,43 +171,100 @@ class HTTPHandler(BasicHandler):
     def on_http_data(self):
         pass
 
+    def on_http_body_chunk(self, data):
+        ''' streaming mode: parse each piece of a multipart body, or spool it into http_body '''
+        if self.__parser is None:
+            self.__parser = self.__multipart_parser() or False
+        if self.__parser:
+            self.__parser.feed(data)
+            return
+        if self.http_body is None:
+            self.http_body = tempfile.SpooledTemporaryFile(max_size=self.http_spill_threshold)
+        self.http_body.write(data)
+
+    def on_http_part(self, part):
+        return None
+
+    def on_http_part_end(self, part):
+        pass
+
+    def __multipart_parser(self):
+        content_type = self.http_headers.get('Content-Type', '')
+        if not content_type.startswith('multipart') or '; boundary=' not in content_type:
+            return None
+        self.http_headers['Content-Type'], boundary = content_type.split('; boundary=')
+        return MultipartParser(
+            boundary,
+            on_part=self.on_http_part,
+            on_part_end=self.on_http_part_end,
+            spill_threshold=self.http_spill_threshold,
+        )
+
     def on_http_error(self):
         pass
 
     def _multipart(self):
-        cache = self.__data
         try:
             self.http_headers['Content-Type'], boundary = self.http_headers['Content-Type'].split('; boundary=')
-            for self.__data in [p[2:] for p in self.http_content.split('--' + boundary)][1:-1]:  # split, remove \r\n and ignore first & last; stuff into __data for __line
-                headers = dict(l.split(': ', 1) for l in iter(self.__line, ''))
-                if 'Content-Disposition' in headers:
-                    headers['Content-Disposition'], rem = headers['Content-Disposition'].split('; ', 1)
-                    disposition = dict(part.split('=', 1) for part in rem.split('; '))
-                self.http_multipart.append(HTTPPart(headers, disposition, self.__data))
-        except Exception:
-            self.__error('Malformed multipart message')
-        self.__data = cache
+            parser = MultipartParser(boundary, on_part=lambda part: StringIO())
+            parser.feed(self.http_content)
+            parser.close()
+        except ValueError:
+            return self.__error('Malformed multipart message')
+        for part in parser.parts:
+            part.content = part.file.getvalue() + '\r\n'  # content has always included the CRLF before the boundary
+            part.file = None
+            self.http_multipart.append(part)
+        return True
 
     def _on_http_data(self):
-        if self.http_headers.get('Content-Encoding') == 'gzip':
-            self.http_content = gzip.GzipFile(fileobj=StringIO(self.http_content)).read()
-        if self.http_headers.get('Content-Type', '').startswith('multipart'):
-            self._multipart()
-        if self.charset:
-            self.http_content = self.http_content.decode(self.charset)
+        if self.__decoder is not None:
+            try:
+                self.http_content += self.__decoder.flush()
+            except DecompressionError as e:
+                return self.__error('Content-Encoding: %s' % e)
+        if isinstance(self.http_content, bytearray):
+            self.http_content = str(self.http_content)  # chunked content
+        if self.http_stream and self.__parser:
+            try:
+                self.__parser.close()
+            except MultipartError as e:
+                return self.__error('Malformed multipart message: %s' % e)
+            self.http_multipart = self.__parser.parts
+        elif self.http_stream:
+            if self.http_body is None:
+                self.http_body = tempfile.SpooledTemporaryFile(max_size=self.http_spill_threshold)
+            self.http_body.seek(0)
+            self.http_content_charset = self.charset  # see RESTRequest.http_content
+        if self.http_headers.get('Content-Type', '').startswith('multipart') and not self.http_stream:
+            if not self._multipart():
+                return
+        charset = self.charset
+        if charset and not self.http_stream:
+            if self.http_lean:
+                self.http_content_charset = charset  # decode later, if at all
+            else:
+                self.http_content = self.http_content.decode(charset)
         self.t_http_data = time.time()
         self.on_http_data()
 
     def on_send_complete(self):
-        if self.__http_close_on_complete:
+        if self.__chunks is not None:
+            if self.__pulling:
+                self.__drained = True  # sent immediately; __pull continues with the next chunk
+            else:
+                self.__pull()
+        elif self.__http_close_on_complete:
             self.close()
 
     def __send(self, headers, content):
         self.on_http_send(headers, content)
         if isinstance(headers, unicode):
             headers = headers.encode('utf8')
-        data = headers + content
-        super(HTTPHandler, self).send(data)
+        if isinstance(content, (memoryview, buffer)):
+            self.send_buffers((headers, content))  # send the view as-is (don't copy into a string)
+        else:
+            super(HTTPHandler, self).send(headers + content)
 
     def send(self, method='GET', host=None, resource='/', headers=None, content='', close=False, compress=False):
 
@@ -133,8 +274,7 @@ class HTTPHandler(BasicHandler):
             headers = {}
 
         if 'Date' not in headers:
-            headers['Date'] = time.strftime(
-                "%a, %d %b %Y %H:%M:%S %Z", time.localtime())
+            headers['Date'] = http_date()
 
         if 'Content-Length' not in headers:
             headers['Content-Length'] = len(content)
@@ -143,41 +283,127 @@ class HTTPHandler(BasicHandler):
             headers['Connection'] = 'close'
 
         if compress:
-            headers['Accept-Encoding'] = 'gzip'
+            headers['Accept-Encoding'] = 'gzip, deflate'
 
-        if 'host' not in (k.lower() for k in headers):
+        if 'Host' not in headers and 'host' not in headers and 'host' not in (k.lower() for k in headers):
             host = host if host else self.host if self.host else '%s:%s' % self.peer_address
             headers['Host'] = host
 
-        headers = '%s %s HTTP/1.1\r\n%s\r\n\r\n' % (
-            method, resource, '\r\n'.join(['%s: %s' % (k, v) for k, v in headers.items()])
-        )
+        headers = '%s %s HTTP/1.1\r\n%s\r\n' % (method, resource, serialize_headers(headers))
 
         self.__send(headers, content)
 
-    def send_server(self, content='', code=200, message='OK', headers=None, close=False):
+    def send_server(self, content='', code=200, message='OK', headers=None, close=None, accept_encoding=None, header_block=''):
+        '''
+            send a response
+
+            if close is None, the connection is closed after the response if
+            the current request has 'Connection: close'; a caller responding
+            to an earlier (pipelined) request should pass close explicitly.
 
-        self.__http_close_on_complete = True if close else self.http_headers.get('Connection') == 'close'
+            header_block is a string of serialized headers (see
+            serialize_headers) which is added to the response as-is; it is
+            meant for headers that are the same on every response from a
+            route, so that they are formatted once, instead of per response.
+        '''
+
+        if close is None:
+            close = self.http_headers.get('Connection') == 'close'
+        self.__http_close_on_complete = close
 
         if headers is None:
             headers = {}
 
+        if self.http_compress_threshold is not None and isinstance(content, str) and \
+                len(content) >= self.http_compress_threshold and self.__is_compressible(code, headers):
+            headers['Vary'] = 'Accept-Encoding'
+            encoding = accepted_encoding(self.http_headers.get('Accept-Encoding') if accept_encoding is None else accept_encoding)
+            if encoding:
+                content = self.http_compress_cache.compress(content, encoding, self.http_compress_level)
+                headers['Content-Encoding'] = encoding
+
+        block = [status_line(code, message)]
         if 'Date' not in headers:
-            headers['Date'] = time.strftime(
-                "%a, %d %b %Y %H:%M:%S %Z", time.localtime())
+            block.append('Date: %s\r\n' % http_date())
+        if 'Content-Length' not in headers and 'Transfer-Encoding' not in headers:
+            block.append('Content-Length: %d\r\n' % len(content))
+        if headers:
+            block.append(serialize_headers(headers))
+        block.append(header_block)
+        block.append('\r\n')
 
-        if 'Content-Length' not in headers:
-            headers['Content-Length'] = len(content)
+        self.__send(''.join(block), content)
 
-        headers = 'HTTP/1.1 %d %s\r\n%s\r\n\r\n' % (
-            code, message,
-            '\r\n'.join(['%s: %s' % (k, v) for k, v in headers.items()]))
+    @staticmethod
+    def __is_compressible(code, headers):
+        return code not in (204, 304) and 'Content-Encoding' not in headers and 'Transfer-Encoding' not in headers
 
-        self.__send(headers, content)
+    @property
+    def is_sending_chunked(self):
+        return self.__chunks is not None
+
+    def send_server_chunked(self, chunks, code=200, message='OK', headers=None, close=None, accept_encoding=None, header_block=''):
+        '''
+            send a response with 'Transfer-Encoding: chunked'
+
+            chunks is an iterable of strings (unicode is utf-8 encoded). The
+            next chunk is pulled when the previous one has been sent. If the
+            iterable raises an Exception, _on_chunked_error is called with
+            sys.exc_info(), and the connection is closed (the response is
+            incomplete). When the last chunk is sent, _on_chunked_complete
+            is called.
+        '''
+        headers = dict(headers) if headers else {}
+        headers.pop('Content-Length', None)
+        if self.http_compress_threshold is not None and self.__is_compressible(code, headers):
+            headers['Vary'] = 'Accept-Encoding'
+            encoding = accepted_encoding(self.http_headers.get('Accept-Encoding') if accept_encoding is None else accept_encoding)
+            if encoding:
+                chunks = compress_iter(chunks, encoding, self.http_compress_level)
+                headers['Content-Encoding'] = encoding
+        headers['Transfer-Encoding'] = 'chunked'
+        self.__chunks = iter(chunks)
+        self.send_server('', code, message, headers, close, header_block=header_block)  # on_send_complete starts the chunks
+
+    def __pull(self):
+        self.__pulling = True
+        try:
+            while self.__chunks is not None and not self.closed:
+                try:
+                    chunk = next(self.__chunks)
+                except StopIteration:
+                    self.__chunks = None
+                    self.__drained = False
+                    self.send_buffers(('0\r\n\r\n',))
+                    self._on_chunked_complete()  # this can start another chunked response
+                    if not self.__drained:
+                        break
+                    continue
+                except Exception:
+                    self.__chunks = None
+                    self._on_chunked_error(*sys.exc_info())
+                    break
+                if isinstance(chunk, unicode):
+                    chunk = chunk.encode('utf8')
+                if not chunk:
+                    continue  # an empty chunk marks the end of the response
+                self.__drained = False
+                self.send_buffers(('%x\r\n' % len(chunk), chunk, '\r\n'))
+                if not self.__drained:
+                    break  # wait for on_send_complete
+        finally:
+            self.__pulling = False
+
+    def _on_chunked_complete(self):
+        pass
+
+    def _on_chunked_error(self, exception_type, exception_value, exception_traceback):
+        self.close('error in chunked response: %s' % exception_value)
 
     def _setup(self):
         self.http_message = ''
-        self.http_headers = {}
+        self.http_headers = HTTPHeaders()
+        self.__header_count = 0
         self.http_content = ''
         self.http_status_code = None
         self.http_status_message = None
@@ -185,7 +411,13 @@ class HTTPHandler(BasicHandler):
         self.http_multipart = []
         self.http_resource = None
         self.http_query_string = None
-        self.http_query = {}
+        self._http_query = {}
+        self.http_content_charset = None
+        self.http_body = None
+        self.__body = None
+        self.__streamed = 0
+        self.__parser = None  # streaming multipart parser (False if the body isn't multipart)
+        self.__decoder = None  # Decompressor for a Content-Encoded body
         self.__state = self.__status
 
     def on_http_headers(self):
@@ -197,10 +429,14 @@ class HTTPHandler(BasicHandler):
         return 0, None
 
     def on_data(self, data):
-        self.http_message += data
+        if not self.http_lean:
+            self.http_message += data
         self.__data += data
         while self.__state():
             pass
+        if self.__cursor:
+            del self.__data[:self.__cursor]  # keep only what hasn't been parsed
+            self.__cursor = 0
 
     def __error(self, message):
         self.error = message
@@ -209,12 +445,14 @@ class HTTPHandler(BasicHandler):
         return False
 
     def __line(self):
-        test = self.__data.split('\n', 1)
-        if len(test) == 1:
-            if len(self.__data) > self.http_max_line_length:
+        data = self.__data
+        end = data.find(b'\n', self.__cursor)
+        if end == -1:
+            if len(data) - self.__cursor > self.http_max_line_length:
                 return self.__error('too much data without a line termination (a)')
             return None
-        line, self.__data = test
+        line = str(data[self.__cursor:end])
+        self.__cursor = end + 1
         if len(line):
             if line[-1] == '\r':
                 line = line[:-1]
@@ -247,41 +485,48 @@ class HTTPHandler(BasicHandler):
 
             res = urlparse.urlparse(toks[1])
             self.http_resource = res.path
-            self.http_query = {}
-            self.http_query_string = ''
-            if res.query:
-                self.http_query_string = res.query
-                for n, v in urlparse.parse_qsl(res.query):
-                    self.http_query[n] = v
+            self.http_query_string = res.query
+            self._http_query = None if self.http_lean else parse_query(res.query)
 
         self.__state = self.__header
         return True
 
     def __header(self):
+        end = self.__data.find(b'\r\n\r\n', self.__cursor)
+        if end != -1:
+            lines = str(self.__data[self.__cursor:end]).split('\n')
+            lines = [line[:-1] if line.endswith('\r') else line for line in lines]
+            if '' not in lines:  # the whole header block is here: parse it in one pass
+                self.__cursor = end + 4
+                for line in lines:
+                    if len(line) > self.http_max_line_length:
+                        return self.__error('too much data without a line termination (b)')
+                    if not self.__header_line(line):
+                        return False
+                return self._end_header()
+
         line = self.__line()
-        if line is None:
+        if line is None or line is False:
             return False
 
         if len(line) == 0:
             return self._end_header()
 
-        else:
-            if len(self.http_headers) == self.http_max_header_count:
-                return self.__error('Too many header records defined')
-            test = line.split(':', 1)
-            if len(test) != 2:
-                return self.__error('Invalid header: missing colon')
-            name, value = test
-            self.http_headers[name.strip()] = value.strip()
+        return self.__header_line(line)
 
+    def __header_line(self, line):
+        if self.__header_count == self.http_max_header_count:
+            return self.__error('Too many header records defined')
+        test = line.split(':', 1)
+        if len(test) != 2:
+            return self.__error('Invalid header: missing colon')
+        name, value = test
+        self.http_headers.add(name.strip(), value.strip())
+        self.__header_count += 1
         return True
 
     def _end_header(self):
 
-        # make sure lower-case versions of header names are available (for case-insensitive operation)
-        for n, v in self.http_headers.items():
-            self.http_headers[n.lower()] = v
-
         if getattr(self, '_http_method', None) == 'HEAD':  # this gets set if the send method is called
             self.__length = 0
             self.__state = self.__content
@@ -289,6 +534,7 @@ class HTTPHandler(BasicHandler):
         elif 'Transfer-Encoding' in self.http_headers:
             if self.http_headers['Transfer-Encoding'] != 'chunked':
                 return self.__error('Unsupported Transfer-Encoding value')
+            self.http_content = bytearray()  # chunks are appended in place; see _on_http_data
             self.__state = self.__chunked_length
 
         else:
@@ -297,6 +543,8 @@ class HTTPHandler(BasicHandler):
                     self.__length = int(self.http_headers['Content-Length'])
                 except ValueError:
                     return self.__error('Invalid content length')
+                if self.__length < 0:
+                    return self.__error('Invalid content length')
                 if self.http_max_content_length:
                     if self.__length > self.http_max_content_length:
                         self.send_server(code=413, message='Request Entity Too Large')
@@ -314,27 +562,91 @@ class HTTPHandler(BasicHandler):
         if rc != 0:
             return self.__error(result)
 
+        encoding = self.http_headers.get('content-encoding')
+        if encoding in ('gzip', 'deflate') and not self.http_stream:
+            self.__decoder = Decompressor(encoding, self.http_max_decompressed_length)
+            if not isinstance(self.http_content, bytearray):
+                self.http_content = bytearray()
+
         return True
 
     def __identity(self):
         return False
 
     def __on_identity_close(self):
-        self.http_content = self.__data
+        if self.__decoder is not None:
+            if not self.__decode(len(self.__data) - self.__cursor):
+                return
+        else:
+            self.http_content = str(self.__data[self.__cursor:])
         self._on_http_data()
 
+    def __decode(self, count):
+        try:
+            self.http_content += self.__decoder.decompress(buffer(self.__data, self.__cursor, count))
+        except DecompressionError as e:
+            return self.__error('Content-Encoding: %s' % e)
+        self.__cursor += count
+        self.__streamed += count
+        return True
+
     def __content(self):
-        if len(self.__data) >= self.__length:
-            self.http_content = self.__data[:self.__length]
-            self._on_http_data()
-            self.__data = self.__data[self.__length:]
-            self._setup()
-            return True
-        return False
+        if self.http_stream:
+            return self.__content_stream()
+        if self.__decoder is not None:
+            return self.__content_decode()
+        data, cursor, length = self.__data, self.__cursor, self.__length
+        if self.__body is None:
+            if len(data) - cursor >= length:  # the whole body is here
+                self.http_content = str(data[cursor:cursor + length])
+                self.__cursor = cursor + length
+                return self.__complete()
+            self.__body = bytearray(min(length, MAX_PREALLOCATE))  # otherwise, collect it as it arrives (slice assignment grows it)
+            self.__received = 0
+        count = min(len(data) - cursor, length - self.__received)
+        if count:
+            self.__body[self.__received:self.__received + count] = buffer(data, cursor, count)
+            self.__received += count
+            self.__cursor += count
+        if self.__received < length:
+            return False
+        self.http_content = str(self.__body)
+        return self.__complete()
+
+    def __content_decode(self):
+        count = min(len(self.__data) - self.__cursor, self.__length - self.__streamed)
+        if count and not self.__decode(count):
+            return False
+        if self.__streamed < self.__length:
+            return False
+        return self.__complete()
+
+    def __content_stream(self):
+        count = min(len(self.__data) - self.__cursor, self.__length - self.__streamed)
+        if count and not self.__body_chunk(count):
+            return False
+        if self.__streamed < self.__length:
+            return False
+        return self.__complete()
+
+    def __body_chunk(self, count):
+        chunk = str(buffer(self.__data, self.__cursor, count))
+        self.__cursor += count
+        self.__streamed += count
+        try:
+            self.on_http_body_chunk(chunk)
+        except MultipartError as e:
+            return self.__error('Malformed multipart message: %s' % e)
+        return True
+
+    def __complete(self):
+        self._on_http_data()
+        self._setup()
+        return True
 
     def __chunked_length(self):
         line = self.__line()
-        if line is None:
+        if line is None or line is False:
             return False
         line = line.split(';', 1)[0]
         try:
@@ -345,23 +657,35 @@ class HTTPHandler(BasicHandler):
             self.__state = self.__footer
             return True
         if self.http_max_content_length:
-            if (len(self.__data) + self.__length) > self.http_max_content_length:
+            received = self.__streamed if self.__decoder is not None else len(self.http_content) + self.__streamed
+            if (received + self.__length) > self.http_max_content_length:
                 self.send_server(code=413, message='Request Entity Too Large')
                 return self.__error('Content-Length exceeds maximum length')
         self.__state = self.__chunked_content
         return True
 
     def __chunked_content(self):
-        if len(self.__data) >= self.__length:
-            self.http_content += self.__data[:self.__length]
-            self.__data = self.__data[self.__length:]
-            self.__state = self.__chunked_content_end
-            return True
-        return False
+        count = min(len(self.__data) - self.__cursor, self.__length)
+        if count == 0:
+            return False
+        if self.http_stream:
+            if not self.__body_chunk(count):
+                return False
+        elif self.__decoder is not None:
+            if not self.__decode(count):
+                return False
+        else:
+            self.http_content += buffer(self.__data, self.__cursor, count)
+            self.__cursor += count
+        self.__length -= count
+        if self.__length:
+            return False
+        self.__state = self.__chunked_content_end
+        return True
 
     def __chunked_content_end(self):
         line = self.__line()
-        if line is None:
+        if line is None or line is False:
             return False
         if line == '':
             self.__state = self.__chunked_length
@@ -370,33 +694,68 @@ class HTTPHandler(BasicHandler):
 
     def __footer(self):
         line = self.__line()
-        if line is None:
+        if line is None or line is False:
             return False
 
         if len(line) == 0:
-            self._on_http_data()
-            self._setup()
-            return True
+            return self.__complete()
 
         test = line.split(':', 1)
         if len(test) != 2:
             return self.__error('Invalid footer: missing colon')
-        if len(self.http_headers) == self.http_max_header_count:
+        if self.__header_count == self.http_max_header_count:
             return self.__error('Too many header records defined')
         name, value = test
-        self.http_headers[name.strip()] = value.strip()
+        self.http_headers.add(name.strip(), value.strip())
+        self.__header_count += 1
         return True
 
 
-class HTTPPart(object):
+_STATUS_LINES = dict(((code, message), 'HTTP/1.1 %d %s\r\n' % (code, message)) for code, message in (
+    (200, 'OK'),
+    (201, 'Created'),
+    (204, 'No Content'),
+    (206, 'Partial Content'),
+    (302, 'Found'),
+    (304, 'Not Modified'),
+    (400, 'Bad Request'),
+    (401, 'Unauthorized'),
+    (403, 'Forbidden'),
+    (404, 'Not Found'),
+    (413, 'Request Entity Too Large'),
+    (416, 'Range Not Satisfiable'),
+    (429, 'Too Many Requests'),
+    (500, 'Internal Server Error'),
+    (501, 'Internal Server Error'),
+    (503, 'Service Unavailable'),
+))
 
-    def __init__(self, headers, disposition, content):
-        '''
-            Container for one part of a multipart message.
 
-            The disposition is a dict with the k:v pairs from the 'Content-Disposition'
-            header, where things like filename are stored.
-        '''
-        self.headers = headers
-        self.disposition = disposition
-        self.content = content
+def status_line(code, message):
+    ''' response status line, including the CRLF '''
+    line = _STATUS_LINES.get((code, message))
+    if line is None:
+        line = 'HTTP/1.1 %d %s\r\n' % (code, message)
+    return line
+
+
+_date = [0, '']  # (second, Date header value for that second)
+
+
+def http_date():
+    ''' value for a Date header; formatted at most once per second '''
+    now = int(time.time())
+    if now != _date[0]:
+        _date[:] = now, time.strftime('%a, %d %b %Y %H:%M:%S %Z', time.localtime(now))
+    return _date[1]
+
+
+def serialize_headers(headers):
+    ''' dict or HTTPHeaders -> 'name: value\\r\\n' lines '''
+    items = headers.multi_items() if isinstance(headers, HTTPHeaders) else headers.items()
+    return ''.join(['%s: %s\r\n' % item for item in items])
+
+
+def parse_query(query_string):
+    ''' query string -> dict (the last value wins for a repeated name) '''
+    return dict(urlparse.parse_qsl(query_string)) if query_string else {}
@@ -0,0 +1,110 @@
+'''
+The MIT License (MIT)
+
+Copyright (c) 2013-2017 Robert H Chase
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+'''
+import json
+import time
+
+
+class JSONCodec(object):
+
+    '''
+      The JSON encoder and decoder used throughout rhc.
+
+      RESTResult, RESTRequest.json, async (ConnectHandler and request) and
+      DAO all encode and decode through CODEC, so a faster library can be
+      plugged in, and formatting set, in one place:
+
+          import ujson
+          from rhc import jsoncodec
+          jsoncodec.configure(dumps=ujson.dumps, loads=ujson.loads)
+
+      With the standard library encoder, compact selects separators without
+      spaces, and ensure_ascii is passed through; a plugged-in dumps is
+      called with just the value, and is expected to format it as it sees
+      fit.
+
+      Each call names the path that it is on ('rest.response', ...). If
+      times is a dict (see start_timing), the number of calls and the time
+      spent are added up per path; otherwise, nothing is measured.
+    '''
+    def __init__(self):
+        self.times = None
+        self.configure()
+
+    def configure(self, dumps=None, loads=None, compact=False, ensure_ascii=True):
+        self.compact = compact
+        self.ensure_ascii = ensure_ascii
+        if dumps is None:
+            separators = (',', ':') if compact else None
+            dumps = json.JSONEncoder(separators=separators, ensure_ascii=ensure_ascii).encode  # built once, not per call
+        self._dumps = dumps
+        self._loads = loads or json.loads
+
+    def start_timing(self):
+        self.times = {}  # path -> [calls, seconds]
+
+    def stop_timing(self):
+        times, self.times = self.times, None
+        return times
+
+    def dumps(self, value, path='other'):
+        if self.times is None:
+            return self._dumps(value)
+        return self._timed(self._dumps, value, path)
+
+    def loads(self, text, path='other'):
+        if self.times is None:
+            return self._loads(text)
+        return self._timed(self._loads, text, path)
+
+    def _timed(self, fn, value, path):
+        start = time.time()
+        try:
+            return fn(value)
+        finally:
+            item = self.times.setdefault(path, [0, 0.0])
+            item[0] += 1
+            item[1] += time.time() - start
+
+
+CODEC = JSONCodec()
+
+
+def configure(dumps=None, loads=None, compact=False, ensure_ascii=True):
+    ''' configure CODEC; dumps and loads can be callables or import paths ('ujson.dumps') '''
+    CODEC.configure(_callable(dumps), _callable(loads), compact, ensure_ascii)
+
+
+def dumps(value, path='other'):
+    return CODEC.dumps(value, path)
+
+
+def loads(text, path='other'):
+    return CODEC.loads(text, path)
+
+
+def _callable(target):
+    if isinstance(target, basestring):
+        module, name = target.rsplit('.', 1)
+        return getattr(__import__(module, fromlist=[name]), name)
+    return target
@@ -0,0 +1,92 @@
+'''
+The MIT License (MIT)
+
+Copyright (c) 2013-2017 Robert H Chase
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+'''
+import functools
+
+from rhc.metrics import METRICS
+from rhc.tcpsocket import SERVER
+from rhc.timer import TIMERS
+
+
+_ITERATIONS = METRICS.counter('rhc_loop_iterations', 'passes through the event loop')
+METRICS.gauge('rhc_timers', 'timers in the TIMERS heap', fn=lambda: len(TIMERS))
+
+
+class Loop(object):
+
+    '''
+      Drive a Server and a Timer together.
+
+      The poll timeout is the time until the next timer expires, so timers
+      run on time, and a loop with nothing to do sleeps in the poll until a
+      socket becomes ready or a timer is due. If max_delay (seconds) is
+      specified, the poll never blocks longer than that.
+
+      Callbacks can be scheduled with call_soon (after the next poll) or
+      call_later (after a delay).
+    '''
+    def __init__(self, server=None, timers=None, max_delay=None):
+        self.server = server if server is not None else SERVER
+        self.timers = timers if timers is not None else TIMERS
+        self.max_delay = max_delay
+        self.is_running = False
+
+    def call_soon(self, callback, *args):
+        ''' run callback(*args) on the next pass through the loop '''
+        self.server.call_soon(callback, *args)
+
+    def call_later(self, delay, callback, *args):
+        '''
+          run callback(*args) in delay seconds
+
+          return the started timer, which can be canceled
+        '''
+        if args:
+            callback = functools.partial(callback, *args)
+        return self.timers.add(callback, delay * 1000.0).start()
+
+    def run_once(self):
+        ''' wait for network activity or the next timer, then handle both '''
+        _ITERATIONS.inc()
+        self.server._service(self.timers.timeout(self.max_delay))
+        self.timers.service()
+
+    def run(self, until=None):
+        '''
+          run until stop is called or, if specified, until() is True
+
+          until is checked before each pass through the loop.
+        '''
+        self.is_running = True
+        try:
+            while self.is_running and not (until and until()):
+                self.run_once()
+        finally:
+            self.is_running = False
+
+    def stop(self):
+        ''' stop the loop after the current pass '''
+        self.is_running = False
+
+
+LOOP = Loop()
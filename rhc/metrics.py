@@ -0,0 +1,198 @@
+'''
+The MIT License (MIT)
+
+Copyright (c) 2013-2017 Robert H Chase
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+'''
+import bisect
+import json
+
+
+class Counter(object):
+
+    ''' a value that only goes up '''
+    __slots__ = ('name', 'help', 'value')
+    kind = 'counter'
+
+    def __init__(self, name, help=''):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def collect(self):
+        return self.value
+
+
+class Gauge(object):
+
+    '''
+      a value that goes up and down
+
+      if fn is specified, it is called to get the value at collection time
+      instead of being set from the code being measured.
+    '''
+    __slots__ = ('name', 'help', 'value', 'fn')
+    kind = 'gauge'
+
+    def __init__(self, name, help='', fn=None):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self.fn = fn
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def collect(self):
+        return self.fn() if self.fn else self.value
+
+
+class Histogram(object):
+
+    '''
+      counts of observed values in fixed buckets
+
+      buckets is an ascending sequence of upper bounds; an implicit +Inf
+      bucket catches everything larger. counts are per bucket (not
+      cumulative) until collected.
+    '''
+    __slots__ = ('name', 'help', 'buckets', 'counts', 'sum', 'count')
+    kind = 'histogram'
+
+    def __init__(self, name, buckets, help=''):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def collect(self):
+        total = 0
+        cumulative = []
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return {'buckets': cumulative, 'sum': self.sum, 'count': self.count}
+
+
+class Registry(object):
+
+    '''
+      A named collection of metrics.
+
+      Metrics are created once (usually at import time) and then recorded
+      directly; recording is an attribute update, so it is cheap enough to
+      leave on in hot paths:
+
+          REQUESTS = METRICS.counter('myapp_requests', 'requests handled')
+          ...
+          REQUESTS.inc()
+
+      Asking for an existing name returns the existing metric.
+    '''
+    def __init__(self):
+        self._metrics = {}
+
+    def __len__(self):
+        return len(self._metrics)
+
+    def __getitem__(self, name):
+        return self._metrics[name]
+
+    def _add(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if existing.kind != metric.kind:
+                raise ValueError('metric %s is already defined as a %s' % (metric.name, existing.kind))
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help=''):
+        return self._add(Counter(name, help))
+
+    def gauge(self, name, help='', fn=None):
+        gauge = self._add(Gauge(name, help))
+        if fn is not None:
+            gauge.fn = fn
+        return gauge
+
+    def histogram(self, name, buckets, help=''):
+        return self._add(Histogram(name, buckets, help))
+
+    def collect(self):
+        ''' return {name: value} for every metric '''
+        return {name: metric.collect() for name, metric in self._metrics.items()}
+
+    def to_json(self):
+        return json.dumps(self.collect(), sort_keys=True)
+
+    def to_text(self):
+        ''' prometheus text exposition format '''
+        lines = []
+        for name in sorted(self._metrics):
+            metric = self._metrics[name]
+            if metric.help:
+                lines.append('# HELP %s %s' % (name, metric.help))
+            lines.append('# TYPE %s %s' % (name, metric.kind))
+            value = metric.collect()
+            if metric.kind == 'histogram':
+                for bound, count in value['buckets']:
+                    lines.append('%s_bucket{le="%s"} %s' % (name, bound, count))
+                lines.append('%s_sum %s' % (name, value['sum']))
+                lines.append('%s_count %s' % (name, value['count']))
+            else:
+                lines.append('%s %s' % (name, value))
+        return '\n'.join(lines) + '\n'
+
+
+METRICS = Registry()
+
+
+def stats(request):
+    '''
+      rest_handler for the metrics in METRICS
+
+      add it to a micro file to expose the metrics:
+
+          ROUTE /stats$
+            GET rhc.metrics.stats
+
+      the response is json, or prometheus text if format=text is in the
+      query string or text/plain is in the Accept header.
+    '''
+    if request.http_query.get('format') == 'text' or 'text/plain' in request.http_headers.get('Accept', ''):
+        return 200, METRICS.to_text(), None, None, 'text/plain; version=0.0.4'
+    return 200, METRICS.to_json(), None, None, 'application/json; charset=utf-8'
@@ -4,11 +4,15 @@ import sys
 import uuid
 
 import rhc.async as async
+import rhc.cache as cache
 import rhc.file_util as file_util
-from rhc.micro_fsm.parser import Parser as parser
+import rhc.jsoncodec as jsoncodec
+import rhc.prefork as prefork
+import rhc.threadpool as threadpool
+from rhc.loop import LOOP
+from rhc.micro_fsm.parser import Parser as parser, Static
 from rhc.resthandler import LoggingRESTHandler, RESTMapper
 from rhc.tcpsocket import SERVER
-from rhc.timer import TIMERS
 from rhc import CONNECTIONS as connection
 
 log = logging.getLogger(__name__)
@@ -16,10 +20,18 @@ log = logging.getLogger(__name__)
 
 class MicroContext(object):
 
-    def __init__(self, http_max_content_length, http_max_line_length, http_max_header_count):
+    def __init__(self, http_max_content_length, http_max_line_length, http_max_header_count, http_lean=False, http_keep_alive_timeout=None, http_keep_alive_max=None, http_stream=False, http_spill_threshold=None, http_compress_threshold=None, http_compress_level=None, http_max_decompressed_length=None):
         self.http_max_content_length = http_max_content_length
         self.http_max_line_length = http_max_line_length
         self.http_max_header_count = http_max_header_count
+        self.http_lean = http_lean
+        self.http_keep_alive_timeout = http_keep_alive_timeout
+        self.http_keep_alive_max = http_keep_alive_max
+        self.http_stream = http_stream
+        self.http_spill_threshold = http_spill_threshold
+        self.http_compress_threshold = http_compress_threshold
+        self.http_compress_level = http_compress_level
+        self.http_max_decompressed_length = http_max_decompressed_length
 
 
 class MicroRESTHandler(LoggingRESTHandler):
@@ -30,6 +42,17 @@ class MicroRESTHandler(LoggingRESTHandler):
         self.http_max_content_length = context.http_max_content_length
         self.http_max_line_length = context.http_max_line_length
         self.http_max_header_count = context.http_max_header_count
+        self.http_lean = context.http_lean
+        self.http_keep_alive_timeout = context.http_keep_alive_timeout
+        self.http_keep_alive_max = context.http_keep_alive_max
+        self.http_stream = context.http_stream
+        if context.http_spill_threshold is not None:
+            self.http_spill_threshold = context.http_spill_threshold
+        self.http_compress_threshold = context.http_compress_threshold
+        if context.http_compress_level is not None:
+            self.http_compress_level = context.http_compress_level
+        if context.http_max_decompressed_length is not None:
+            self.http_max_decompressed_length = context.http_max_decompressed_length
 
     def on_rest_exception(self, exception_type, value, trace):
         code = uuid.uuid4().hex
@@ -82,7 +105,13 @@ def load_config(config='config', micro='micro'):
     return p.config
 
 
-def setup_servers(config, servers, is_new):
+def setup_servers(config, servers, is_new, reuse_port=False):
+    if hasattr(config, 'threadpool'):
+        threadpool.POOL.setup(config.threadpool.size, config.threadpool.queue_depth, config.threadpool.reject)
+    if hasattr(config, 'cache'):
+        cache.CACHE.setup(config.cache.size, config.cache.max_item)
+    if hasattr(config, 'json'):
+        jsoncodec.configure(config.json.dumps, config.json.loads, config.json.compact, config.json.ensure_ascii)
     for server in servers.values():
         if is_new:
             conf = config._get('server.%s' % server.name)
@@ -94,13 +123,32 @@ def setup_servers(config, servers, is_new):
             conf.http_max_content_length if hasattr(conf, 'http_max_content_length') else None,
             conf.http_max_line_length if hasattr(conf, 'http_max_line_length') else 10000,
             conf.http_max_header_count if hasattr(conf, 'http_max_header_count') else 100,
+            conf.http_lean if hasattr(conf, 'http_lean') else False,
+            conf.http_keep_alive_timeout if hasattr(conf, 'http_keep_alive_timeout') else None,
+            conf.http_keep_alive_max if hasattr(conf, 'http_keep_alive_max') else None,
+            conf.http_stream if hasattr(conf, 'http_stream') else False,
+            conf.http_spill_threshold if hasattr(conf, 'http_spill_threshold') else None,
+            conf.http_compress_threshold if hasattr(conf, 'http_compress_threshold') else None,
+            conf.http_compress_level if hasattr(conf, 'http_compress_level') else None,
+            conf.http_max_decompressed_length if hasattr(conf, 'http_max_decompressed_length') else None,
         )
         mapper = RESTMapper(context)
+        mapper.limit(
+            conf.concurrency if hasattr(conf, 'concurrency') else None,
+            conf.rate if hasattr(conf, 'rate') else None,
+            conf.burst if hasattr(conf, 'burst') else None,
+        )
         for route in server.routes:
+            if isinstance(route, Static):
+                mapper.add_static(route.pattern, route.root)
+                continue
             methods = {}
             for method, path in route.methods.items():
                 methods[method] = _import(path)
-            mapper.add(route.pattern, **methods)
+                if method in route.threaded:
+                    methods[method] = threadpool.threaded(methods[method])
+            mapper.add(route.pattern, cache=route.cache, coalesce=route.coalesce, concurrency=route.concurrency, rate=route.rate, burst=route.burst, **methods)
+        mapper.compile()
         handler = _import(conf.handler, is_module=True) if hasattr(conf, 'handler') else MicroRESTHandler
         SERVER.add_server(
             conf.port,
@@ -109,6 +157,8 @@ def setup_servers(config, servers, is_new):
             conf.ssl.is_active,
             conf.ssl.certfile,
             conf.ssl.keyfile,
+            conf.backlog,
+            reuse_port=reuse_port,
         )
         log.info('listening on %s port %d', server.name, conf.port)
 
@@ -131,6 +181,7 @@ def setup_connections(config, connections):
            _import(c.handler) if c.handler else None,
            _import(c.setup) if c.setup else None,
            headers,
+           c.compress,
         )
         for resource in c.resources.values():
             optional = {}
@@ -163,11 +214,20 @@ def start(config, setup):
         _import(setup)(config)
 
 
-def run(sleep=100, max_iterations=100):
+def run(sleep=None, max_iterations=None):
+    '''
+      run the event loop (LOOP) until it is stopped or interrupted
+
+      the loop waits exactly as long as the next timer allows; if sleep (ms)
+      is specified, no single wait is longer than that. max_iterations is
+      ignored (kept for backward compatibility).
+    '''
+    if sleep is not None:
+        LOOP.max_delay = sleep / 1000.0
     while True:
         try:
-            SERVER.service(delay=sleep/1000.0, max_iterations=max_iterations)
-            TIMERS.service()
+            LOOP.run()
+            break
         except KeyboardInterrupt:
             log.info('Received shutdown command from keyboard')
             break
@@ -180,6 +240,27 @@ def stop(teardown):
         _import(teardown)()
 
 
+def serve(p, reuse_port=False):
+    ''' setup and run the servers and connections from a parsed micro file '''
+    setup_servers(p.config, p.servers, p.is_new, reuse_port)
+    if p.is_new:
+        setup_connections(p.config, p.connections)
+    start(p.config, p.setup)
+    try:
+        run()
+    except prefork.Shutdown:
+        log.info('Received shutdown command from supervisor')
+    stop(p.teardown)
+
+
+def serve_workers(p, workers):
+    ''' run serve in pre-forked worker processes sharing ports with SO_REUSEPORT '''
+    def worker(index):
+        SERVER.after_fork()
+        serve(p, reuse_port=True)
+    prefork.Supervisor(worker, workers).run()
+
+
 def launch(micro):
     p = parser.parse(micro)
     sys.modules[__name__].config = p.config
@@ -203,6 +284,7 @@ if __name__ == '__main__':
     aparser.add_argument('--config', default='config', help='configuration file')
     aparser.add_argument('--no-config', dest='no_config', default=False, action='store_true', help="don't use a config file")
     aparser.add_argument('--micro', default='micro', help='micro description file')
+    aparser.add_argument('-w', '--workers', type=int, default=0, help='number of pre-forked worker processes (0 means no workers)')
     aparser.add_argument('-c', '--config-only', dest='config_only', action='store_true', default=False, help='parse micro and config files and display config values')
 
     aparser.add_argument('-v', '--verbose', action='store_true', default=False, help='display debug level messages')
@@ -216,9 +298,7 @@ if __name__ == '__main__':
         print p.config
     else:
         module.config = p.config
-        setup_servers(p.config, p.servers, p.is_new)
-        if p.is_new:
-            setup_connections(p.config, p.connections)
-        start(p.config, p.setup)
-        run()
-        stop(p.teardown)
+        if args.workers:
+            serve_workers(p, args.workers)
+        else:
+            serve(p)
@@ -75,6 +75,7 @@ class Parser(object):
             add_route=self.act_add_route,
             add_server=self.act_add_server,
             add_setup=self.act_add_setup,
+            add_static=self.act_add_static,
             add_teardown=self.act_add_teardown,
         )
         self.error = None
@@ -84,6 +85,9 @@ class Parser(object):
         self.teardown = None
         self.connections = {}
         self._config_servers = {}
+        self._is_threaded = False
+        self._is_cached = False
+        self._is_json = False
         self.servers = {}
 
     @property
@@ -126,7 +130,16 @@ class Parser(object):
         name, port = self.args
         self._config_servers[name] = port
 
+    def _add_json_config(self):
+        if not self._is_json:
+            self._is_json = True
+            self._add_config('json.dumps')
+            self._add_config('json.loads')
+            self._add_config('json.compact', value=False, validator=config_file.validate_bool)
+            self._add_config('json.ensure_ascii', value=True, validator=config_file.validate_bool)
+
     def act_add_connection(self):
+        self._add_json_config()
         connection = Connection(*self.args, **self.kwargs)
         if connection.name in self.connections:
             self.error = 'duplicate CONNECTION name: %s' % connection.name
@@ -160,7 +173,23 @@ class Parser(object):
                 self._add_config('connection.%s.resource.%s.header.%s' % (self.connection.name, self.connection._resource.name, header.config), value=header.default)
 
     def act_add_method(self):
-        self.server.add_method(Method(self.event, *self.args, **self.kwargs))
+        if isinstance(self.server.route, Static):
+            self.error = '%s not allowed after STATIC' % self.event.upper()
+        else:
+            method = Method(self.event, *self.args, **self.kwargs)
+            if (method.cache or method.coalesce) and method.method != 'get':
+                self.error = 'cache and coalesce not allowed on %s' % self.event.upper()
+                return
+            self.server.add_method(method)
+            if method.cache and not self._is_cached:
+                self._is_cached = True
+                self._add_config('cache.size', value=16 * 1024 * 1024, validator=config_file.validate_int)
+                self._add_config('cache.max_item', value=1024 * 1024, validator=config_file.validate_int)
+            if method.thread and not self._is_threaded:
+                self._is_threaded = True
+                self._add_config('threadpool.size', value=4, validator=config_file.validate_int)
+                self._add_config('threadpool.queue_depth', value=100, validator=config_file.validate_int)
+                self._add_config('threadpool.reject', value=True, validator=config_file.validate_bool)
 
     def act_add_required(self):
         self.connection.add_required(*self.args, **self.kwargs)
@@ -187,7 +216,11 @@ class Parser(object):
     def act_add_route(self):
         self.server.add_route(Route(*self.args, **self.kwargs))
 
+    def act_add_static(self):
+        self.server.add_route(Static(*self.args, **self.kwargs))
+
     def act_add_server(self):
+        self._add_json_config()
         server = Server(*self.args, **self.kwargs)
         if server.port in [s.port for s in self.servers.values()]:
             self.error = 'duplicate SERVER port: %s' % server.port
@@ -196,6 +229,18 @@ class Parser(object):
             self.server = server
             self._add_config('server.%s.port' % server.name, value=server.port, validator=config_file.validate_int)
             self._add_config('server.%s.is_active' % server.name, value=True, validator=config_file.validate_bool)
+            self._add_config('server.%s.backlog' % server.name, value=server.backlog, validator=config_file.validate_int)
+            self._add_config('server.%s.http_lean' % server.name, value=False, validator=config_file.validate_bool)
+            self._add_config('server.%s.http_keep_alive_timeout' % server.name, validator=config_file.validate_int)
+            self._add_config('server.%s.http_keep_alive_max' % server.name, validator=config_file.validate_int)
+            self._add_config('server.%s.http_stream' % server.name, value=False, validator=config_file.validate_bool)
+            self._add_config('server.%s.http_spill_threshold' % server.name, value=1024 * 1024, validator=config_file.validate_int)
+            self._add_config('server.%s.http_compress_threshold' % server.name, validator=config_file.validate_int)
+            self._add_config('server.%s.http_compress_level' % server.name, value=6, validator=config_file.validate_int)
+            self._add_config('server.%s.http_max_decompressed_length' % server.name, value=100 * 1024 * 1024, validator=config_file.validate_int)
+            self._add_config('server.%s.concurrency' % server.name, value=server.concurrency, validator=config_file.validate_int)
+            self._add_config('server.%s.rate' % server.name, value=server.rate, validator=float)
+            self._add_config('server.%s.burst' % server.name, value=server.burst, validator=config_file.validate_int)
             self._add_config('server.%s.ssl.is_active' % server.name, value=False, validator=config_file.validate_bool)
             self._add_config('server.%s.ssl.keyfile' % server.name, validator=config_file.validate_file)
             self._add_config('server.%s.ssl.certfile' % server.name, validator=config_file.validate_file)
@@ -210,6 +255,7 @@ class Parser(object):
             self.server = server
             self._add_config('%s.port' % server.name, value=server.port, validator=config_file.validate_int)
             self._add_config('%s.is_active' % server.name, value=True, validator=config_file.validate_bool)
+            self._add_config('%s.backlog' % server.name, value=server.backlog, validator=config_file.validate_int)
             self._add_config('%s.ssl.is_active' % server.name, value=False, validator=config_file.validate_bool)
             self._add_config('%s.ssl.keyfile' % server.name, validator=config_file.validate_file)
             self._add_config('%s.ssl.certfile' % server.name, validator=config_file.validate_file)
@@ -240,9 +286,13 @@ class Config(object):
 
 class Server(object):
 
-    def __init__(self, name, port):
+    def __init__(self, name, port, backlog=100, concurrency=None, rate=None, burst=None):
         self.name = name
         self.port = int(port)
+        self.backlog = int(backlog)
+        self.concurrency = int(concurrency) if concurrency is not None else None
+        self.rate = float(rate) if rate is not None else None
+        self.burst = int(burst) if burst is not None else None
         self.routes = []
 
     def __repr__(self):
@@ -254,31 +304,57 @@ class Server(object):
 
     def add_method(self, method):
         self.route.methods[method.method] = method.path
+        if method.thread:
+            self.route.threaded.add(method.method)
+        else:
+            self.route.threaded.discard(method.method)
+        if method.method == 'get':
+            self.route.cache = method.cache
+            self.route.coalesce = method.coalesce
 
 
 class Route(object):
 
-    def __init__(self, pattern):
+    def __init__(self, pattern, concurrency=None, rate=None, burst=None):
         self.pattern = pattern
+        self.concurrency = int(concurrency) if concurrency is not None else None
+        self.rate = float(rate) if rate is not None else None
+        self.burst = int(burst) if burst is not None else None
         self.methods = {}
+        self.threaded = set()  # methods run on the thread pool
+        self.cache = None  # seconds to cache GET responses
+        self.coalesce = False  # share one GET handler call among identical concurrent requests
+
+    def __repr__(self):
+        return 'Route[pattern=%s, methods=%s, threaded=%s, cache=%s, coalesce=%s]' % (self.pattern, self.methods, sorted(self.threaded), self.cache, self.coalesce)
+
+
+class Static(object):
+
+    def __init__(self, pattern, root):
+        self.pattern = pattern
+        self.root = root
 
     def __repr__(self):
-        return 'Route[pattern=%s, methods=%s]' % (self.pattern, self.methods)
+        return 'Static[pattern=%s, root=%s]' % (self.pattern, self.root)
 
 
 class Method(object):
 
-    def __init__(self, method, path):
+    def __init__(self, method, path, thread=False, cache=None, coalesce=False):
         self.method = method.lower()
         self.path = path
+        self.thread = config_file.validate_bool(thread)
+        self.cache = config_file.validate_int(cache) if cache is not None else None
+        self.coalesce = config_file.validate_bool(coalesce)
 
     def __repr__(self):
-        return 'Method[method=%s, path=%s]' % (self.method, self.path)
+        return 'Method[method=%s, path=%s, thread=%s, cache=%s, coalesce=%s]' % (self.method, self.path, self.thread, self.cache, self.coalesce)
 
 
 class Connection(object):
 
-    def __init__(self, name, url=None, is_json=True, is_debug=False, timeout=5.0, handler=None, wrapper=None, setup=None, is_form=False, code=None):
+    def __init__(self, name, url=None, is_json=True, is_debug=False, timeout=5.0, handler=None, wrapper=None, setup=None, is_form=False, code=None, compress=False):
         self.name = name
         self.url = url
         self.is_json = config_file.validate_bool(is_json)
@@ -289,6 +365,7 @@ class Connection(object):
         self.setup = setup
         self.is_form = config_file.validate_bool(is_form)
         self.code = code
+        self.compress = config_file.validate_bool(compress)
 
         self.headers = {}
         self.resources = {}
@@ -25,6 +25,7 @@ import logging
 
 import rhc.httphandler as httphandler
 import rhc.resthandler as resthandler
+from rhc.headers import HTTPHeaders
 
 
 log = logging.getLogger(__name__)
@@ -45,7 +46,10 @@ class MockHandler(httphandler.HTTPHandler):
         self._setup()
         self.id = -1
         self.context = Context()
-        self.__dict__.update(kwargs)
+        for name, value in kwargs.items():
+            if name == 'http_headers' and isinstance(value, dict):
+                value = HTTPHeaders(value)  # case-insensitive, like a real request's
+            setattr(self, name, value)  # setattr, so that properties (http_query) are honored
 
 
 class MockRequest(resthandler.RESTRequest):
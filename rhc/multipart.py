@@ -0,0 +1,192 @@
+'''
+The MIT License (MIT)
+
+Copyright (c) 2013-2017 Robert H Chase
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+'''
+import tempfile
+
+from headers import HTTPHeaders
+
+
+class MultipartError(ValueError):
+    pass
+
+
+class HTTPPart(object):
+
+    def __init__(self, headers, disposition, content=None, file=None):
+        '''
+            Container for one part of a multipart message.
+
+            The disposition is a dict with the k:v pairs from the 'Content-Disposition'
+            header, where things like filename are stored.
+
+            If the part was parsed incrementally, its data is in file (positioned at
+            the start) and content is read from file on first use.
+        '''
+        self.headers = headers
+        self.disposition = disposition
+        self.file = file
+        self._content = content
+
+    @property
+    def content(self):
+        if self._content is None and self.file is not None:
+            self._content = self.file.read()
+            self.file.seek(0)
+        return self._content
+
+    @content.setter
+    def content(self, value):
+        self._content = value
+
+
+def parse_part_headers(lines):
+    ''' header lines -> (headers, disposition) '''
+    headers = HTTPHeaders()
+    for line in lines:
+        name, value = line.split(': ', 1)
+        headers.add(name, value)
+    disposition = {}
+    if 'Content-Disposition' in headers:
+        headers['Content-Disposition'], rem = headers['Content-Disposition'].split('; ', 1)
+        disposition = dict(part.split('=', 1) for part in rem.split('; '))
+    return headers, disposition
+
+
+class MultipartParser(object):
+
+    '''
+      Incremental multipart/form-data parser.
+
+      Data is passed to feed as it arrives; each part's data is written to a
+      file as it is parsed, so memory use is bounded by the size of a read
+      plus the boundary, not by the size of the message.
+
+      When a part's headers have been parsed, on_part(part) is called. It can
+      return a writable file-like object to receive the part's data (for
+      instance, a file on disk for an upload); otherwise, the data goes to a
+      SpooledTemporaryFile which moves to disk after spill_threshold bytes.
+      After the part's data is complete, part.file is positioned at the start
+      (if it can seek) and on_part_end(part) is called.
+
+      The completed parts are in the parts list. Malformed data raises
+      MultipartError.
+    '''
+    def __init__(self, boundary, on_part=None, on_part_end=None, spill_threshold=1024 * 1024, max_header_length=16384):
+        self.delimiter = b'\r\n--' + boundary
+        self.on_part = on_part
+        self.on_part_end = on_part_end
+        self.spill_threshold = spill_threshold
+        self.max_header_length = max_header_length
+        self.parts = []
+        self.is_done = False
+
+        self._data = bytearray(b'\r\n')  # the first delimiter isn't preceded by a CRLF; pretend it is
+        self._cursor = 0
+        self._part = None
+        self._state = self._preamble
+
+    def feed(self, data):
+        self._data += data
+        while self._state():
+            pass
+        if self._cursor:
+            del self._data[:self._cursor]
+            self._cursor = 0
+
+    def close(self):
+        ''' check that the message ended properly '''
+        if not self.is_done:
+            raise MultipartError('incomplete multipart message')
+
+    def _find_delimiter(self):
+        return self._data.find(self.delimiter, self._cursor)
+
+    def _preamble(self):
+        end = self._find_delimiter()
+        if end == -1:
+            self._cursor = max(self._cursor, len(self._data) - len(self.delimiter))  # discard, keeping a possible partial delimiter
+            return False
+        self._cursor = end + len(self.delimiter)
+        self._state = self._after_delimiter
+        return True
+
+    def _after_delimiter(self):
+        if len(self._data) - self._cursor < 2:
+            return False
+        marker = str(self._data[self._cursor:self._cursor + 2])
+        self._cursor += 2
+        if marker == '--':
+            self.is_done = True
+            self._state = self._epilogue
+        elif marker == '\r\n':
+            self._state = self._headers
+        else:
+            raise MultipartError('invalid multipart boundary')
+        return True
+
+    def _headers(self):
+        if len(self._data) - self._cursor < 2:
+            return False
+        if self._data.startswith(b'\r\n', self._cursor):  # no headers at all
+            end = self._cursor - 2
+        else:
+            end = self._data.find(b'\r\n\r\n', self._cursor)
+            if end == -1:
+                if len(self._data) - self._cursor > self.max_header_length:
+                    raise MultipartError('multipart headers too long')
+                return False
+        lines = str(self._data[self._cursor:end]).split('\r\n') if end > self._cursor else []
+        self._cursor = end + 4
+        try:
+            headers, disposition = parse_part_headers(lines)
+        except ValueError:
+            raise MultipartError('invalid multipart header')
+        self._part = HTTPPart(headers, disposition)
+        target = self.on_part(self._part) if self.on_part else None
+        self._part.file = target if target is not None else tempfile.SpooledTemporaryFile(max_size=self.spill_threshold)
+        self._state = self._content
+        return True
+
+    def _content(self):
+        end = self._find_delimiter()
+        if end == -1:
+            end = len(self._data) - len(self.delimiter) + 1  # keep what might be the start of a delimiter
+            if end > self._cursor:
+                self._part.file.write(buffer(self._data, self._cursor, end - self._cursor))
+                self._cursor = end
+            return False
+        if end > self._cursor:
+            self._part.file.write(buffer(self._data, self._cursor, end - self._cursor))
+        self._cursor = end + len(self.delimiter)
+        part, self._part = self._part, None
+        if hasattr(part.file, 'seek'):
+            part.file.seek(0)
+        self.parts.append(part)
+        if self.on_part_end:
+            self.on_part_end(part)
+        self._state = self._after_delimiter
+        return True
+
+    def _epilogue(self):
+        self._cursor = len(self._data)
+        return False
@@ -0,0 +1,145 @@
+'''
+The MIT License (MIT)
+
+Copyright (c) 2013-2017 Robert H Chase
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+'''
+import errno
+import os
+import signal
+import time
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class Shutdown(BaseException):
+    '''
+      Raised in a worker process when the supervisor asks it to stop.
+
+      This is a BaseException (like KeyboardInterrupt) so that it passes
+      through the "except Exception" guards in service loops.
+    '''
+    pass
+
+
+def _on_shutdown(signum, frame):
+    raise Shutdown()
+
+
+class Supervisor(object):
+
+    '''
+      Run a function in a number of pre-forked worker processes.
+
+      Each worker calls worker_fn(index), where index is in range(workers).
+      Anything set up before the supervisor is started is shared (copy on
+      write) by the workers; listening sockets should be created by each
+      worker using SO_REUSEPORT so that the kernel spreads connections
+      across the workers.
+
+      If a worker exits while the supervisor is running, it is restarted
+      after restart_delay seconds (to prevent a fork loop if a worker fails
+      during startup).
+
+      SIGTERM and SIGINT received by the supervisor are forwarded to every
+      worker as SIGTERM; the supervisor then waits for the workers to exit.
+      In a worker, SIGTERM raises Shutdown and SIGINT is ignored (a terminal
+      ^C reaches the whole process group, the supervisor forwards it).
+    '''
+    def __init__(self, worker_fn, workers, restart_delay=1.0):
+        self.worker_fn = worker_fn
+        self.workers = workers
+        self.restart_delay = restart_delay
+        self.is_stopping = False
+        self._pids = {}  # pid: index
+
+    def __len__(self):
+        return len(self._pids)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        self.start()
+        while self._wait():
+            pass
+        log.info('all workers stopped')
+
+    def start(self):
+        for index in range(self.workers):
+            self._spawn(index)
+
+    def stop(self):
+        self.is_stopping = True
+        for pid in self._pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    def _on_signal(self, signum, frame):
+        log.info('received signal %d, stopping workers', signum)
+        self.stop()
+
+    def _spawn(self, index):
+        pid = os.fork()
+        if pid == 0:
+            rc = 0
+            try:
+                signal.signal(signal.SIGTERM, _on_shutdown)
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+                self.worker_fn(index)
+            except Shutdown:
+                pass
+            except BaseException:
+                log.exception('worker %d failed', index)
+                rc = 1
+            finally:
+                os._exit(rc)
+        log.info('started worker %d, pid=%d', index, pid)
+        self._pids[pid] = index
+
+    def _wait(self):
+        '''
+          wait for a worker to exit, restarting it if appropriate
+
+          return False when there are no more workers
+        '''
+        if not self._pids:
+            return False
+        try:
+            pid, status = os.wait()
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                return True
+            if e.errno == errno.ECHILD:
+                self._pids = {}
+                return False
+            raise
+        index = self._pids.pop(pid, None)
+        if index is not None:
+            if self.is_stopping:
+                log.info('worker %d stopped, pid=%d', index, pid)
+            else:
+                log.warning('worker %d exited, pid=%d, status=%d; restarting', index, pid, status)
+                time.sleep(self.restart_delay)
+                if not self.is_stopping:
+                    self._spawn(index)
+        return len(self._pids) > 0
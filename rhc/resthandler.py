@@ -21,20 +21,32 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 '''
+import collections
 import datetime
-import json
 import re
 import sys
 import time
 import traceback
 import types
 import urlparse
+from StringIO import StringIO
 
-from httphandler import HTTPHandler
+from admission import Admission
+from cache import CACHE
+from httphandler import HTTPHandler, parse_query, serialize_headers
+from metrics import METRICS
+from router import Router
+from timer import TIMERS
+import coroutine
+import jsoncodec
 
 import logging
 log = logging.getLogger(__name__)
 
+_COALESCED = METRICS.counter('rhc_rest_coalesced', 'requests answered with the response to an identical request in progress')
+
+IN_FLIGHT = {}  # (RESTMapping, method, resource, query) -> [(handler, request, rest_handler, groups), ...], for coalescing mappings
+
 
 class RESTRequest(object):
 
@@ -43,15 +55,63 @@ class RESTRequest(object):
         self.context = handler.context.context  # context from RESTMapper
         self.http_message = handler.http_message
         self.http_headers = handler.http_headers
-        self.http_content = handler.http_content
+        self._http_body = getattr(handler, 'http_body', None)  # set in streaming mode (see HTTPHandler)
+        self._http_content = handler.http_content if self._http_body is None else None  # read from http_body on first use
+        self._charset = handler.http_content_charset  # set if decode is deferred (lean or streaming mode)
         self.http_method = handler.http_method
         self.http_multipart = handler.http_multipart
         self.http_resource = handler.http_resource
         self.http_query_string = handler.http_query_string
-        self.http_query = handler.http_query
-        self.timestamp = datetime.datetime.now()
+        self._http_query = handler._http_query  # None until parsed (lean mode)
+        self._t_http_data = getattr(handler, 't_http_data', None) or time.time()
+        self._timestamp = None
+        self._sequence = getattr(handler, '_rest_sequence', None)  # position on the connection (see RESTHandler)
         self.is_delayed = False
 
+    @property
+    def http_body(self):
+        '''
+            the request body as a file-like object
+
+            in streaming mode, this is the file the body was spooled into
+            (see HTTPHandler); otherwise, it is a file over http_content.
+        '''
+        if self._http_body is None:
+            self._http_body = StringIO(self.http_content)
+        return self._http_body
+
+    @property
+    def http_content(self):
+        if self._http_content is None:  # streaming mode: read the body (once) on first use
+            self._http_content = self._http_body.read()
+            self._http_body.seek(0)
+        if self._charset:
+            self._http_content = self._http_content.decode(self._charset)
+            self._charset = None
+        return self._http_content
+
+    @http_content.setter
+    def http_content(self, value):
+        self._http_content = value
+        self._charset = None
+
+    @property
+    def http_query(self):
+        if self._http_query is None:
+            self._http_query = parse_query(self.http_query_string)
+        return self._http_query
+
+    @http_query.setter
+    def http_query(self, value):
+        self._http_query = value
+
+    @property
+    def timestamp(self):
+        ''' when the request arrived, as a datetime '''
+        if self._timestamp is None:
+            self._timestamp = datetime.datetime.fromtimestamp(self._t_http_data)
+        return self._timestamp
+
     def delay(self):
         self.is_delayed = True
 
@@ -123,15 +183,22 @@ class RESTRequest(object):
         else:
             result = RESTResult(*args, **kwargs)
         result.close = self.http_headers.get('Connection') == 'close'  # grab Connection from cached headers in case they have been cleared on the HTTPHandler
+        result.sequence = self._sequence
         self.is_delayed = True  # treat as delayed to stop on_http_data from responding a second time in the non-delay case
         self.handler.rest_response(result)
 
+    def _exception(self, exception_type, exception_value, exception_traceback):
+        ''' respond to an exception raised after the request was delayed '''
+        self.is_delayed = True
+        close = self.http_headers.get('Connection') == 'close'
+        self.handler._rest_exception(exception_type, exception_value, exception_traceback, close, self._sequence)
+
     @property
     def json(self):
         if not hasattr(self, '_json'):
             if self.http_content and self.http_content.lstrip()[0] in '[{':
                 try:
-                    self._json = json.loads(self.http_content)
+                    self._json = jsoncodec.loads(self.http_content, 'rest.request')
                 except Exception:
                     raise Exception('Unable to parse json content')
             elif len(self.http_query) > 0:
@@ -146,10 +213,11 @@ class RESTResult(object):
 
         self.code = code
         self.close = False
+        self.sequence = None
 
         if isinstance(content, (types.DictType, types.ListType, types.FloatType, types.BooleanType, types.IntType)):
             try:
-                content = json.dumps(content)
+                content = jsoncodec.dumps(content, 'rest.response')
                 content_type = 'application/json; charset=utf-8'
             except Exception:
                 content = str(content)
@@ -164,12 +232,17 @@ class RESTResult(object):
                 200: 'OK',
                 201: 'Created',
                 204: 'No Content',
+                206: 'Partial Content',
                 302: 'Found',
+                304: 'Not Modified',
                 400: 'Bad Request',
                 401: 'Unauthorized',
                 403: 'Forbidden',
                 404: 'Not Found',
+                416: 'Range Not Satisfiable',
+                429: 'Too Many Requests',
                 500: 'Internal Server Error',
+                503: 'Service Unavailable',
             }.get(code, '')
         self.message = message
         self.content = content
@@ -202,31 +275,218 @@ class RESTHandler(HTTPHandler):
         request object; the socket will remain open and set the
         is_delayed flag on the RESTRequest.
 
+        If the content of a RESTResult is an iterator (for instance, the
+        result of a generator function: return 200, rows(), None, None,
+        'text/csv'), the response is sent with 'Transfer-Encoding: chunked',
+        one string from the iterator at a time; the next one is pulled when
+        the socket has taken the previous one (see
+        HTTPHandler.send_server_chunked). Responses to any pipelined
+        requests wait until the last chunk is sent.
+
+        A rest_handler can also be a generator, which is run as a coroutine
+        (see rhc.coroutine): it yields partials, and its final value (raise
+        coroutine.Return(result)) is the response. A PartialError that
+        escapes the generator is responded to with (400, result), like
+        RESTRequest.defer.
+
+        Connections are persistent (HTTP/1.1 keep-alive), and requests can be
+        pipelined. Each request on a connection gets a sequence number, and
+        responses are sent in request order: a response that is ready before
+        the responses to earlier (delayed) requests waits for them.
+
+        GET responses from a mapping added with cache=seconds are kept in
+        rest_cache (see rhc.cache): a request for the same resource and query
+        is answered from the cache, without calling the rest_handler, until
+        the entry expires. These responses have an ETag, and a request with
+        a matching If-None-Match gets '304 Not Modified'. Entries are kept by
+        mapping, since rest_cache is shared by every server.
+
+        A mapping added with coalesce=True runs its rest_handler once for
+        identical concurrent GETs (same mapping, method, resource and query
+        string), on any connection: while one is in progress (for instance, deferred
+        on an upstream Connection), the others wait in IN_FLIGHT and are
+        sent the same response. If that response never comes, neither do
+        theirs, so a coalescing rest_handler must always respond (the
+        timeout on an async Connection takes care of this for defer). An
+        iterator response isn't shared, since a slow connection would make
+        the others' chunks pile up: the rest_handler is run again for each
+        waiting request instead.
+
+        Admission limits (see rhc.admission and RESTMapper.limit) are checked
+        before anything else is done for a request: for the server (the
+        RESTMapper), then for the matched mapping. A request over a limit
+        is answered right away, with '503 Service Unavailable' (too many in
+        progress) or '429 Too Many Requests' (rate), and a Retry-After
+        header. An admitted request is in progress until its response is
+        sent, or the connection closes.
+
+        Keep-alive limits (None means no limit):
+            http_keep_alive_timeout - seconds a connection can go without
+                                      receiving data while no request is in
+                                      progress (uses TIMERS)
+            http_keep_alive_max     - requests per connection; the response
+                                      to the last one has 'Connection: close',
+                                      and anything received after it is
+                                      ignored
+
         Callback methods:
             on_rest_data(self, *groups)
             on_rest_exception(self, exc_type, exc_value, exc_traceback)
             on_rest_send(self, code, message, content, headers)
+            on_rest_shed(self, code)
     '''
 
+    def __init__(self, socket, context=None):
+        super(RESTHandler, self).__init__(socket, context)
+        self.http_keep_alive_timeout = None
+        self.http_keep_alive_max = None
+        self._rest_sequence = None  # sequence of the most recent request
+        self._rest_received = 0  # number of requests received
+        self._rest_next = 0  # sequence of the next response to send
+        self._rest_ready = {}  # sequence -> response, for responses waiting their turn
+        self._rest_response_args = {}  # sequence -> (Accept-Encoding, route header block), when needed
+        self._rest_cache_keys = {}  # sequence -> (resource, query, RESTMapping, If-None-Match), for responses to cache
+        self._rest_coalesce_keys = {}  # sequence -> IN_FLIGHT key, for responses that other requests are waiting for
+        self._rest_admitted = {}  # sequence -> [Admission, ...], released when the response is sent
+        self._rest_closing = set()  # sequences of requests with 'Connection: close'
+        self.rest_cache = CACHE
+        self._rest_timer = None
+        self._rest_t_active = 0
+
+    def _on_ready(self):
+        super(RESTHandler, self)._on_ready()
+        if self.http_keep_alive_timeout:
+            self._rest_t_active = time.time()
+            self._rest_timer = TIMERS.add(self._rest_on_idle, self.http_keep_alive_timeout * 1000.0).start()
+
+    def _rest_on_idle(self):
+        if self.closed:
+            return
+        remaining = self.http_keep_alive_timeout
+        if self._rest_next == self._rest_received and not self.is_sending_chunked:  # no request in progress
+            remaining -= time.time() - self._rest_t_active
+            if remaining <= 0:
+                return self.close('keep-alive timeout')
+        self._rest_timer = TIMERS.add(self._rest_on_idle, remaining * 1000.0).start()
+
+    def _on_close(self):
+        if self._rest_timer:
+            self._rest_timer.cancel()
+            self._rest_timer = None
+        for admitted in self._rest_admitted.values():
+            for admission in admitted:
+                admission.release()
+        self._rest_admitted = {}
+
+    def on_data(self, data):
+        if self._rest_at_max:
+            return  # closing after the last allowed response
+        if self._rest_timer:
+            self._rest_t_active = time.time()
+        super(RESTHandler, self).on_data(data)
+
+    @property
+    def _rest_at_max(self):
+        return self.http_keep_alive_max and self._rest_received >= self.http_keep_alive_max
+
     def on_http_data(self):
-        handler, groups = self.context._match(self.http_resource, self.http_method)
+        if self._rest_at_max:
+            return  # pipelined past http_keep_alive_max; don't run the handler for a response that won't be sent
+        self._rest_sequence = self._rest_received
+        self._rest_received += 1
+        if self.http_headers.get('Connection') == 'close':
+            self._rest_closing.add(self._rest_sequence)
+        handler, groups, mapping = self.context._lookup(self.http_resource, self.http_method)
+        accept_encoding = self.http_headers.get('Accept-Encoding', '') if self.http_compress_threshold is not None else None
+        header_block = mapping.header_block if mapping else ''
+        if accept_encoding is not None or header_block:
+            self._rest_response_args[self._rest_sequence] = accept_encoding, header_block
         if handler:
+            if self._rest_shed(mapping):
+                return
             try:
                 request = RESTRequest(self)
                 self.on_rest_data(request, *groups)
+                if mapping.cache and self.http_method == 'GET' and self._rest_from_cache(mapping):
+                    return
+                if mapping.coalesce and self.http_method == 'GET' and self._rest_join(mapping, request, handler, groups):
+                    return
                 result = handler(request, *groups)
-                if not request.is_delayed:
+                if isinstance(result, types.GeneratorType):
+                    self._rest_coroutine(request, result)
+                elif not request.is_delayed:
                     self.rest_response(RESTResult.coerce(result))
             except Exception:
-                content = self.on_rest_exception(*sys.exc_info())
-                kwargs = dict(code=501, message='Internal Server Error')
-                if content:
-                    kwargs['content'] = str(content)
-                self._rest_send(**kwargs)
+                self._rest_exception(*sys.exc_info())
         else:
             self.on_rest_no_match()
             self._rest_send(code=404, message='Not Found')
 
+    def _rest_shed(self, mapping):
+        ''' admit the request, or reject it and return True '''
+        admitted = []
+        for admission in (self.context.admission, mapping.admission):
+            if admission is None:
+                continue
+            rejected = admission.admit()
+            if rejected:
+                for a in admitted:
+                    a.release()
+                code, message, retry_after = rejected
+                self.on_rest_shed(code)
+                self._rest_send(code=code, message=message, headers={'Retry-After': retry_after})
+                return True
+            admitted.append(admission)
+        if admitted:
+            self._rest_admitted[self._rest_sequence] = admitted
+        return False
+
+    def _rest_from_cache(self, mapping):
+        ''' respond from rest_cache if possible; otherwise, arrange for the response to be cached '''
+        if_none_match = self.http_headers.get('If-None-Match')
+        entry = self.rest_cache.get(self.http_resource, self.http_query_string, mapping)
+        if entry is None:
+            self._rest_cache_keys[self._rest_sequence] = (self.http_resource, self.http_query_string, mapping, if_none_match)
+            return False
+        self._rest_send(*self._rest_cached_response(entry, if_none_match))
+        return True
+
+    def _rest_join(self, mapping, request, rest_handler, groups):
+        ''' wait for an identical request in progress, or become the one that others wait for '''
+        key = (mapping, self.http_method, self.http_resource, self.http_query_string)
+        waiting = IN_FLIGHT.get(key)
+        if waiting is None:
+            IN_FLIGHT[key] = []
+            self._rest_coalesce_keys[self._rest_sequence] = key
+            return False
+        waiting.append((self, request, rest_handler, groups))
+        _COALESCED.inc()
+        return True
+
+    def _rest_cached_response(self, entry, if_none_match):
+        ''' (content, code, message, headers) for a CachedResponse '''
+        if self.rest_cache.not_modified(entry, if_none_match):
+            return None, 304, 'Not Modified', {'ETag': entry.etag}
+        headers = dict(entry.headers)
+        headers['ETag'] = entry.etag
+        return entry.content, 200, 'OK', headers
+
+    def _rest_coroutine(self, request, generator):
+        def on_complete(rc, result):
+            if rc == 0:
+                request.respond(result)
+            else:
+                request.respond(400, result)
+        request.delay()
+        coroutine.run(generator, on_complete, request._exception)
+
+    def _rest_exception(self, exception_type, exception_value, exception_traceback, close=False, sequence=None):
+        content = self.on_rest_exception(exception_type, exception_value, exception_traceback)
+        kwargs = dict(code=501, message='Internal Server Error', close=close, sequence=sequence)
+        if content:
+            kwargs['content'] = str(content)
+        self._rest_send(**kwargs)
+
     def on_rest_data(self, request, *groups):
         ''' called on rest_handler match '''
         pass
@@ -234,9 +494,13 @@ class RESTHandler(HTTPHandler):
     def on_rest_no_match(self):
         pass
 
+    def on_rest_shed(self, code):
+        ''' called when a request is rejected by an admission limit (code is 503 or 429) '''
+        pass
+
     def rest_response(self, result):
         result = RESTResult.coerce(result)
-        self._rest_send(result.content, result.code, result.message, result.headers, result.close)
+        self._rest_send(result.content, result.code, result.message, result.headers, result.close, result.sequence)
 
     def on_rest_exception(self, exception_type, exception_value, exception_traceback):
         ''' handle Exception raised during REST processing
@@ -253,14 +517,89 @@ class RESTHandler(HTTPHandler):
         '''
         return None
 
-    def _rest_send(self, content=None, code=200, message='OK', headers=None, close=False):
-        args = dict(code=code, message=message, close=close)
-        if content:
-            args['content'] = content
-        if headers:
-            args['headers'] = headers
-        self.on_rest_send(code, message, content, headers)
-        self.send_server(**args)
+    def _rest_send(self, content=None, code=200, message='OK', headers=None, close=False, sequence=None):
+        if sequence is None:  # responding to the current request
+            sequence = self._rest_sequence
+        if sequence is None:
+            sequence = self._rest_next  # not in response to a request
+        elif sequence < self._rest_next:
+            return log.warning('cid=%s: dropping second response to request %d', getattr(self, 'id', '.'), sequence)
+        if sequence in self._rest_closing:
+            self._rest_closing.discard(sequence)
+            close = True
+        for admission in self._rest_admitted.pop(sequence, ()):
+            admission.release()
+        coalesce_key = self._rest_coalesce_keys.pop(sequence, None)
+        if coalesce_key:
+            content = self._rest_release(coalesce_key, content, code, message, headers)
+        cache_key = self._rest_cache_keys.pop(sequence, None)
+        if cache_key and code == 200 and isinstance(content, basestring):
+            resource, query, mapping, if_none_match = cache_key
+            entry = self.rest_cache.add(resource, query, content, headers, mapping.cache, mapping)
+            content, code, message, headers = self._rest_cached_response(entry, if_none_match)
+        if self.http_keep_alive_max and sequence + 1 >= self.http_keep_alive_max:
+            close = True
+        if close:
+            headers = dict(headers) if headers else {}
+            headers['Connection'] = 'close'
+        accept_encoding, header_block = self._rest_response_args.pop(sequence, (None, ''))
+        self._rest_ready[sequence] = (content, code, message, headers, close, accept_encoding, header_block)
+        self._rest_flush()
+
+    @staticmethod
+    def _rest_release(key, content, code, message, headers):
+        ''' send a response to the requests waiting on key; return the content to use for this one '''
+        waiting = IN_FLIGHT.pop(key)
+        is_iterator = isinstance(content, collections.Iterator)
+        for handler, request, rest_handler, groups in waiting:
+            if handler.closed:
+                continue
+            if is_iterator:
+                handler._rest_call(request, rest_handler, groups)  # each connection gets its own iterator
+            else:
+                close = request.http_headers.get('Connection') == 'close'
+                handler._rest_send(content, code, message, dict(headers) if headers else None, close, request._sequence)
+        return content
+
+    def _rest_call(self, request, rest_handler, groups):
+        ''' run rest_handler for a request that isn't the current one '''
+        try:
+            result = rest_handler(request, *groups)
+            if isinstance(result, types.GeneratorType):
+                self._rest_coroutine(request, result)
+            elif not request.is_delayed:
+                request.respond(result)
+        except Exception:
+            request._exception(*sys.exc_info())
+
+    def _rest_flush(self):
+        while self._rest_next in self._rest_ready and not self.is_sending_chunked:  # send everything that is ready, in order
+            content, code, message, headers, close, accept_encoding, header_block = self._rest_ready.pop(self._rest_next)
+            self._rest_next += 1
+            self.on_rest_send(code, message, content, headers)
+            if isinstance(content, collections.Iterator):
+                self.send_server_chunked(content, code, message, headers, close, accept_encoding, header_block)
+            else:
+                args = dict(code=code, message=message, close=close, accept_encoding=accept_encoding, header_block=header_block)
+                if content:
+                    args['content'] = content
+                if headers:
+                    args['headers'] = headers
+                self.send_server(**args)
+            if close:
+                self._rest_ready = {}
+                self._rest_response_args = {}
+                self._rest_cache_keys = {}
+                self._rest_closing = set()
+                break
+        self._rest_t_active = time.time()
+
+    def _on_chunked_complete(self):
+        self._rest_flush()
+
+    def _on_chunked_error(self, exception_type, exception_value, exception_traceback):
+        self.on_rest_exception(exception_type, exception_value, exception_traceback)
+        super(RESTHandler, self)._on_chunked_error(exception_type, exception_value, exception_traceback)
 
     def on_rest_send(self, code, message, content, headers):
         pass
@@ -283,6 +622,9 @@ class LoggingRESTHandler(RESTHandler):
     def on_rest_no_match(self):
         log.warning('no match cid=%d, method=%s, resource=%s', self.id, self.http_method, self.http_resource)
 
+    def on_rest_shed(self, code):
+        log.warning('shed cid=%d, code=%d, method=%s, resource=%s', self.id, code, self.http_method, self.http_resource)
+
     def on_http_error(self):
         log.warning('http error cid=%d: %s', self.id, self.error)
 
@@ -309,13 +651,15 @@ class RESTMapper(object):
     def __init__(self, context=None):
         self.context = context
         self.__mapping = []
+        self.__router = None
+        self.admission = None
         self.map()
 
     def map(self):
         '''convenience function for initialization '''
         pass
 
-    def add(self, pattern, get=None, post=None, put=None, delete=None):
+    def add(self, pattern, get=None, post=None, put=None, delete=None, headers=None, cache=None, coalesce=False, concurrency=None, rate=None, burst=None):
         '''
             Add a mapping between a URI and a CRUD method.
 
@@ -340,8 +684,55 @@ class RESTMapper(object):
 
                 in this case, my_func must be defined to take the
                 parameter.
+
+            If headers (a dict) is specified, the headers are added to
+            every response from this mapping. They are serialized once,
+            here, instead of on every response.
+
+            If cache (seconds) is specified, 200 responses to GET are
+            cached for that long, by resource and query string (see
+            RESTHandler and rhc.cache).
+
+            If coalesce is True, identical concurrent GETs share one call
+            to the rest_handler, and its response, unless the response is
+            an iterator (see RESTHandler).
+
+            If concurrency or rate is specified, requests for this mapping
+            are limited as described in limit.
+        '''
+        self.__mapping.append(RESTMapping(pattern, get, post, put, delete, headers, cache, coalesce, concurrency, rate, burst))
+        self.__router = None
+
+    def limit(self, concurrency=None, rate=None, burst=None):
+        '''
+            Limit the requests handled by the server (all mappings).
+
+            concurrency is the maximum number of requests in progress; rate
+            is the maximum number of requests per second, with up to burst
+            requests at once (see rhc.admission). Excess requests are
+            rejected with 503 or 429 before their rest_handler is called.
+        '''
+        self.admission = Admission(concurrency, rate, burst) if concurrency or rate else None
+
+    def add_static(self, pattern, root):
+        '''
+            Add a mapping which serves GETs with files from a directory.
+
+            The last group in the pattern is the path of the file relative
+            to root. See rhc.static.serve.
+
+            For example:
+
+                add_static('/assets/(.*)$', '/var/www/assets')
+
+                will respond to:
+
+                    GET /assets/css/main.css HTTP/1.1
+
+                with the content of /var/www/assets/css/main.css
         '''
-        self.__mapping.append(RESTMapping(pattern, get, post, put, delete))
+        from rhc.static import handler  # static imports this module
+        self.add(pattern, get=handler(root))
 
     def _match(self, resource, method):
         '''
@@ -353,17 +744,27 @@ class RESTMapper(object):
             is called by the on_http_data method of the
             RESTHandler.
 
-            Step through the mappings in the order they were defined
-            and look for a match on the regex which also has a method
-            defined.
+            The result is the same as stepping through the mappings in
+            the order they were defined and looking for a match on the
+            regex which also has a method defined (but see compile).
+        '''
+        handler, groups, _ = self._lookup(resource, method)
+        return handler, groups
+
+    def _lookup(self, resource, method):
+        ''' like _match, returning (handler, groups, RESTMapping) '''
+        if self.__router is None:
+            self.compile()
+        return self.__router.lookup(resource, method)
+
+    def compile(self):
+        '''
+            Build the lookup structure for the mappings (see rhc.router).
+
+            This happens on the first _match after a mapping is added; call
+            it after the last add to do the work at startup instead.
         '''
-        for mapping in self.__mapping:
-            m = mapping.pattern.match(resource)
-            if m:
-                handler = mapping.method.get(method.lower())
-                if handler:
-                    return handler, m.groups()
-        return None, None
+        self.__router = Router([(mapping.pattern, mapping.method, mapping) for mapping in self.__mapping])
 
 
 def import_by_pathname(target):
@@ -380,8 +781,12 @@ class RESTMapping(object):
 
     ''' container for one mapping definition '''
 
-    def __init__(self, pattern, get, post, put, delete):
+    def __init__(self, pattern, get, post, put, delete, headers=None, cache=None, coalesce=False, concurrency=None, rate=None, burst=None):
         self.pattern = re.compile(pattern)
+        self.header_block = serialize_headers(headers) if headers else ''
+        self.cache = cache
+        self.coalesce = coalesce
+        self.admission = Admission(concurrency, rate, burst) if concurrency or rate else None
         self.method = {
             'get': import_by_pathname(get),
             'post': import_by_pathname(post),
@@ -0,0 +1,237 @@
+'''
+The MIT License (MIT)
+
+Copyright (c) 2013-2017 Robert H Chase
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+'''
+import re
+
+
+MAX_GROUPS = 99  # python's re supports 100 groups per pattern
+_BACKREFERENCE = re.compile(r'\\[1-9]|\(\?P=')
+
+
+def literal_prefix(pattern):
+    '''
+      the literal text that every re.match of pattern starts with
+
+      this is conservative: it stops at the first special character, and
+      is empty if the pattern has a top-level alternation.
+    '''
+    if _has_alternation(pattern):
+        return ''
+    prefix = []
+    i = 1 if pattern.startswith('^') else 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            if i + 1 == len(pattern) or pattern[i + 1].isalnum():
+                break  # a character class (\d) or an escape with a special meaning (\A)
+            c = pattern[i + 1]
+            step = 2
+        elif c in '.^$*+?{}[]|()':
+            break
+        else:
+            step = 1
+        if pattern[i + step:i + step + 1] in ('*', '?', '{'):
+            break  # the character is optional
+        prefix.append(c)
+        i += step
+    return ''.join(prefix)
+
+
+def _has_alternation(pattern):
+    depth, i, in_class = 0, 0, False
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\':
+            i += 1
+        elif in_class:
+            in_class = c != ']'
+        elif c == '[':
+            in_class = True
+            if pattern[i + 1:i + 2] == '^':
+                i += 1
+            if pattern[i + 1:i + 2] == ']':
+                i += 1  # a leading ']' is part of the class
+        elif c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        elif c == '|' and depth == 0:
+            return True
+        i += 1
+    return False
+
+
+class Route(object):
+
+    ''' one pattern + handler, in the order it was defined '''
+
+    def __init__(self, index, pattern, handler, mapping):
+        self.index = index
+        self.pattern = pattern
+        self.handler = handler
+        self.mapping = mapping
+
+
+class _Node(object):
+
+    __slots__ = ('label', 'children', 'routes')
+
+    def __init__(self, label=''):
+        self.label = label  # the text on the edge into this node
+        self.children = {}  # first character of the child's label -> child
+        self.routes = []  # indexes of the routes whose literal prefix ends here
+
+    def compress(self):
+        ''' merge chains of single-child nodes, so that edges are strings instead of characters '''
+        for key, child in self.children.items():
+            while len(child.children) == 1 and not child.routes:
+                (grandchild,) = child.children.values()
+                grandchild.label = child.label + grandchild.label
+                child = grandchild
+            self.children[key] = child
+            child.compress()
+
+
+class _Block(object):
+
+    ''' routes combined into one alternation: (?:(p0)|(p1)|...) '''
+
+    def __init__(self, routes):
+        self.routes = {}  # wrapper group -> (route, number of groups in the route's pattern)
+        alternatives = []
+        group = 1
+        for route in routes:
+            self.routes[group] = (route, route.pattern.groups)
+            alternatives.append('(%s)' % route.pattern.pattern)
+            group += route.pattern.groups + 1
+        self.regex = re.compile('|'.join(alternatives)) if len(routes) > 1 else None
+        self.single = routes[0] if len(routes) == 1 else None
+
+    def match(self, resource):
+        if self.single:
+            m = self.single.pattern.match(resource)
+            return (self.single, m.groups()) if m else None
+        m = self.regex.match(resource)
+        if m is None:
+            return None
+        route, count = self.routes[m.lastindex]
+        return route, m.groups()[m.lastindex:m.lastindex + count]
+
+
+class _Table(object):
+
+    '''
+      the routes for one method
+
+      routes with a literal prefix are indexed by it in a trie; a lookup
+      walks the trie along the resource, and only tries the routes whose
+      prefix the resource starts with. the rest of the routes are combined,
+      in order, into as few alternation regexes as python allows. the
+      earliest matching route, by definition order, wins.
+    '''
+    def __init__(self, routes):
+        self.routes = routes
+        self.trie = _Node()
+        self.blocks = []
+
+        block, groups = [], 0
+        for route in routes:
+            prefix = literal_prefix(route.pattern.pattern) if route.pattern.flags == 0 else ''
+            if prefix:
+                node = self.trie
+                for c in prefix:
+                    node = node.children.setdefault(c, _Node(c))
+                node.routes.append(route.index)
+                continue
+            combinable = route.pattern.flags == 0 and not route.pattern.groupindex and \
+                not _BACKREFERENCE.search(route.pattern.pattern)
+            if not combinable or groups + route.pattern.groups + 1 > MAX_GROUPS:
+                if block:
+                    self.blocks.append(_Block(block))
+                block, groups = [], 0
+            if not combinable:
+                self.blocks.append(_Block([route]))
+                continue
+            block.append(route)
+            groups += route.pattern.groups + 1
+        if block:
+            self.blocks.append(_Block(block))
+        self.trie.compress()
+
+    def match(self, resource):
+        best = None
+        for block in self.blocks:
+            best = block.match(resource)
+            if best:
+                break
+        limit = best[0].index if best else len(self.routes)
+
+        candidates = []
+        node, position = self.trie, 0
+        while node.children:
+            node = node.children.get(resource[position:position + 1])
+            if node is None or not resource.startswith(node.label, position):
+                break
+            position += len(node.label)
+            if node.routes:
+                candidates.extend(node.routes)
+        if candidates:
+            candidates.sort()
+            for index in candidates:
+                if index >= limit:
+                    break
+                route = self.routes[index]
+                m = route.pattern.match(resource)
+                if m:
+                    return route, m.groups()
+        return best
+
+
+class Router(object):
+
+    '''
+      Compiled lookup of (resource, method) in an ordered list of routes.
+
+      Equivalent to trying each route's pattern (re.match) in order, and
+      taking the first one which matches and has a handler for the method,
+      but without trying every pattern on every lookup.
+
+      routes is a list of (compiled pattern, {method: handler}, mapping).
+    '''
+    def __init__(self, routes):
+        by_method = {}
+        for pattern, methods, mapping in routes:
+            for method, handler in methods.items():
+                if handler:
+                    table = by_method.setdefault(method.lower(), [])
+                    table.append(Route(len(table), pattern, handler, mapping))
+        self._tables = dict((method, _Table(table)) for method, table in by_method.items())
+
+    def lookup(self, resource, method):
+        ''' return (handler, groups, mapping) or (None, None, None) '''
+        table = self._tables.get(method.lower())
+        result = table.match(resource) if table else None
+        if result is None:
+            return None, None, None
+        route, groups = result
+        return route.handler, groups, route.mapping
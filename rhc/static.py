@@ -0,0 +1,227 @@
+'''
+The MIT License (MIT)
+
+Copyright (c) 2013-2017 Robert H Chase
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+'''
+import collections
+import email.utils
+import mimetypes
+import os
+import stat
+
+from rhc.resthandler import RESTResult
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class StaticFile(object):
+
+    '''
+      A file's metadata, and its content if it is small.
+
+      A file of up to SMALL_FILE bytes is read once, and sent from memory.
+      A larger file is opened for each response, and read CHUNK_SIZE bytes
+      at a time as the response is sent (see read). Nothing is memory
+      mapped, so a file that is truncated or rewritten while it is being
+      sent can't take the process down; the response is cut short instead.
+    '''
+    SMALL_FILE = 65536
+    CHUNK_SIZE = 65536
+
+    def __init__(self, path, st):
+        self.path = path
+        self.size = st.st_size
+        self.mtime = int(st.st_mtime)
+        self.key = (st.st_ino, st.st_size, st.st_mtime)
+        self.etag = '"%x-%x"' % (int(st.st_mtime * 1000000), st.st_size)
+        self.last_modified = email.utils.formatdate(self.mtime, usegmt=True)
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.content = None
+        if self.size <= self.SMALL_FILE:
+            with open(path, 'rb') as f:
+                self.content = f.read(self.size)
+
+    def read(self, start=0, end=None):
+        '''
+          content of bytes start through end (inclusive; None is the end of
+          the file): a buffer of a small file's content, or an iterator of
+          chunks read from a large file
+        '''
+        if end is None:
+            end = self.size - 1
+        if self.content is not None:
+            return self.content if start == 0 and end == self.size - 1 else buffer(self.content, start, end - start + 1)
+        f = open(self.path, 'rb', 0)  # unbuffered: each chunk is read when it is sent
+        f.seek(start)
+        return self._chunks(f, end - start + 1)
+
+    def _chunks(self, f, length):
+        with f:
+            while length > 0:
+                chunk = f.read(min(length, self.CHUNK_SIZE))
+                if not chunk:
+                    raise IOError('%s: file changed while sending' % self.path)
+                length -= len(chunk)
+                yield chunk
+
+
+class FileCache(object):
+
+    '''
+      LRU cache of StaticFiles, keyed by path.
+
+      Every lookup does a stat of the path; if the file has been replaced or
+      modified, it is re-read.
+    '''
+    def __init__(self, size=100):
+        self.size = size
+        self._files = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._files)
+
+    def get(self, path):
+        ''' return a StaticFile for path, or None if path is not a regular file '''
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+
+        f = self._files.pop(path, None)
+        if f and f.key != (st.st_ino, st.st_size, st.st_mtime):
+            f = None  # changed on disk; let the old one go
+        if f is None:
+            try:
+                f = StaticFile(path, st)
+            except (IOError, OSError) as e:
+                log.warning('unable to open %s: %s', path, e)
+                return None
+        self._files[path] = f  # most recently used is last
+
+        while len(self._files) > self.size:
+            self._files.popitem(last=False)
+        return f
+
+    def clear(self):
+        self._files.clear()
+
+
+FILES = FileCache()
+
+
+def _parse_range(value, size):
+    '''
+      parse a single 'bytes=' range
+
+      return (start, end), inclusive, or None if the range isn't supported
+      (in which case the whole file is sent); raise ValueError if the range
+      can't be satisfied.
+    '''
+    unit, _, spec = value.partition('=')
+    if unit.strip() != 'bytes' or ',' in spec:
+        return None
+    start, _, end = spec.strip().partition('-')
+    try:
+        if start == '':
+            length = int(end)  # suffix range: last N bytes
+        else:
+            start = int(start)
+            end = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start == '':
+        if length <= 0 or size == 0:
+            raise ValueError('range not satisfiable')
+        return max(size - length, 0), size - 1
+    if start >= size or end < start:
+        raise ValueError('range not satisfiable')
+    return start, min(end, size - 1)
+
+
+def _is_not_modified(request, f):
+    etags = request.http_headers.get('if-none-match')
+    if etags is not None:
+        return etags.strip() == '*' or f.etag in [e.strip() for e in etags.split(',')]
+    since = request.http_headers.get('if-modified-since')
+    if since:
+        since = email.utils.parsedate_tz(since)
+        if since:
+            return f.mtime <= email.utils.mktime_tz(since)
+    return False
+
+
+def serve(request, root, path, cache=FILES):
+    '''
+        respond to a request with a file under root
+
+        Parameters:
+            request - RESTRequest
+            root    - directory containing the files
+            path    - path of the file relative to root
+            cache   - FileCache of open files
+
+        Supports If-None-Match/If-Modified-Since (304) and single byte-range
+        Range requests (206/416). Anything outside of root, or not a regular
+        file, is a 404.
+    '''
+    root = os.path.realpath(root)
+    full_path = os.path.realpath(os.path.join(root, path.lstrip('/')))
+    if not full_path.startswith(root + os.sep):
+        return RESTResult(404)
+    f = cache.get(full_path)
+    if f is None:
+        return RESTResult(404)
+
+    headers = {
+        'ETag': f.etag,
+        'Last-Modified': f.last_modified,
+        'Accept-Ranges': 'bytes',
+    }
+    if _is_not_modified(request, f):
+        return RESTResult(304, headers=headers)
+
+    content = None
+    code = 200
+    value = request.http_headers.get('range')
+    if value and f.size and request.http_headers.get('if-range', f.etag) == f.etag:
+        try:
+            byte_range = _parse_range(value, f.size)
+        except ValueError:
+            headers['Content-Range'] = 'bytes */%d' % f.size
+            return RESTResult(416, headers=headers)
+        if byte_range:
+            start, end = byte_range
+            content = f.read(start, end)
+            headers['Content-Range'] = 'bytes %d-%d/%d' % (start, end, f.size)
+            code = 206
+    if content is None:
+        content = f.read()
+    return RESTResult(code, content, headers, content_type=f.content_type)
+
+
+def handler(root, cache=FILES):
+    ''' return a rest_handler that serves files under root (the last regex group is the path) '''
+    def _static(request, *groups):
+        return serve(request, root, groups[-1] if groups else '', cache)
+    return _static
@@ -21,18 +21,181 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 THE SOFTWARE.
 '''
+import collections
 import errno
+import functools
+import itertools
+import math
 import os
 import select
 import socket
 import ssl as ssl_library
 import time
 
+from rhc.metrics import METRICS
+from rhc.timer import TIMERS
+
+import logging
+log = logging.getLogger(__name__)
+
 
 EVENT_READ = select.POLLIN | select.POLLPRI
 EVENT_WRITE = select.POLLOUT
 
 
+_POLLS = METRICS.counter('rhc_polls', 'calls to poll')
+_WAKEUPS = METRICS.counter('rhc_poll_wakeups', 'polls that returned events')
+_EVENTS = METRICS.histogram('rhc_poll_events', (1, 2, 4, 8, 16, 32, 64, 128, 256), 'events per wakeup')
+_CONNECTIONS = METRICS.gauge('rhc_connections_open', 'open connections (incoming and outgoing)')
+_BYTES_RX = METRICS.counter('rhc_bytes_received', 'bytes received on all connections')
+_BYTES_TX = METRICS.counter('rhc_bytes_sent', 'bytes sent on all connections')
+
+
+def _ceil_ms(seconds):
+    ''' seconds as whole milliseconds, rounded up so a poll never returns before a deadline '''
+    return int(math.ceil(seconds * 1000))
+
+
+class PollPoller(object):
+
+    '''
+      Readiness notification using select.poll.
+
+      The interest mask for each registered fileno is cached so that
+      re-registering a socket with an unchanged mask doesn't cost a system
+      call. Masks are expressed as EVENT_READ/EVENT_WRITE.
+
+      This is the portable fallback used when select.epoll is not available.
+    '''
+    def __init__(self):
+        self._poll = select.poll()
+        self._mask = {}
+
+    def __len__(self):
+        return len(self._mask)
+
+    def register(self, fileno, mask):
+        current = self._mask.get(fileno)
+        if current == mask:
+            return
+        if current is None:
+            self._poll.register(fileno, mask)
+        else:
+            self._poll.modify(fileno, mask)
+        self._mask[fileno] = mask
+
+    def unregister(self, fileno):
+        if self._mask.pop(fileno, None) is not None:
+            try:
+                self._poll.unregister(fileno)
+            except KeyError:
+                pass
+
+    def poll(self, timeout):
+        '''
+          wait up to timeout seconds (None means wait forever); return list
+          of (fileno, event)
+        '''
+        if timeout is not None:
+            timeout = _ceil_ms(timeout)
+        try:
+            return self._poll.poll(timeout)
+        except select.error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            return []
+
+    def close(self):
+        self._poll = select.poll()
+        self._mask = {}
+
+
+class EPollPoller(object):
+
+    '''
+      Readiness notification using select.epoll (linux).
+
+      Like PollPoller, the interest mask for each fileno is cached, so that
+      the re-registration done by BasicHandler after every read or write is
+      free unless the mask actually changes.
+
+      Sockets are registered level-triggered. Edge-triggering (EPOLLET)
+      isn't an option, because BasicHandler and Listener stop reading and
+      accepting at a budget, and rely on being polled again for the rest.
+
+      The epoll instance is a file descriptor, released by close; it is
+      opened again if the poller is used after that.
+    '''
+    def __init__(self):
+        self.__epoll = None
+        self._mask = {}
+
+    def __len__(self):
+        return len(self._mask)
+
+    @property
+    def _epoll(self):
+        if self.__epoll is None:
+            self.__epoll = select.epoll()
+        return self.__epoll
+
+    def _epoll_mask(self, mask):
+        result = 0
+        if mask & EVENT_READ:
+            result |= select.EPOLLIN | select.EPOLLPRI
+        if mask & EVENT_WRITE:
+            result |= select.EPOLLOUT
+        return result
+
+    def register(self, fileno, mask):
+        current = self._mask.get(fileno)
+        if current == mask:
+            return
+        if current is None:
+            self._epoll.register(fileno, self._epoll_mask(mask))
+        else:
+            try:
+                self._epoll.modify(fileno, self._epoll_mask(mask))
+            except IOError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+                self._epoll.register(fileno, self._epoll_mask(mask))  # fileno was closed and re-used
+        self._mask[fileno] = mask
+
+    def unregister(self, fileno):
+        if self._mask.pop(fileno, None) is not None:
+            try:
+                self._epoll.unregister(fileno)
+            except (IOError, ValueError):
+                pass  # already closed (epoll drops closed filenos on its own)
+
+    def poll(self, timeout):
+        '''
+          wait up to timeout seconds (None means wait forever); return list
+          of (fileno, event)
+        '''
+        timeout = -1 if timeout is None else _ceil_ms(timeout) / 1000.0
+        try:
+            return self._epoll.poll(timeout)
+        except IOError as e:
+            if e.errno != errno.EINTR:
+                raise
+            return []
+
+    def close(self):
+        self._mask = {}
+        if self.__epoll is not None:
+            self.__epoll.close()
+            self.__epoll = None
+
+
+def default_poller():
+    ''' the best available poller for this platform '''
+    if hasattr(select, 'epoll'):
+        return EPollPoller()
+    return PollPoller()
+
+
 class Server (object):
 
     '''
@@ -47,34 +210,42 @@ class Server (object):
       allocated for each connection. An optional context is also permitted, one
       context shared for every socket on a listener, and one unshared context
       for each outbound connection.
+
+      Readiness notification is delegated to a poller (see PollPoller and
+      EPollPoller). If no poller is specified, default_poller is used.
     '''
-    def __init__(self):
+    def __init__(self, poller=None):
         self._poll_map = {}
-        self._poll = select.poll()
+        self._poller = poller if poller is not None else default_poller()
         self._id = 0
+        self._pending = []
+        self._read_buffer = bytearray()
+        self._read_view = memoryview(self._read_buffer)
 
     @property
     def next_id(self):
         self._id += 1
         return self._id
 
-    def add_server(self, port, handler, context=None, ssl=None, ssl_certfile=None, ssl_keyfile=None):
+    def add_server(self, port, handler, context=None, ssl=None, ssl_certfile=None, ssl_keyfile=None, backlog=100, accept_budget=None, reuse_port=False):
         '''
           Start a listening socket.
 
           Parameters:
-            port    - listening port
-            handler - name of handler class (subclass of BasicHandler)
-            context - optional context associated with this listener
-            ssl     - optional SSLParam, if this exists the keyfile and
-                      certfile are the only values respected.
+            port          - listening port
+            handler       - name of handler class (subclass of BasicHandler)
+            context       - optional context associated with this listener
+            ssl           - optional SSLParam, if this exists the keyfile and
+                            certfile are the only values respected.
+            backlog       - size of the listen queue (capped by the kernel's
+                            somaxconn)
+            accept_budget - maximum number of connections accepted on each
+                            poll wakeup (default=Listener.ACCEPT_BUDGET)
+            reuse_port    - if True, set SO_REUSEPORT so that several
+                            processes can listen on the same port, with the
+                            kernel distributing connections among them
         '''
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        s.bind(('', port))
-        s.setblocking(False)
-        s.listen(100)
-        if ssl:
+        if ssl:  # before the socket is opened, so a bad cert doesn't leave the port bound
             ssl_ctx = ssl_library.create_default_context(purpose=ssl_library.Purpose.CLIENT_AUTH)
             if isinstance(ssl, SSLParam) and ssl.certfile:
                 ssl_ctx.load_cert_chain(ssl.certfile, ssl.keyfile)
@@ -82,7 +253,14 @@ class Server (object):
                 ssl_ctx.load_cert_chain(ssl_certfile, ssl_keyfile)
         else:
             ssl_ctx = None
-        l = Listener(s, self, context=context, handler=handler, ssl_ctx=ssl_ctx)
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if reuse_port:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        s.bind(('', port))
+        s.setblocking(False)
+        s.listen(backlog)
+        l = Listener(s, self, context=context, handler=handler, ssl_ctx=ssl_ctx, accept_budget=accept_budget)
         self._register(s, EVENT_READ, l._do_accept)
         return l
 
@@ -159,39 +337,87 @@ class Server (object):
         return did_anything
 
     def close(self):
-        for callback, sock in self._poll_map.values():
+        for fileno, (callback, sock) in self._poll_map.items():
+            self._poller.unregister(fileno)
             try:
                 sock.close()
             except Exception:
                 pass
+        self._poll_map = {}
+        self._poller.close()  # the poller re-opens itself if this Server is used again
+
+    def after_fork(self, poller=None):
+        '''
+          replace the poller inherited from a parent process
+
+          an epoll instance is a kernel object which is shared, not copied,
+          by fork; a child process that uses this Server must call this
+          method before adding servers or connections.
+        '''
+        self._poller.close()
+        self._poller = poller if poller is not None else default_poller()
+        self._poll_map = {}
 
     def _register(self, sock, mask, callback):
         fileno = sock.fileno()
-        if fileno in self._poll_map:
-            self._poll.modify(fileno, mask)
-        else:
-            self._poll.register(fileno, mask)
+        self._poller.register(fileno, mask)
         self._poll_map[fileno] = (callback, sock)
 
     def _unregister(self, sock):
         sock = sock.fileno()
         if sock in self._poll_map:
-            self._poll.unregister(sock)
+            self._poller.unregister(sock)
             del self._poll_map[sock]
 
-    def _set_pending(self, callback):
+    def _recv_buffer(self, size):
+        '''
+          return a view of a read buffer of at least size bytes
+
+          the buffer is shared by every handler on the Server; this works
+          because the loop is single threaded and each handler's on_data is
+          passed a copy of what was read.
+        '''
+        if len(self._read_buffer) < size:
+            self._read_buffer = bytearray(size)
+            self._read_view = memoryview(self._read_buffer)
+        return self._read_view
+
+    def call_soon(self, callback, *args):
+        '''
+          run callback(*args) after the network activity of the next call to
+          _service; while callbacks are waiting, the poll doesn't block.
+        '''
+        if args:
+            callback = functools.partial(callback, *args)
         self._pending.append(callback)
 
+    _set_pending = call_soon  # old name
+
+    @property
+    def has_pending(self):
+        return len(self._pending) > 0
+
     def _service(self, timeout):
-        processed = False
-        self._pending = []
+        if self._pending:
+            timeout = 0
 
-        for sock, mask in self._poll.poll(timeout * 1000):
+        processed = False
+        events = self._poller.poll(timeout)
+        _POLLS.inc()
+        if events:
+            _WAKEUPS.inc()
+            _EVENTS.observe(len(events))
+        for sock, mask in events:
+            processed = True
+            registered = self._poll_map.get(sock)
+            if registered:  # not closed by an earlier callback in this batch
+                registered[0]()
+
+        if self._pending:
+            pending, self._pending = self._pending, []  # anything added while running waits for the next pass
+            for callback in pending:
+                callback()
             processed = True
-            self._poll_map[sock][0]()
-
-        for callback in self._pending:
-            callback()
         return processed
 
 
@@ -234,21 +460,41 @@ class BasicHandler (object):
 
     '''
       Base class for connection listeners.
+
+      Each read wakeup drains the socket with recv_into until it is empty,
+      until RECV_BUDGET bytes have been read, or until data is waiting to be
+      sent. The read size starts at RECV_LEN and doubles (up to MAX_RECV_LEN)
+      each time a read fills the buffer, falling back toward RECV_LEN after
+      short reads. If MAX_RECV_LEN <= RECV_LEN, the read size is fixed.
+
+      Data that can't be sent immediately is held in a queue of buffers
+      (see queued_bytes). A partial send advances an offset into the first
+      buffer instead of copying the remainder; on a non-ssl socket, small
+      buffers at the front of the queue are gathered into a single send of
+      up to SEND_GATHER bytes. A str, memoryview or buffer (for instance, a
+      buffer of a string) can be sent.
     '''
+    SEND_GATHER = 65536
+    RECV_BUDGET = 262144
+
     def __init__(self, socket, context=None):
         self.RECV_LEN = 1024
-        self.MAX_RECV_LEN = 0
+        self.MAX_RECV_LEN = 65536
+        self._recv_size = None
         self.NAGLE = False
-        self.start = time.time()
+        self.t_init = self.start = time.time()
         self.context = context
         self.closed = False
-        self._sending = ''
+        self._sending = collections.deque()
+        self._sending_offset = 0  # bytes of _sending[0] already sent
+        self._sending_bytes = 0
         self._sock = socket
         self._incoming = True
         self._ssl_ctx = None
         self._network = None
+        self._peer_address = None  # from accept, which saves a getpeername
 
-        self.name = 'BasicHandler::init'
+        self._name = 'BasicHandler::init'
         self.host = None
         self.error = None
         self.close_reason = None
@@ -257,7 +503,6 @@ class BasicHandler (object):
         self.EINTR_cnt = 0
         self.EWOULDBLOCK_cnt = 0
 
-        self.t_init = time.time()
         self.t_open = 0
         self.t_ready = 0
         self.t_close = 0
@@ -265,16 +510,47 @@ class BasicHandler (object):
         self.on_init()
 
     def send(self, data):
-        if len(self._sending) != 0:
-            self._sending += data
+        if isinstance(data, unicode):
+            data = data.encode('utf8')
+        if not len(data):
+            return  # nothing to send (a queued empty buffer would never be consumed)
+        if self._sending:
+            self._sending.append(data)
+            self._sending_bytes += len(data)
         else:
             self._do_write(data)
 
+    def send_buffers(self, buffers):
+        '''
+          send a sequence of buffers as one write
+
+          the buffers are queued together (without being joined) so that
+          on_send_complete is not called until all of them are sent.
+        '''
+        is_idle = not self._sending
+        for data in buffers:
+            if isinstance(data, unicode):
+                data = data.encode('utf8')
+            if len(data):
+                self._sending.append(data)
+                self._sending_bytes += len(data)
+        if is_idle and self._sending:
+            self._do_write()
+
+    @property
+    def queued_bytes(self):
+        ''' number of bytes waiting in the application send buffer '''
+        return self._sending_bytes
+
     def close(self, reason=None):
         if not self.closed:
             self.t_close = time.time()
             self.closed = True
+            if self.t_open:
+                _CONNECTIONS.dec()
             self._network._unregister(self._sock)
+            if self._name is None:
+                self._name = self.full_address()  # while the socket is open; name is often first used in on_close
             if self._sock:
                 self._sock.close()
             if reason:
@@ -289,6 +565,17 @@ class BasicHandler (object):
     def is_open(self):
         return not self.closed
 
+    @property
+    def name(self):
+        ''' the full_address of a connected socket, looked up the first time it is needed '''
+        if self._name is None:
+            self._name = self.full_address()
+        return self._name
+
+    @name.setter
+    def name(self, name):
+        self._name = name
+
     # ---
     # ---
     # --- Handler identifiers -------------------------------------------
@@ -299,6 +586,8 @@ class BasicHandler (object):
             return ('Closing', 0)
 
     def peer_address(self):
+        if self._peer_address:
+            return self._peer_address
         try:
             return self._sock.getpeername()
         except socket.error:
@@ -447,8 +736,9 @@ class BasicHandler (object):
             self.close()
 
     def _on_connect(self):
-        self.name = self.full_address()
-        self.t_open = time.time()
+        self._name = None  # see name
+        self.t_open = self.t_init if self._incoming else time.time()  # an accepted socket is open at init
+        _CONNECTIONS.inc()
         self.on_open()
         self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # bye bye NAGLE
         if self._ssl_ctx:
@@ -482,7 +772,7 @@ class BasicHandler (object):
             self._on_ready()
 
     def _on_ready(self):
-        self.t_ready = time.time()
+        self.t_ready = time.time() if self._ssl_ctx else self.t_open
         self._network._register(self._sock, EVENT_READ, self._do_read)
         self.on_ready()
 
@@ -490,53 +780,125 @@ class BasicHandler (object):
     def _is_pending(self):
         return self._ssl_ctx is not None and self._sock.pending()
 
+    def _next_recv_size(self, size, received):
+        if received == size:
+            return min(size * 2, max(self.MAX_RECV_LEN, self.RECV_LEN))
+        if received < size // 4:
+            return max(size // 2, self.RECV_LEN)
+        return size
+
     def _do_read(self):
-        try:
-            data = self._sock.recv(self.RECV_LEN)
-        except ssl_library.SSLWantReadError:
-            self._network._register(self._sock, EVENT_READ, self._do_read)
-        except ssl_library.SSLWantWriteError:
-            self._network._register(self._sock, EVENT_WRITE, self._do_read)
-        except socket.error as e:
-            errnum, errmsg = e
-            if errnum == errno.ENOENT:
-                pass  # apparently this can happen. http://www.programcreek.com/python/example/374/errno.ENOENT says it comes from the SSL library.
-            else:
+        budget = self.RECV_BUDGET
+        while True:
+            size = self._recv_size or self.RECV_LEN
+            view = self._network._recv_buffer(size)
+            try:
+                received = self._sock.recv_into(view, size)
+            except ssl_library.SSLWantReadError:
+                self._network._register(self._sock, EVENT_READ, self._do_read)
+                break
+            except ssl_library.SSLWantWriteError:
+                self._network._register(self._sock, EVENT_WRITE, self._do_read)
+                break
+            except socket.error as e:
+                errnum, errmsg = e
+                if errnum in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                    break  # drained
+                if errnum == errno.ENOENT:
+                    return  # apparently this can happen. http://www.programcreek.com/python/example/374/errno.ENOENT says it comes from the SSL library.
                 self.close_reason = 'recv error on socket: %s' % errmsg
                 self.close()
-        except Exception as e:
-            self.close_reason = 'recv error on socket: %s' % str(e)
-            self.close()
-        else:
-            if len(data) == 0:
+                return
+            except Exception as e:
+                self.close_reason = 'recv error on socket: %s' % str(e)
+                self.close()
+                return
+            if received == 0:
                 self.close_reason = 'remote close'
                 self.close()
-            else:
-                self._network._register(self._sock, EVENT_READ, self._do_read)
-                self.rxByteCount += len(data)
-                self.on_data(data)
-                if self._is_pending:
-                    self._network._set_pending(self._do_read)  # give buffered ssl data another chance
+                return
+            self._network._register(self._sock, EVENT_READ, self._do_read)
+            self.rxByteCount += received
+            _BYTES_RX.inc(received)
+            self._recv_size = self._next_recv_size(size, received)
+            self.on_data(view[:received].tobytes())
+            budget -= received
+            if self.closed or self._sending or received < size or budget <= 0:
+                break  # a short read means the socket is (probably) empty
+        if not self.closed and self._is_pending:
+            self._network._set_pending(self._do_read)  # give buffered ssl data another chance
+
+    def _queue(self, data, offset=0):
+        self._sending.append(data)
+        self._sending_offset = offset
+        self._sending_bytes += len(data) - offset
+
+    def _gather(self):
+        '''
+          return the next buffer to send from the queue
+
+          the unsent part of the first buffer is referenced with a memoryview
+          (no copy). on non-ssl sockets, small buffers are gathered into a
+          single string of up to SEND_GATHER bytes; ssl sockets always send
+          the first buffer so that a retried write is identical.
+        '''
+        head = self._sending[0]
+        if self._sending_offset:
+            head = _view(head, self._sending_offset)
+        if self._ssl_ctx or len(self._sending) == 1:
+            return head
+        parts = [head]
+        size = len(head)
+        for data in itertools.islice(self._sending, 1, None):
+            size += len(data)
+            if size > self.SEND_GATHER:
+                break
+            parts.append(data)
+        if len(parts) == 1:
+            return head
+        return ''.join(p if isinstance(p, str) else str(p) if isinstance(p, buffer) else p.tobytes() for p in parts)
+
+    def _consume(self, sent):
+        ''' remove sent bytes from the front of the queue '''
+        self._sending_bytes -= sent
+        while sent:
+            remaining = len(self._sending[0]) - self._sending_offset
+            if sent < remaining:
+                self._sending_offset += sent
+                return
+            sent -= remaining
+            self._sending.popleft()
+            self._sending_offset = 0
 
     def _do_write(self, data=None):
-        if data is None:
-            data = self._sending
-            self._sending = ''
-        if not data:
+        is_queued = data is None
+        if is_queued:
+            if not self._sending:
+                self.close_reason = 'logic error in handler'
+                self.close()
+                return
+            data = self._gather()
+        elif not data:
             self.close_reason = 'logic error in handler'
             self.close()
             return
         try:
             l = self._sock.send(data)
         except ssl_library.SSLWantReadError:
+            if not is_queued:
+                self._queue(data)
             self._network._register(self._sock, EVENT_READ, self._do_write)
         except ssl_library.SSLWantWriteError:
+            if not is_queued:
+                self._queue(data)
             self._network._register(self._sock, EVENT_WRITE, self._do_write)
         except socket.error as e:
             errnum, errmsg = e
             if errnum in (errno.EINTR, errno.EWOULDBLOCK):
-                self.on_send_error(errmsg)  # not fatal
-                self._sending = data
+                self.error = errmsg
+                self.on_send_error()  # not fatal
+                if not is_queued:
+                    self._queue(data)
                 self._network._register(self._sock, EVENT_WRITE, self._do_write)
             else:
                 self.close('send error on socket: %s' % errmsg)
@@ -544,16 +906,20 @@ class BasicHandler (object):
             self.close('send error on socket: %s' % str(e))
         else:
             self.txByteCount += l
-            if l == len(data):
-                self._network._register(self._sock, EVENT_READ, self._do_read)
-                self.on_send_complete()
-            else:
+            _BYTES_TX.inc(l)
+            if is_queued:
+                self._consume(l)
+            elif l < len(data):
+                self._queue(data, l)
+            if self._sending:
                 '''
-                    we couldn't send all the data. buffer the remainder in self._sending and start
+                    we couldn't send all the data. the remainder is in self._sending; start
                     waiting for the socket to be writable again (EVENT_WRITE).
                 '''
-                self._sending = data[l:]
                 self._network._register(self._sock, EVENT_WRITE, self._do_write)
+            else:
+                self._network._register(self._sock, EVENT_READ, self._do_read)
+                self.on_send_complete()
     # --- I/O
     # ---
     # ---
@@ -562,14 +928,26 @@ class BasicHandler (object):
         pass
 
 
+def _view(data, offset):
+    ''' zero-copy view of data[offset:] '''
+    if isinstance(data, buffer):
+        return buffer(data, offset)  # old-style buffer objects can't make a memoryview
+    return memoryview(data)[offset:]
+
+
 class Listener(object):
 
-    def __init__(self, socket, server, handler, context=None, ssl_ctx=None):
+    ACCEPT_BUDGET = 64
+    ACCEPT_BACKOFF = 0.1  # seconds to stop accepting when out of file descriptors
+
+    def __init__(self, socket, server, handler, context=None, ssl_ctx=None, accept_budget=None):
         self.socket = socket
         self.network = server
         self.handler = handler
         self.context = context
         self.ssl_ctx = ssl_ctx
+        self.accept_budget = accept_budget if accept_budget else self.ACCEPT_BUDGET
+        self._timer = None
 
     def close(self):
         ''' close a listening socket
@@ -577,13 +955,47 @@ class Listener(object):
             Normally, a listening socket lasts for for duration of a server's life. If
             there is a need to close a listener, this is the way to do it.
         '''
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
         self.network._unregister(self.socket)
         self.socket.close()
 
     def _do_accept(self):
-        s, address = self.socket.accept()
+        '''
+          accept pending connections until the listen queue is empty or
+          accept_budget connections have been accepted.
+
+          if there are no file descriptors left, stop listening for
+          ACCEPT_BACKOFF seconds; otherwise, the pending connection would
+          wake every poll, and never be accepted.
+        '''
+        for _ in xrange(self.accept_budget):
+            try:
+                s, address = self.socket.accept()
+            except socket.error as e:
+                if e.args[0] == errno.ECONNABORTED:
+                    continue  # reset while in the listen queue
+                if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                    return
+                if e.args[0] in (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM):
+                    return self._backoff(e)
+                raise
+            self._on_accept(s, address)
+
+    def _backoff(self, e):
+        log.warning('unable to accept on port %s: %s; pausing for %ss', self.socket.getsockname()[1], e, self.ACCEPT_BACKOFF)
+        self.network._unregister(self.socket)
+        self._timer = TIMERS.add(self._resume, self.ACCEPT_BACKOFF * 1000.0).start()
+
+    def _resume(self):
+        self._timer = None
+        self.network._register(self.socket, EVENT_READ, self._do_accept)
+
+    def _on_accept(self, s, address):
         s.setblocking(False)
         h = self.handler(s, self.context)
+        h._peer_address = address
         h._network = self.network
         h._ssl_ctx = self.ssl_ctx
         h.id = self.network.next_id
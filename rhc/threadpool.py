@@ -0,0 +1,277 @@
+'''
+The MIT License (MIT)
+
+Copyright (c) 2013-2017 Robert H Chase
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+'''
+import collections
+import errno
+import fcntl
+import functools
+import os
+import Queue
+import sys
+import threading
+import time
+
+from rhc.metrics import METRICS
+from rhc.tcpsocket import SERVER, EVENT_READ
+
+import logging
+log = logging.getLogger(__name__)
+
+
+_WAIT = METRICS.histogram('rhc_threadpool_wait_seconds', (.001, .005, .01, .05, .1, .5, 1, 5), 'time spent waiting for a worker')
+
+
+class PoolFull(Exception):
+    pass
+
+
+class _Wakeup(object):
+
+    '''
+      the read end of the wakeup pipe, as registered with a Server
+
+      Server.close closes every registered socket; the pipe belongs to the
+      pool, so close just notes that the pipe must be registered again.
+    '''
+    def __init__(self, fileno):
+        self._fileno = fileno
+        self.is_registered = False
+
+    def fileno(self):
+        return self._fileno
+
+    def close(self):
+        self.is_registered = False
+
+
+class ThreadPool(object):
+
+    '''
+      Run blocking functions on a bounded set of worker threads.
+
+      A function is submitted from the loop with run; it executes on a worker
+      thread, and its callback is called back on the loop (the thread that
+      calls Server.service), so that callbacks can safely touch sockets,
+      timers and handlers. Workers signal completion by writing to a pipe
+      that is registered with the Server, so the loop wakes up immediately
+      instead of polling.
+
+      Parameters:
+          size        - number of worker threads (started on first use)
+          queue_depth - maximum number of functions waiting for a worker
+          reject      - if True, run raises PoolFull when the queue is full;
+                        otherwise, the function runs inline on the loop
+          server      - Server that delivers completions (default=SERVER)
+
+      Queue wait (time between run and a worker picking up the function) is
+      tracked in wait_count, wait_total and wait_max (seconds).
+    '''
+    def __init__(self, size=4, queue_depth=100, reject=True, server=None):
+        self.size = size
+        self.queue_depth = queue_depth
+        self.reject = reject
+        self.server = server if server is not None else SERVER
+
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+        self._queue = Queue.Queue()
+        self._done = collections.deque()  # append/popleft are thread safe
+        self._threads = []
+        self._wakeup = None
+        self._write_fd = None
+
+    def setup(self, size=None, queue_depth=None, reject=None):
+        ''' change settings; size only applies before the pool is started '''
+        if size is not None:
+            self.size = size
+        if queue_depth is not None:
+            self.queue_depth = queue_depth
+        if reject is not None:
+            self.reject = reject
+        return self
+
+    @property
+    def queued(self):
+        ''' number of functions waiting for a worker '''
+        return self._queue.qsize()
+
+    @property
+    def active(self):
+        ''' number of functions submitted and not yet called back '''
+        return self.submitted - self.completed
+
+    @property
+    def wait_average(self):
+        return self.wait_total / self.wait_count if self.wait_count else 0.0
+
+    def run(self, callback_fn, fn, *args, **kwargs):
+        '''
+          run fn(*args, **kwargs) on a worker thread
+
+          callback_fn is called on the loop with (0, result), or with
+          (1, str(exception)) if fn raises an exception, which is logged.
+
+          a callback command, so async.partial(pool.run) works.
+        '''
+        if self._queue.qsize() >= self.queue_depth:
+            self.rejected += 1
+            if self.reject:
+                raise PoolFull('thread pool queue is full')
+            return callback_fn(*self._call(fn, args, kwargs))
+        self._start()
+        self.submitted += 1
+        self._queue.put((callback_fn, fn, args, kwargs, time.time()))
+
+    def close(self):
+        ''' stop the worker threads after they finish what is queued '''
+        for thread in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._wakeup:
+            self.server._unregister(self._wakeup)
+            os.close(self._wakeup.fileno())
+            os.close(self._write_fd)
+            self._wakeup = self._write_fd = None
+
+    def _start(self):
+        if not self._threads:
+            for i in range(self.size):
+                thread = threading.Thread(target=self._work, name='rhc-pool-%d' % i)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+        if self._wakeup is None:
+            read_fd, self._write_fd = os.pipe()
+            for fd in (read_fd, self._write_fd):
+                _set_nonblocking(fd)
+            self._wakeup = _Wakeup(read_fd)
+        if not self._wakeup.is_registered:
+            self.server._register(self._wakeup, EVENT_READ, self._on_wakeup)
+            self._wakeup.is_registered = True
+
+    @staticmethod
+    def _call(fn, args, kwargs):
+        try:
+            return 0, fn(*args, **kwargs)
+        except Exception as e:
+            log.exception('exception in thread pool function')
+            return 1, str(e)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            callback_fn, fn, args, kwargs, t_queued = item
+            wait = time.time() - t_queued
+            rc, result = self._call(fn, args, kwargs)
+            self._done.append((callback_fn, rc, result, wait))
+            try:
+                os.write(self._write_fd, b'x')
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    raise  # a full pipe means the loop is already awake
+
+    def _on_wakeup(self):
+        try:
+            while os.read(self._wakeup.fileno(), 4096):
+                pass
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+        while self._done:
+            callback_fn, rc, result, wait = self._done.popleft()
+            self.completed += 1
+            self.wait_count += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            _WAIT.observe(wait)
+            try:
+                callback_fn(rc, result)
+            except Exception:
+                log.exception('exception in thread pool callback')
+
+
+def _set_nonblocking(fd):
+    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+
+POOL = ThreadPool()
+METRICS.gauge('rhc_threadpool_queued', 'functions waiting for a POOL worker', fn=lambda: POOL.queued)
+METRICS.gauge('rhc_threadpool_active', 'functions submitted to POOL and not yet called back', fn=lambda: POOL.active)
+
+
+def threaded(rest_handler=None, pool=None):
+    '''
+      decorator: run a rest_handler on a thread pool (default=POOL)
+
+      the rest_handler runs on a worker thread, so it must return its result
+      instead of calling request.respond or request.delay; the response is
+      sent from the loop. blocking calls (rhc.database, for instance) are
+      fine here; connections in rhc.database are per-thread.
+
+      if the pool is full (and rejecting), the request is responded to with
+      503 Service Unavailable. an exception raised by the rest_handler is
+      handled as it would be on the loop (501 and on_rest_exception).
+
+          @threaded
+          def handler(request, id):
+              return DAO.load(id).json()
+
+          @threaded(pool=other_pool)
+          def other(request):
+              ...
+    '''
+    def _threaded(rest_handler):
+        @functools.wraps(rest_handler)
+        def inner(request, *args):
+            def on_complete(rc, result):
+                is_ok, result = result
+                if is_ok:
+                    request.respond(result)
+                else:
+                    request._exception(*result)
+            _pool = pool if pool is not None else POOL
+            request.delay()
+            try:
+                _pool.run(on_complete, _call_handler, rest_handler, request, args)
+            except PoolFull:
+                request.respond(503, 'server busy, try again later', headers={'Retry-After': '1'})
+        return inner
+    if rest_handler is not None:
+        return _threaded(rest_handler)
+    return _threaded
+
+
+def _call_handler(rest_handler, request, args):
+    try:
+        return True, rest_handler(request, *args)
+    except Exception:
+        return False, sys.exc_info()
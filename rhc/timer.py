@@ -77,6 +77,19 @@ class Timer(object):
             item._is_in_heap = False  # Note: expired timers are removed from the timer list; start() will re-insert
             item.execute()
 
+    def timeout(self, maximum=None):
+        '''
+            Seconds until the next timer expires (never negative).
+
+            If no timers are waiting, maximum is returned; None means
+            there is no limit. Use this as a poll timeout so that timers
+            are serviced on time without waking up in between.
+        '''
+        if not self._list:
+            return maximum
+        delay = max(self._list[0]._expiration - time.time(), 0)
+        return delay if maximum is None else min(delay, maximum)
+
     def add(self, action, duration, **kwargs):
         '''
             Add a simple fixed-duration timer.
@@ -0,0 +1,92 @@
+'''
+A raw-socket HTTP client for tests that talk to a RESTHandler over loopback.
+
+Requests are written by hand (and pipelined), so that tests can see exactly
+what the server sends back, byte for byte.
+'''
+import rhc.tcpsocket as network
+from rhc.resthandler import RESTHandler
+
+
+def format_request(resource, headers='', method='GET'):
+    ''' an HTTP/1.1 request with no body; headers are extra 'Name: value\\r\\n' lines '''
+    return '%s %s HTTP/1.1\r\nHost: localhost\r\n%s\r\n' % (method, resource, headers)
+
+
+class Client(network.BasicHandler):
+
+    '''
+      send every request in context as soon as the connection is ready
+
+      context is a list of requests, each a resource (GET, no extra headers)
+      or a tuple of format_request arguments; whatever comes back is
+      collected in response.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(Client, self).__init__(*args, **kwargs)
+        self.response = ''
+
+    def on_ready(self):
+        self.send(''.join(format_request(*r) if isinstance(r, tuple) else format_request(r) for r in self.context))
+
+    def on_data(self, data):
+        self.response += data
+
+
+def dechunk(data):
+    ''' chunked body -> (content, remainder), or None if the body is incomplete '''
+    content = []
+    while True:
+        line, sep, rest = data.partition('\r\n')
+        if not sep:
+            return None
+        length = int(line, 16)
+        if len(rest) < length + 2:
+            return None
+        if length == 0:
+            return ''.join(content), rest[2:]
+        content.append(rest[:length])
+        data = rest[length + 2:]
+
+
+def responses(client):
+    ''' [(code, headers, content), ...] for each complete response received by client '''
+    result = []
+    data = client.response
+    while '\r\n\r\n' in data:
+        head, rest = data.split('\r\n\r\n', 1)
+        lines = head.split('\r\n')
+        headers = dict(line.split(': ', 1) for line in lines[1:])
+        if headers.get('Transfer-Encoding') == 'chunked':
+            body = dechunk(rest)
+            if body is None:
+                break
+            content, data = body
+        else:
+            length = int(headers.get('Content-Length', 0))
+            if len(rest) < length:
+                break
+            content, data = rest[:length], rest[length:]
+        result.append((int(lines[0].split()[1]), headers, content))
+    return result
+
+
+def is_answered(clients):
+    ''' True when each client is closed, or has a response for each of its requests '''
+    return all(c.closed or (len(c.context) > 0 and len(responses(c)) == len(c.context)) for c in clients)
+
+
+def serve(loop, mapper, port, connections, handler=RESTHandler, client=Client, until=is_answered, timeout=1):
+    '''
+      serve mapper on port, and open a client connection for each list of
+      requests in connections; run loop until until(clients) is True, or
+      timeout seconds pass; return the clients
+    '''
+    loop.server.add_server(port, handler, mapper)
+    clients = [loop.server.add_connection(('localhost', port), client, requests) for requests in connections]
+    guard = loop.call_later(timeout, loop.stop)
+    loop.run(until=lambda: until(clients))
+    guard.cancel()
+    loop.server.close()
+    return clients
@@ -1,3 +1,6 @@
+import errno
+import socket
+
 import rhc.tcpsocket as network
 
 
@@ -14,6 +17,26 @@ class RejectServer(network.BasicHandler):
         assert self.t_open == 0                                # connection never completed
 
 
+class NameServer(network.BasicHandler):
+
+    def on_close(self):
+        self.context.append(self.name)
+
+
+def test_name_after_close():
+    n = network.Server()
+    names = []
+    n.add_server(PORT, NameServer, names)
+    c = n.add_connection(('localhost', PORT), network.BasicHandler)
+    port = c.address()[1]
+    while not names:
+        n.service()
+        if c.is_open:
+            c.close()
+    n.close()
+    assert names[0].endswith(' <- 127.0.0.1:%d' % port)  # named while the socket was open
+
+
 def test_reject():
     n = network.Server()
     n.add_server(PORT, RejectServer)
@@ -41,3 +64,73 @@ def test_accept():
     while c.is_open:
         n.service()
     n.close()
+
+
+class CountServer(network.BasicHandler):
+
+    def on_ready(self):
+        self.context['count'] += 1
+
+
+def test_accept_drain():
+    n = network.Server()
+    context = {'count': 0}
+    l = n.add_server(PORT, CountServer, context, backlog=10, accept_budget=3)
+    clients = [n.add_connection(('localhost', PORT), network.BasicHandler) for _ in range(5)]
+    l._do_accept()
+    assert context['count'] == 3  # stopped at the budget
+    l._do_accept()
+    assert context['count'] == 5  # stopped at EAGAIN
+    l._do_accept()
+    assert context['count'] == 5
+    for c in clients:
+        c.close()
+    n.close()
+
+
+class FailingSocket(object):
+
+    ''' a listening socket whose accept raises each of errors before accepting '''
+
+    def __init__(self, sock, errors):
+        self.sock = sock
+        self.errors = list(errors)
+
+    def accept(self):
+        if self.errors:
+            raise socket.error(self.errors.pop(0), 'test')
+        return self.sock.accept()
+
+    def __getattr__(self, name):
+        return getattr(self.sock, name)
+
+
+def test_accept_aborted():
+    n = network.Server()
+    context = {'count': 0}
+    l = n.add_server(PORT, CountServer, context)
+    l.socket = FailingSocket(l.socket, [errno.ECONNABORTED])
+    c = n.add_connection(('localhost', PORT), network.BasicHandler)
+    l._do_accept()
+    assert context['count'] == 1  # the aborted connection didn't stop the accept loop
+    c.close()
+    n.close()
+
+
+def test_accept_backoff():
+    n = network.Server()
+    context = {'count': 0}
+    l = n.add_server(PORT, CountServer, context)
+    sock = l.socket
+    l.socket = FailingSocket(sock, [errno.EMFILE])
+    c = n.add_connection(('localhost', PORT), network.BasicHandler)
+    while l._timer is None:
+        n.service()
+    assert sock.fileno() not in n._poll_map  # not listening while out of file descriptors
+    assert context['count'] == 0
+    l._timer.cancel()
+    l._resume()
+    while context['count'] == 0:
+        n.service()
+    c.close()
+    n.close()
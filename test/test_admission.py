@@ -0,0 +1,102 @@
+import rhc.tcpsocket as network
+from rhc.admission import Admission, TokenBucket
+from rhc.loop import Loop
+from rhc.micro_fsm.parser import Parser
+from rhc.resthandler import RESTMapper
+from rhc.timer import TIMERS
+
+from rest_client import responses, serve
+
+
+PORT = 12355
+
+
+def test_bucket():
+    b = TokenBucket(10, 2)
+    assert b.take() == 0
+    assert b.take() == 0
+    wait = b.take()
+    assert 0 < wait <= .1
+    b.tokens = 1
+    assert b.take() == 0
+
+
+def test_concurrency():
+    a = Admission(concurrency=2)
+    assert a.admit() is None
+    assert a.admit() is None
+    assert a.admit() == (503, 'Service Unavailable', '1')
+    a.release()
+    assert a.admit() is None
+    assert a.shed == 1
+
+
+def test_rate():
+    a = Admission(rate=.5)
+    assert a.admit() is None
+    assert a.admit() == (429, 'Too Many Requests', '2')
+    assert a.active == 1
+
+
+def run(mapper, *connections):
+    loop = Loop(network.Server(), TIMERS)
+    calls = []
+
+    def slow(request):
+        calls.append('slow')
+        request.delay()
+        loop.call_later(.02, request.respond, 'slow')
+
+    def fast(request):
+        calls.append('fast')
+        return 'fast'
+
+    mapper.add('/slow$', slow, concurrency=1)
+    mapper.add('/fast$', fast, rate=1)
+    mapper.add('/other$', fast)
+    clients = serve(loop, mapper, PORT, connections)
+    return [[(code, headers.get('Retry-After')) for code, headers, content in responses(c)] for c in clients], calls
+
+
+def test_route_concurrency():
+    mapper = RESTMapper()
+    r, calls = run(mapper, ['/slow', '/slow'], ['/slow'])
+    assert calls == ['slow']
+    assert r == [[(200, None), (503, '1')], [(503, '1')]]
+    r, calls = run(RESTMapper(), ['/slow'])
+    assert r == [[(200, None)]]
+
+
+def test_route_rate():
+    r, calls = run(RESTMapper(), ['/fast', '/fast', '/other'])
+    assert calls == ['fast', 'fast']
+    assert r == [[(200, None), (429, '1'), (200, None)]]
+
+
+def test_server():
+    mapper = RESTMapper()
+    mapper.limit(concurrency=1)
+    r, calls = run(mapper, ['/slow'], ['/other'])
+    assert r == [[(200, None)], [(503, '1')]]
+    assert mapper.admission.active == 0
+    assert mapper.admission.shed == 1
+
+
+def test_release_on_route_shed():
+    mapper = RESTMapper()
+    mapper.limit(concurrency=5)
+    r, calls = run(mapper, ['/slow', '/slow'])
+    assert mapper.admission.active == 0
+
+
+def test_micro():
+    p = Parser.parse([
+        'SERVER test 12345 concurrency=100',
+        'ROUTE /foo$ concurrency=10 rate=5.5 burst=20',
+        'GET a.b',
+    ])
+    r = p.servers['test'].routes[0]
+    assert (r.concurrency, r.rate, r.burst) == (10, 5.5, 20)
+    config = p.config.server.test
+    assert config.concurrency == 100
+    assert config.rate is None
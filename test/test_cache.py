@@ -0,0 +1,173 @@
+import pytest
+
+import rhc.tcpsocket as network
+from rhc.cache import CACHE, ResponseCache, etag_match, make_etag
+from rhc.loop import Loop
+from rhc.micro_fsm.parser import Parser
+from rhc.resthandler import RESTMapper, RESTResult
+from rhc.timer import TIMERS
+
+import rest_client
+
+
+PORT = 12353
+
+
+def test_get():
+    c = ResponseCache()
+    assert c.get('/foo') is None
+    entry = c.add('/foo', '', 'content', {'Content-Type': 'text/plain'}, 10)
+    assert entry.etag == make_etag('content')
+    assert c.get('/foo') is entry
+    assert c.get('/foo', 'a=1') is None
+
+
+def test_expire():
+    c = ResponseCache()
+    c.add('/foo', '', 'content', None, -1)
+    assert c.get('/foo') is None
+    assert len(c) == 0
+
+
+def test_lru():
+    c = ResponseCache(size=10)
+    c.add('/a', '', '12345', None, 10)
+    c.add('/b', '', '12345', None, 10)
+    c.get('/a')
+    c.add('/c', '', '12345', None, 10)
+    assert c.get('/a')
+    assert c.get('/b') is None
+    assert c.get('/c')
+
+
+def test_max_item():
+    c = ResponseCache(max_item=3)
+    entry = c.add('/a', '', '12345', None, 10)
+    assert entry.etag
+    assert len(c) == 0
+
+
+def test_invalidate():
+    c = ResponseCache()
+    for resource in ('/foo/1', '/foo/2', '/bar'):
+        c.add(resource, '', 'x', None, 10)
+    assert c.invalidate('/foo/') == 2
+    assert c.get('/bar')
+    assert c.invalidate() == 1
+    assert len(c) == 0
+
+
+def test_etag_match():
+    etag = make_etag('content')
+    assert etag_match(etag, etag)
+    assert etag_match('"abc", %s' % etag, etag)
+    assert etag_match(etag[2:], etag)  # weak comparison
+    assert etag_match('*', etag)
+    assert not etag_match('"abc"', etag)
+    assert not etag_match(None, etag)
+
+
+@pytest.fixture
+def server():
+    ''' (loop, mapper, calls), shared by the runs in a test so that they see the same cache entries '''
+    loop = Loop(network.Server(), TIMERS)
+    calls = []
+
+    def thing(request, id):
+        calls.append(id)
+        return RESTResult(content={'id': id, 'call': len(calls)})
+
+    def delayed(request):
+        calls.append('delayed')
+        request.delay()
+        loop.call_later(.01, request.respond, 'later')
+
+    def missing(request):
+        calls.append('missing')
+        return 404
+
+    mapper = RESTMapper()
+    mapper.add(r'/thing/(\d+)$', thing, cache=10)
+    mapper.add('/delayed$', delayed, cache=10)
+    mapper.add('/missing$', missing, cache=10)
+    return loop, mapper, calls
+
+
+def run(server, requests):
+    loop, mapper, calls = server
+    del calls[:]
+    c, = rest_client.serve(loop, mapper, PORT, [requests])
+    return c, calls
+
+
+def responses(c):
+    return [(code, headers.get('ETag'), content) for code, headers, content in rest_client.responses(c)]
+
+
+def setup_function(function):
+    CACHE.clear()
+
+
+def test_cached(server):
+    c, calls = run(server, [('/thing/1', ''), ('/thing/1', ''), ('/thing/2', ''), ('/thing/1?a=1', '')])
+    assert calls == ['1', '2', '1']
+    r = responses(c)
+    assert [code for code, _, _ in r] == [200, 200, 200, 200]
+    assert r[0] == r[1]
+    assert r[0][1] == make_etag(r[0][2])
+
+
+def test_not_modified(server):
+    c, calls = run(server, [('/thing/1', '')])
+    etag = responses(c)[0][1]
+    c, calls = run(server, [('/thing/1', 'If-None-Match: %s\r\n' % etag), ('/thing/2', 'If-None-Match: %s\r\n' % etag)])
+    assert calls == ['2']
+    r = responses(c)
+    assert r[0] == (304, etag, '')
+    assert r[1][0] == 200
+
+
+def test_not_modified_on_miss(server):
+    etag = make_etag('later')
+    c, calls = run(server, [('/delayed', 'If-None-Match: %s\r\n' % etag)])
+    assert responses(c) == [(304, etag, '')]
+    c, calls = run(server, [('/delayed', '')])
+    assert calls == []
+    assert responses(c) == [(200, etag, 'later')]
+
+
+def test_not_cached(server):
+    c, calls = run(server, [('/missing', ''), ('/missing', '')])
+    assert calls == ['missing', 'missing']
+    assert [code for code, _, _ in responses(c)] == [404, 404]
+
+
+def test_expired(server):
+    run(server, [('/thing/1', '')])
+    (resource, query, scope), = CACHE._items
+    CACHE.add(resource, query, 'old', None, -1, scope)
+    c, calls = run(server, [('/thing/1', '')])
+    assert calls == ['1']
+    assert responses(c)[0][2] != 'old'
+
+
+def test_servers(server):
+    other = RESTMapper()
+    other.add(r'/thing/(\d+)$', lambda request, id: 'other', cache=10)
+    run(server, [('/thing/1', '')])
+    c, = rest_client.serve(server[0], other, PORT, [[('/thing/1', '')]])
+    assert responses(c)[0][2] == 'other'  # not the first server's cached response
+    assert len(CACHE) == 2
+
+
+def test_micro():
+    p = Parser.parse([
+        'SERVER test 12345',
+        'ROUTE /foo$',
+        'GET a.b cache=30',
+        'PUT a.c',
+    ])
+    assert p.servers['test'].routes[0].cache == 30
+    assert p.config.cache.size == 16 * 1024 * 1024
+    with pytest.raises(Exception):
+        Parser.parse(['SERVER test 12345', 'ROUTE /foo$', 'PUT a.c cache=30'])
@@ -0,0 +1,82 @@
+import rhc.tcpsocket as network
+from rhc.loop import Loop
+from rhc.resthandler import RESTMapper
+
+import rest_client
+from rest_client import dechunk
+
+
+PORT = 12351
+PULLED = []
+
+
+class Client(rest_client.Client):
+
+    def __init__(self, *args, **kwargs):
+        super(Client, self).__init__(*args, **kwargs)
+        self.pulled = None  # chunks pulled by the server before the first response data arrived
+
+    def on_data(self, data):
+        if self.pulled is None:
+            self.pulled = len(PULLED)
+        super(Client, self).on_data(data)
+
+
+def run(resources, until):
+    loop = Loop(network.Server())
+    del PULLED[:]
+
+    def rows(count, size):
+        for i in range(count):
+            PULLED.append(i)
+            yield chr(ord('a') + i % 26) * size
+
+    def big(request):
+        return 200, rows(200, 65536), None, None, 'text/plain'
+
+    def small(request):
+        return 200, (u'%d,' % i for i in range(3))
+
+    def broken(request):
+        def gen():
+            yield 'partial'
+            raise Exception('oops')
+        return 200, gen()
+
+    def fast(request):
+        return 'fast'
+
+    mapper = RESTMapper()
+    mapper.add('/big$', big)
+    mapper.add('/small$', small)
+    mapper.add('/broken$', broken)
+    mapper.add('/fast$', fast)
+    c, = rest_client.serve(loop, mapper, PORT, [resources], client=Client, until=lambda clients: clients[0].closed or until(clients[0].response), timeout=5)
+    return c, PULLED
+
+
+def test_small():
+    c, _ = run(['/small', '/fast'], lambda r: r.endswith('fast'))
+    headers, body = c.response.split('\r\n\r\n', 1)
+    assert 'Transfer-Encoding: chunked' in headers
+    assert 'Content-Length' not in headers
+    content, remainder = dechunk(body)
+    assert content == '0,1,2,'
+    assert remainder.startswith('HTTP/1.1 200 OK')
+    assert remainder.endswith('fast')
+
+
+def test_big():
+    c, pulled = run(['/big', '/fast'], lambda r: r.endswith('fast'))
+    content, remainder = dechunk(c.response.split('\r\n\r\n', 1)[1])
+    assert len(content) == 200 * 65536
+    assert content[-65536:] == 'r' * 65536
+    assert len(pulled) == 200
+    assert c.pulled < 200  # the server waited for the socket instead of pulling everything
+    assert remainder.endswith('fast')
+
+
+def test_broken():
+    c, _ = run(['/broken', '/fast'], lambda r: False)
+    assert c.closed
+    assert c.response.endswith('7\r\npartial\r\n')
@@ -0,0 +1,107 @@
+import pytest
+
+import rhc.tcpsocket as network
+from rhc.loop import Loop
+from rhc.micro_fsm.parser import Parser
+from rhc.resthandler import IN_FLIGHT, RESTHandler, RESTMapper, RESTResult
+from rhc.timer import TIMERS
+
+from rest_client import Client, is_answered, responses, serve
+
+
+PORT = 12354
+
+
+def run(*connections):
+    loop = Loop(network.Server(), TIMERS)
+    calls = []
+
+    def upstream(request, id):
+        calls.append(id)
+        request.defer(lambda request, result: request.respond(RESTResult(content={'id': result})), lambda callback: loop.call_later(.02, callback, 0, id))
+
+    def rows(request):
+        calls.append('rows')
+        request.delay()
+        loop.call_later(.02, request.respond, RESTResult(content=iter(['a', 'b', 'c'])))
+
+    def fails(request):
+        calls.append('fails')
+        request.delay()
+        loop.call_later(.02, request.respond, 400, 'no')
+
+    mapper = RESTMapper()
+    mapper.add(r'/thing/(\d+)$', upstream, coalesce=True)
+    mapper.add('/rows$', rows, coalesce=True)
+    mapper.add('/fails$', fails, coalesce=True)
+    mapper.add(r'/other/(\d+)$', upstream)
+    clients = serve(loop, mapper, PORT, connections)
+    assert IN_FLIGHT == {}
+    return [[(code, content) for code, headers, content in responses(c)] for c in clients], calls
+
+
+def test_connections():
+    r, calls = run(['/thing/1'], ['/thing/1'], ['/thing/1?a=1'], ['/thing/2'])
+    assert sorted(calls) == ['1', '1', '2']
+    assert r[0] == r[1] == [(200, '{"id": "1"}')]
+    assert r[2] == [(200, '{"id": "1"}')]
+    assert r[3] == [(200, '{"id": "2"}')]
+
+
+def test_pipelined():
+    r, calls = run(['/thing/1', '/thing/2', '/thing/1'])
+    assert calls == ['1', '2']
+    assert r == [[(200, '{"id": "1"}'), (200, '{"id": "2"}'), (200, '{"id": "1"}')]]
+
+
+def test_sequential():
+    run(['/thing/1'])
+    r, calls = run(['/thing/1'])
+    assert calls == ['1']
+
+
+def test_not_coalesced():
+    r, calls = run(['/other/1'], ['/other/1'])
+    assert calls == ['1', '1']
+
+
+def test_error():
+    r, calls = run(['/fails'], ['/fails'])
+    assert calls == ['fails']
+    assert r == [[(400, 'no')], [(400, 'no')]]
+
+
+def test_iterator():
+    r, calls = run(['/rows'], ['/rows'])
+    assert calls == ['rows', 'rows']  # iterators aren't shared; each connection runs its own
+    assert r[0] == r[1] == [(200, 'abc')]
+
+
+def test_servers():
+    loop = Loop(network.Server(), TIMERS)
+
+    def mapper(name):
+        def thing(request):
+            request.delay()
+            loop.call_later(.02, request.respond, name)
+        m = RESTMapper()
+        m.add('/thing$', thing, coalesce=True)
+        return m
+
+    loop.server.add_server(PORT + 1, RESTHandler, mapper('other'))
+    other = loop.server.add_connection(('localhost', PORT + 1), Client, ['/thing'])
+    c, = serve(loop, mapper('this'), PORT, [['/thing']], until=lambda clients: is_answered(clients + [other]))
+    assert IN_FLIGHT == {}
+    assert responses(c)[0][2] == 'this'
+    assert responses(other)[0][2] == 'other'  # not joined to the first server's request
+
+
+def test_micro():
+    p = Parser.parse([
+        'SERVER test 12345',
+        'ROUTE /foo$',
+        'GET a.b coalesce=true',
+    ])
+    assert p.servers['test'].routes[0].coalesce is True
+    with pytest.raises(Exception):
+        Parser.parse(['SERVER test 12345', 'ROUTE /foo$', 'POST a.c coalesce=true'])
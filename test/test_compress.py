@@ -0,0 +1,164 @@
+import zlib
+
+import pytest
+
+import rhc.tcpsocket as network
+from rhc import async
+from rhc.compress import CompressionCache, Decompressor, DecompressionError, accepted_encoding, compress
+from rhc.loop import Loop
+from rhc.resthandler import RESTHandler, RESTMapper
+from rhc.tcpsocket import SERVER
+
+from rest_client import responses, serve
+
+
+PORT = 12352
+
+
+@pytest.mark.parametrize('header, expected', [
+    (None, None),
+    ('', None),
+    ('identity', None),
+    ('gzip', 'gzip'),
+    ('deflate, gzip', 'gzip'),
+    ('gzip;q=0.5, deflate', 'deflate'),
+    ('gzip;q=0, deflate;q=0', None),
+    ('*', 'gzip'),
+    ('br, DEFLATE', 'deflate'),
+])
+def test_accepted_encoding(header, expected):
+    assert accepted_encoding(header) == expected
+
+
+def test_compress():
+    content = 'abc' * 1000
+    assert zlib.decompress(compress(content, 'gzip'), 16 + zlib.MAX_WBITS) == content
+    assert zlib.decompress(compress(content, 'deflate')) == content
+
+
+@pytest.mark.parametrize('encoding, wbits', [('gzip', 16 + zlib.MAX_WBITS), ('deflate', zlib.MAX_WBITS), ('deflate', -zlib.MAX_WBITS)])
+def test_decompressor(encoding, wbits):
+    c = zlib.compressobj(6, zlib.DEFLATED, wbits)
+    data = c.compress('abc' * 1000) + c.flush()
+    d = Decompressor(encoding)
+    result = ''.join(d.decompress(data[i:i + 1]) for i in range(len(data))) + d.flush()
+    assert result == 'abc' * 1000
+
+
+def test_decompressor_limit():
+    data = compress('\0' * 100000, 'gzip')
+    d = Decompressor('gzip', max_size=1000)
+    with pytest.raises(DecompressionError):
+        d.decompress(data)
+    d = Decompressor('gzip', max_size=100000)
+    assert len(d.decompress(data) + d.flush()) == 100000
+
+
+def test_decompressor_error():
+    with pytest.raises(DecompressionError):
+        Decompressor('gzip').decompress('not gzip')
+
+
+def test_cache():
+    cache = CompressionCache(size=300, max_item=100)  # room for two entries of 100 bytes (plus compressed)
+    first = cache.compress('a' * 100, 'gzip')
+    assert cache.compress('a' * 100, 'gzip') is first
+    deflated = cache.compress('a' * 100, 'deflate')
+    assert deflated.startswith('x')
+    assert len(cache) == 2
+    cache.compress('b' * 101, 'gzip')  # too big to cache
+    assert len(cache) == 2
+    assert cache.compress('a' * 100, 'deflate') is deflated
+    cache.compress('c' * 100, 'gzip')  # evicts the least recently used (gzip)
+    assert len(cache) == 2
+    assert cache.compress('a' * 100, 'deflate') is deflated
+    assert cache.compress('a' * 100, 'gzip') is not first
+
+
+class Handler(RESTHandler):
+
+    def __init__(self, socket, context):
+        super(Handler, self).__init__(socket, context)
+        self.http_compress_threshold = 100
+
+
+def run(requests):
+    loop = Loop(network.Server())
+
+    def big(request):
+        return {'data': 'x' * 1000}
+
+    def slow(request):
+        request.delay()
+        loop.call_later(.01, request.respond, {'data': 'y' * 1000})
+
+    def small(request):
+        return 'small'
+
+    def rows(request):
+        return 200, ('row %d\n' % i for i in range(100))
+
+    mapper = RESTMapper()
+    mapper.add('/big$', big)
+    mapper.add('/slow$', slow)
+    mapper.add('/small$', small)
+    mapper.add('/rows$', rows)
+    c, = serve(loop, mapper, PORT, [requests], handler=Handler, timeout=2)
+    return [(headers, content) for code, headers, content in responses(c)]
+
+
+def test_response():
+    gzip = 'Accept-Encoding: gzip\r\n'
+    responses = run([('/slow', gzip), ('/big', ''), ('/big', 'Accept-Encoding: deflate\r\n'), ('/small', gzip)])
+
+    headers, content = responses[0]  # delayed response: uses its own request's Accept-Encoding
+    assert headers['Content-Encoding'] == 'gzip'
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert zlib.decompress(content, 16 + zlib.MAX_WBITS) == '{"data": "%s"}' % ('y' * 1000)
+
+    headers, content = responses[1]
+    assert 'Content-Encoding' not in headers
+    assert headers['Vary'] == 'Accept-Encoding'
+    assert content == '{"data": "%s"}' % ('x' * 1000)
+
+    headers, content = responses[2]
+    assert headers['Content-Encoding'] == 'deflate'
+    assert zlib.decompress(content) == '{"data": "%s"}' % ('x' * 1000)
+
+    headers, content = responses[3]
+    assert 'Content-Encoding' not in headers
+    assert content == 'small'
+
+
+def test_chunked():
+    [(headers, content)] = run([('/rows', 'Accept-Encoding: gzip\r\n')])
+    assert headers['Content-Encoding'] == 'gzip'
+    assert zlib.decompress(content, 16 + zlib.MAX_WBITS) == ''.join('row %d\n' % i for i in range(100))
+
+
+def test_client():
+    def big(request):
+        return {'data': 'x' * 1000}
+
+    mapper = RESTMapper()
+    mapper.add('/big$', big)
+    SERVER.add_server(PORT, Handler, mapper)
+    result = []
+    sent = []
+
+    class Check(async.ConnectHandler):
+        def on_http_send(self, headers, content):
+            sent.append(headers)
+
+        def evaluate(self):
+            result.append(self.http_headers.get('Content-Encoding'))
+            return super(Check, self).evaluate()
+
+    async.connect(lambda rc, r: result.append((rc, r)), 'http://localhost:%d/big' % PORT, handler=Check, compress=True)
+    loop = Loop(SERVER)
+    guard = loop.call_later(2, loop.stop)
+    loop.run(until=lambda: len(result) == 2)
+    guard.cancel()
+    SERVER.close()
+    assert 'Accept-Encoding: gzip, deflate' in sent[0]
+    assert result == ['gzip', (0, {'data': 'x' * 1000})]
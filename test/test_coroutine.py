@@ -0,0 +1,184 @@
+import pytest
+
+import rhc.task as task
+import rhc.tcpsocket as network
+import rhc.timer as timer
+from rhc.coroutine import coroutine, PartialError, Return
+from rhc.loop import Loop
+from rhc.resthandler import RESTMapper
+
+from rest_client import responses, serve
+
+
+PORT = 12347
+
+
+class Result(object):
+
+    def __call__(self, rc, result):
+        self.rc = rc
+        self.result = result
+
+
+def happy(cb):
+    cb(0, 'yay')
+
+
+def not_happy(cb):
+    cb(1, 'boo')
+
+
+@task.partial
+def double(task, value):
+    task.respond(value * 2)
+
+
+@coroutine
+def add(a, b):
+    yield happy
+    raise Return(a + b)
+
+
+def test_sync():
+
+    @coroutine
+    def co():
+        a = yield happy
+        b = yield double(2)
+        c = yield add(1, 2)
+        raise Return((a, b, c))
+
+    r = Result()
+    co()(r)
+    assert r.rc == 0
+    assert r.result == ('yay', 4, 3)
+
+
+def test_no_return():
+
+    @coroutine
+    def co():
+        yield happy
+
+    r = Result()
+    co()(r)
+    assert r.rc == 0
+    assert r.result is None
+
+
+def test_partial_error():
+
+    @coroutine
+    def caught():
+        try:
+            yield not_happy
+        except PartialError as e:
+            raise Return('caught %s' % e.result)
+
+    @coroutine
+    def uncaught():
+        yield not_happy
+        raise Return('unreachable')
+
+    r = Result()
+    caught()(r)
+    assert r.rc == 0
+    assert r.result == 'caught boo'
+
+    uncaught()(r)
+    assert r.rc == 1
+    assert r.result == 'boo'
+
+
+def test_exception():
+
+    @coroutine
+    def co():
+        yield happy
+        raise ValueError('bad')
+
+    r = Result()
+    co()(r)
+    assert r.rc == 1
+    assert r.result == 'bad'
+
+
+def test_not_a_partial():
+
+    @coroutine
+    def co():
+        try:
+            yield 'not callable'
+        except TypeError:
+            raise Return('ok')
+
+    r = Result()
+    co()(r)
+    assert r.result == 'ok'
+
+
+def test_deferred():
+    loop = Loop(network.Server(), timer.Timer())
+
+    def later(value):
+        def _callback(cb):
+            loop.call_later(.01, cb, 0, value)
+        return _callback
+
+    @coroutine
+    def co():
+        values = []
+        for i in range(3):
+            value = yield later(i)
+            values.append(value)
+        raise Return(values)
+
+    r = Result()
+    co()(r)
+    assert not hasattr(r, 'rc')
+    loop.run(until=lambda: hasattr(r, 'rc'))
+    assert r.result == [0, 1, 2]
+
+
+def test_deep_sync():
+
+    @coroutine
+    def co():
+        total = 0
+        for i in range(5000):  # synchronous partials don't grow the stack
+            total += yield double(1)
+        raise Return(total)
+
+    r = Result()
+    co()(r)
+    assert r.result == 10000
+
+
+def rest_ok(request, value):
+    result = yield double(value)
+    raise Return({'result': result})
+
+
+def rest_fail(request):
+    yield not_happy
+
+
+def rest_exception(request):
+    yield happy
+    raise ValueError('bad')
+
+
+@pytest.mark.parametrize('resource,expect', [
+    ('/ok/abc', ('HTTP/1.1 200 OK', '{"result": "abcabc"}')),
+    ('/fail', ('HTTP/1.1 400 Bad Request', 'boo')),
+    ('/exception', ('HTTP/1.1 501 Internal Server Error', '')),
+])
+def test_rest(resource, expect):
+    mapper = RESTMapper()
+    mapper.add('/ok/(.*)$', rest_ok)
+    mapper.add('/fail$', rest_fail)
+    mapper.add('/exception$', rest_exception)
+    c, = serve(Loop(network.Server(), timer.Timer()), mapper, PORT, [[(resource, 'Connection: close\r\n')]])
+    [(code, headers, content)] = responses(c)
+    assert c.response.startswith(expect[0])
+    assert content == expect[1]
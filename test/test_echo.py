@@ -28,3 +28,77 @@ def test_echo():
     while c.is_open:  # keep going until the client closes
         n.service()
     n.close()
+
+
+class BulkServer(network.BasicHandler):
+
+    def on_ready(self):
+        self.is_queued = False
+        for i in range(100):
+            self.send(('%02d' % i) * 25000)  # 5MB in 50KB pieces
+        self.is_queued = True
+        if self.queued_bytes == 0:  # everything fit in the socket buffer
+            self.close()
+
+    def on_send_complete(self):
+        assert self.queued_bytes == 0
+        if self.is_queued:
+            self.close()
+
+
+class BulkClient(network.BasicHandler):
+
+    def on_ready(self):
+        self.received = []
+
+    def on_data(self, data):
+        self.received.append(data)
+
+
+def test_send_queue():
+    n = network.Server()
+    n.add_server(PORT, BulkServer)
+    c = n.add_connection(('localhost', PORT), BulkClient)
+    while c.is_open:
+        n.service()
+    data = ''.join(c.received)
+    assert data == ''.join(('%02d' % i) * 25000 for i in range(100))
+    assert c._recv_size > c.RECV_LEN  # read size grew under load
+    n.close()
+
+
+class EmptyServer(BulkServer):
+
+    def on_ready(self):
+        self.is_queued = False
+        for i in range(100):
+            self.send(('%02d' % i) * 25000)
+            self.send('')  # ignored, queued or not
+        self.is_queued = True
+        if self.queued_bytes == 0:
+            self.close()
+
+
+def test_send_empty():
+    n = network.Server()
+    n.add_server(PORT, EmptyServer)
+    c = n.add_connection(('localhost', PORT), BulkClient)
+    for _ in range(100000):
+        if c.closed:
+            break
+        n.service(.01)
+    n.close()
+    assert c.closed  # the server finished sending, and closed
+    assert ''.join(c.received) == ''.join(('%02d' % i) * 25000 for i in range(100))
+
+
+def test_recv_size():
+    h = network.BasicHandler(None)
+    h.RECV_LEN, h.MAX_RECV_LEN = 1024, 4096
+    assert h._next_recv_size(1024, 1024) == 2048  # full read: grow
+    assert h._next_recv_size(4096, 4096) == 4096  # not past MAX_RECV_LEN
+    assert h._next_recv_size(4096, 2000) == 4096  # steady
+    assert h._next_recv_size(4096, 10) == 2048    # short read: shrink
+    assert h._next_recv_size(1024, 10) == 1024    # not below RECV_LEN
+    h.MAX_RECV_LEN = 0
+    assert h._next_recv_size(1024, 1024) == 1024  # fixed size
@@ -0,0 +1,45 @@
+import pytest
+
+from rhc.headers import HTTPHeaders
+
+
+def test_case():
+    h = HTTPHeaders({'Content-Type': 'text/plain'})
+    assert h['content-type'] == 'text/plain'
+    assert h.get('CONTENT-TYPE') == 'text/plain'
+    assert 'content-TYPE' in h
+    h['content-type'] = 'application/json'
+    assert h.items() == [('Content-Type', 'application/json')]  # keeps the first spelling
+    assert len(h) == 1
+    del h['CONTENT-type']
+    assert 'Content-Type' not in h
+    with pytest.raises(KeyError):
+        h['Content-Type']
+    assert h.get('Content-Type', 'x') == 'x'
+
+
+def test_multiple():
+    h = HTTPHeaders()
+    h.add('Set-Cookie', 'a=1')
+    h.add('set-cookie', 'b=2')
+    assert h['Set-Cookie'] == 'b=2'
+    assert h.get_all('SET-COOKIE') == ['a=1', 'b=2']
+    assert h.multi_items() == [('Set-Cookie', 'a=1'), ('Set-Cookie', 'b=2')]
+    assert h.items() == [('Set-Cookie', 'b=2')]
+    assert h.get_all('Other') == []
+    h['Set-Cookie'] = 'c=3'
+    assert h.get_all('Set-Cookie') == ['c=3']
+
+
+def test_dict():
+    h = HTTPHeaders(A='1', b='2')
+    assert h == {'A': '1', 'b': '2'}
+    assert dict(h) == {'A': '1', 'b': '2'}
+    assert sorted(h.keys()) == ['A', 'b']
+    assert h.pop('a') == '1'
+    assert h.pop('a', None) is None
+    assert h.setdefault('B', '3') == '2'
+    assert h.setdefault('C', '3') == '3'
+    c = h.copy()
+    c.add('c', '4')
+    assert h.get_all('c') == ['3']
@@ -1,6 +1,9 @@
+import zlib
+
 import pytest
 
-from rhc.httphandler import HTTPHandler
+from rhc.compress import compress
+from rhc.httphandler import MAX_DECOMPRESSED, HTTPHandler, http_date, status_line
 from rhc.resthandler import RESTRequest
 
 
@@ -185,3 +188,217 @@ for record in data['feedback']['record']:
     assert handler.request.http_multipart[0].disposition['name'] == '"foo"'
     assert handler.request.http_multipart[0].content == 'whatever\r\n'
     assert handler.request.http_multipart[1].disposition['filename'] == '"tmp.py"'
+
+
+def test_content_split(handler):
+    handler.on_data('POST /upload HTTP/1.1\r\nContent-Length: 10\r\n\r\nabc')
+    assert not hasattr(handler, 'request')
+    handler.on_data('de')
+    handler.on_data('12345GET /next HTTP/1.1\r\n')
+    assert handler.request.http_content == 'abcde12345'
+    handler.on_data('Content-Length: 0\r\n\r\n')
+    assert handler.request.http_resource == '/next'
+
+
+def test_content_preallocate(handler, monkeypatch):
+    monkeypatch.setattr('rhc.httphandler.MAX_PREALLOCATE', 4)
+    handler.on_data('POST /upload HTTP/1.1\r\nContent-Length: 10\r\n\r\nab')
+    assert len(handler._HTTPHandler__body) == 4  # not the whole Content-Length
+    handler.on_data('cde')
+    handler.on_data('12345')
+    assert handler.request.http_content == 'abcde12345'
+
+
+def test_content_huge(handler):
+    handler.on_data('POST /upload HTTP/1.1\r\nContent-Length: 50000000000\r\n\r\nabc')
+    assert handler.is_open
+    assert len(handler._HTTPHandler__body) == 1024 * 1024
+
+
+def test_content_negative(handler):
+    handler.on_data('POST /upload HTTP/1.1\r\nContent-Length: -5\r\n\r\nabc')
+    assert handler.closed
+    assert handler.error == 'Invalid content length'
+
+
+def test_pipelined(handler):
+    messages = []
+    handler.on_http_data = lambda: messages.append((handler.http_resource, handler.http_content))
+    handler.on_data(
+        'POST /a HTTP/1.1\r\nContent-Length: 3\r\n\r\nabc'
+        'GET /b HTTP/1.1\r\nHost: x\r\n\r\n'
+        'POST /c HTTP/1.1\r\nContent-Length: 4\r\n\r\n\r\n\r\n'
+    )
+    assert messages == [('/a', 'abc'), ('/b', ''), ('/c', '\r\n\r\n')]
+
+
+def test_header_bare_newlines(handler):
+    handler.on_data('GET /a HTTP/1.1\nHost: x\n\nPOST /b HTTP/1.1\r\nContent-Length: 4\r\n\r\n\r\n\r\n')
+    assert handler.request.http_resource == '/b'
+    assert handler.request.http_content == '\r\n\r\n'
+    assert handler.request.http_headers['Content-Length'] == '4'
+
+
+def test_header_line_too_long(handler):
+    handler.http_max_line_length = 10
+    handler.on_data('GET /a HTTP/1.1\r\nHost: abcdefghijkl\r\n\r\n')
+    assert handler.closed
+    assert handler.error == 'too much data without a line termination (b)'
+
+
+def test_chunked_split(handler):
+    data = 'HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nabcde\r\n3\r\n123\r\n0\r\n\r\n'
+    for c in data:
+        handler.on_data(c)
+    assert handler.request.http_content == 'abcde123'
+    assert isinstance(handler.request.http_content, str)
+
+
+def test_lean(handler):
+    handler.http_lean = True
+    handler.on_data('POST /a?x=1&y=2 HTTP/1.1\r\nContent-Type: text/plain; charset=utf-8\r\nContent-Length: 2\r\n\r\n\xc3\xa9')
+    request = handler.request
+    assert request.http_message == ''
+    assert request._http_query is None
+    assert request.http_query == {'x': '1', 'y': '2'}
+    assert request._charset == 'utf-8'
+    assert request.http_content == u'\xe9'
+    assert request._timestamp is None
+    assert request.timestamp.year >= 2017
+
+
+def test_not_lean(handler):
+    handler.on_data('POST /a?x=1 HTTP/1.1\r\nContent-Type: text/plain; charset=utf-8\r\nContent-Length: 2\r\n\r\n\xc3\xa9')
+    request = handler.request
+    assert request.http_message.startswith('POST /a?x=1')
+    assert request._http_query == {'x': '1'}
+    assert request._charset is None
+    assert request.http_content == u'\xe9'
+
+
+def test_mock_query():
+    from rhc.mockrequest import MockHandler, MockRequest
+    request = MockRequest(MockHandler(http_query={'a': 'b'}, http_headers={}))
+    assert request.http_query == {'a': 'b'}
+
+
+def test_stream(handler):
+    chunks = []
+    handler.http_stream = True
+    handler.http_spill_threshold = 4
+    original = handler.on_http_body_chunk
+
+    def on_chunk(data):
+        chunks.append(data)
+        original(data)
+    handler.on_http_body_chunk = on_chunk
+
+    handler.on_data('POST /a HTTP/1.1\r\nContent-Type: text/plain; charset=utf-8\r\nContent-Length: 10\r\n\r\nabc')
+    handler.on_data('de12345')
+    assert chunks == ['abc', 'de12345']
+    request = handler.request
+    assert request.http_body._rolled  # spilled to a file
+    assert request.http_body.read() == 'abcde12345'
+    request.http_body.seek(0)
+    assert request.http_content == u'abcde12345'
+    assert handler.http_content == ''
+
+
+def test_stream_chunked(handler):
+    handler.http_stream = True
+    handler.on_data('POST /a HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nabcde\r\n3\r\n12')
+    handler.on_data('3\r\n0\r\n\r\n')
+    assert not handler.request.http_body._rolled
+    assert handler.request.http_content == 'abcde123'
+
+
+def test_stream_chunked_max(handler):
+    handler.http_stream = True
+    handler.http_max_content_length = 6
+    handler.send_server = lambda **kwargs: None
+    handler.on_data('POST /a HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nabcde\r\n3\r\n123\r\n')
+    assert handler.closed
+    assert handler.error == 'Content-Length exceeds maximum length'
+
+
+def test_body(handler):
+    handler.on_data('POST /a HTTP/1.1\r\nContent-Length: 3\r\n\r\nabc')
+    assert handler.request.http_body.read() == 'abc'
+
+
+def test_stream_multipart(handler):
+    ended = []
+    handler.http_stream = True
+    handler.on_http_part_end = lambda part: ended.append(part.disposition['name'])
+    body = '--xyz\r\nContent-Disposition: form-data; name="a"\r\n\r\n123\r\n--xyz\r\nContent-Disposition: form-data; name="b"\r\n\r\n456\r\n--xyz--\r\n'
+    handler.on_data('POST /a HTTP/1.1\r\nContent-Type: multipart/form-data; boundary=xyz\r\nContent-Length: %d\r\n\r\n' % len(body))
+    handler.on_data(body[:65])
+    assert ended == ['"a"']
+    handler.on_data(body[65:])
+    assert ended == ['"a"', '"b"']
+    request = handler.request
+    assert [part.content for part in request.http_multipart] == ['123', '456']
+    assert request.http_headers['Content-Type'] == 'multipart/form-data'
+
+
+def test_stream_multipart_malformed(handler):
+    handler.http_stream = True
+    handler.on_data('POST /a HTTP/1.1\r\nContent-Type: multipart/form-data; boundary=xyz\r\nContent-Length: 12\r\n\r\n--xyz\r\nabcde')
+    assert handler.closed
+    assert handler.error.startswith('Malformed multipart message')
+
+
+def test_gzip_split(handler):
+    body = zlib.compress('abc' * 1000)
+    handler.on_data('POST /a HTTP/1.1\r\nContent-Encoding: deflate\r\nContent-Length: %d\r\n\r\n%s' % (len(body), body[:10]))
+    handler.on_data(body[10:])
+    assert handler.request.http_content == 'abc' * 1000
+
+
+def test_gzip_chunked(handler):
+    body = compress('abc' * 1000, 'gzip')
+    handler.on_data('POST /a HTTP/1.1\r\nContent-Encoding: gzip\r\nTransfer-Encoding: chunked\r\n\r\n')
+    for i in range(0, len(body), 7):
+        chunk = body[i:i + 7]
+        handler.on_data('%x\r\n%s\r\n' % (len(chunk), chunk))
+    handler.on_data('0\r\n\r\n')
+    assert handler.request.http_content == 'abc' * 1000
+
+
+def test_gzip_max(handler):
+    assert handler.http_max_decompressed_length == MAX_DECOMPRESSED  # limited by default
+    handler.http_max_decompressed_length = 1000
+    body = compress('\0' * 100000, 'gzip')
+    handler.on_data('POST /a HTTP/1.1\r\nContent-Encoding: gzip\r\nContent-Length: %d\r\n\r\n%s' % (len(body), body))
+    assert handler.closed
+    assert handler.error == 'Content-Encoding: decompressed content exceeds 1000 bytes'
+    assert not hasattr(handler, 'request')
+
+
+def test_send_server(handler):
+    sent = []
+    handler.on_http_send = lambda headers, content: sent.append(headers)
+    handler.send_server('abc', code=404, message='Not Found', headers={'X-A': '1'}, header_block='X-B: 2\r\n')
+    lines = sent[0].split('\r\n')
+    assert lines[0] == 'HTTP/1.1 404 Not Found'
+    assert lines[1] == 'Date: %s' % http_date()
+    assert lines[2:] == ['Content-Length: 3', 'X-A: 1', 'X-B: 2', '', '']
+
+
+def test_status_line():
+    assert status_line(200, 'OK') is status_line(200, 'OK')
+    assert status_line(299, 'Whatever') == 'HTTP/1.1 299 Whatever\r\n'
+
+
+def test_repeated_headers(handler):
+    handler.on_data('GET / HTTP/1.1\r\nSet-Cookie: a=1\r\nset-cookie: b=2\r\nHost: x\r\n\r\n')
+    headers = handler.request.http_headers
+    assert headers.get_all('Set-Cookie') == ['a=1', 'b=2']
+    assert headers['HOST'] == 'x'
+    assert len(headers) == 2
+
+
+def test_header_count(handler):
+    handler.http_max_header_count = 2
+    handler.on_data('GET / HTTP/1.1\r\nA: 1\r\nA: 2\r\nA: 3\r\n\r\n')
+    assert handler.error == 'Too many header records defined'
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from rhc import jsoncodec
+from rhc.jsoncodec import CODEC
+from rhc.micro_fsm.parser import Parser
+from rhc.resthandler import RESTResult
+
+
+@pytest.fixture
+def codec():
+    yield CODEC
+    jsoncodec.configure()
+    CODEC.stop_timing()
+
+
+def test_default(codec):
+    value = {'a': [1, 2.5, None], 'b': u'\xe9'}
+    assert codec.dumps(value) == json.dumps(value)
+    assert codec.loads(json.dumps(value)) == value
+
+
+def test_options(codec):
+    jsoncodec.configure(compact=True, ensure_ascii=False)
+    assert codec.dumps({'a': [1, u'\xe9']}) == u'{"a":[1,"\xe9"]}'
+
+
+def test_plugged(codec):
+    jsoncodec.configure(dumps=lambda value: 'dumped', loads='json.loads')
+    assert RESTResult(content={'a': 1}).content == 'dumped'
+    assert codec.loads('[1]') == [1]
+
+
+def test_timing(codec):
+    codec.start_timing()
+    RESTResult(content={'a': 1})
+    RESTResult(content=[1])
+    codec.loads('{}', 'somewhere')
+    times = codec.stop_timing()
+    assert times['rest.response'][0] == 2
+    assert times['somewhere'][0] == 1
+    assert codec.times is None
+
+
+def test_micro_config():
+    p = Parser.parse(['SERVER test 12345'])
+    assert p.config.json.dumps is None
+    assert p.config.json.compact is False
+    assert p.config.json.ensure_ascii is True
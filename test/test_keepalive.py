@@ -0,0 +1,91 @@
+import rhc.tcpsocket as network
+from rhc.loop import Loop
+from rhc.resthandler import RESTHandler, RESTMapper
+from rhc.timer import TIMERS
+
+import rest_client
+
+
+PORT = 12350
+
+
+class Handler(RESTHandler):
+
+    def __init__(self, socket, context):
+        super(Handler, self).__init__(socket, context)
+        self.http_keep_alive_timeout = context.context.get('timeout')
+        self.http_keep_alive_max = context.context.get('max')
+
+
+class BodyClient(rest_client.Client):
+
+    ''' send the last request's body once the first response arrives '''
+
+    def on_data(self, data):
+        super(BodyClient, self).on_data(data)
+        if len(rest_client.responses(self)) == 1:
+            self.send('0123456789')
+
+
+def run(requests, client=rest_client.Client, **settings):
+    loop = Loop(network.Server(), TIMERS)
+    posted = []
+
+    def slow(request):
+        request.delay()
+        loop.call_later(.02, request.respond, 'slow')
+
+    def fast(request):
+        return 'fast'
+
+    def post(request):
+        posted.append(request)
+        return 'posted'
+
+    mapper = RESTMapper(settings)
+    mapper.add('/slow$', slow)
+    mapper.add('/fast$', fast)
+    mapper.add('/post$', post=post)
+    c, = rest_client.serve(loop, mapper, PORT, [requests], handler=Handler, client=client)
+    c.posted = len(posted)
+    return c
+
+
+def responses(c):
+    return [(content, headers.get('Connection') == 'close') for code, headers, content in rest_client.responses(c)]
+
+
+def test_ordered():
+    c = run(['/slow', '/fast', '/slow', '/fast'])
+    assert responses(c) == [('slow', False), ('fast', False), ('slow', False), ('fast', False)]
+    assert c.is_open
+
+
+def test_close_pipelined():
+    post = ('/post', 'Connection: close\r\nContent-Length: 10\r\n', 'POST')  # still reading the body when /slow responds
+    c = run(['/slow', post], client=BodyClient)
+    assert responses(c) == [('slow', False), ('posted', True)]  # the close is for the second response only
+
+
+def test_max():
+    c = run(['/fast', '/slow', '/fast'], max=2)
+    assert responses(c) == [('fast', False), ('slow', True)]
+    assert c.closed
+
+
+def test_max_pipelined():
+    c = run([('/post', '', 'POST')] * 3, max=2)
+    assert responses(c) == [('posted', False), ('posted', True)]
+    assert c.closed
+    assert c.posted == 2  # the request past the max is never handled
+
+
+def test_idle():
+    c = run([], timeout=.05)
+    assert c.closed
+    assert c.response == ''
+
+
+def test_idle_busy():
+    c = run(['/slow'], timeout=.01)  # a request in progress isn't idle
+    assert responses(c) == [('slow', False)]
@@ -0,0 +1,87 @@
+import time
+
+import rhc.tcpsocket as network
+import rhc.timer as timer
+from rhc.loop import Loop
+
+
+PORT = 12346
+
+
+class CountingServer(network.Server):
+
+    def _service(self, timeout):
+        self.passes += 1
+        return super(CountingServer, self)._service(timeout)
+
+
+def loop():
+    server = CountingServer()
+    server.passes = 0
+    return Loop(server, timer.Timer())
+
+
+def test_call_soon():
+    l = loop()
+    result = []
+    l.call_soon(result.append, 1)
+    l.call_soon(lambda: l.call_soon(result.append, 3))
+    l.call_soon(result.append, 2)
+    l.run_once()
+    assert result == [1, 2]
+    l.run_once()
+    assert result == [1, 2, 3]
+
+
+def test_call_later():
+    l = loop()
+    start = time.time()
+    l.call_later(.05, l.stop)
+    l.run()
+    elapsed = time.time() - start
+    assert .05 <= elapsed < .2
+    assert l.server.passes <= 2  # no idle wakeups while waiting
+
+
+def test_call_later_cancel():
+    l = loop()
+    result = []
+    l.call_later(.01, result.append, 1).cancel()
+    l.call_later(.02, l.stop)
+    l.run()
+    assert result == []
+
+
+def test_until():
+    l = loop()
+    result = []
+    l.call_later(.01, result.append, 1)
+    l.run(until=lambda: result)
+    assert result == [1]
+    assert l.is_running is False
+
+
+class EchoServer(network.BasicHandler):
+
+    def on_data(self, data):
+        self.send(data)
+
+
+class EchoClient(network.BasicHandler):
+
+    def on_ready(self):
+        self.send(b'test_data')
+
+    def on_data(self, data):
+        self.data = data
+        self.close()
+
+
+def test_network():
+    l = loop()
+    l.server.add_server(PORT, EchoServer)
+    c = l.server.add_connection(('localhost', PORT), EchoClient)
+    l.call_later(1, l.stop)  # guard
+    l.run(until=lambda: c.closed)
+    assert c.data == b'test_data'
+    l.server.close()
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+import rhc.metrics as metrics
+import rhc.tcpsocket as network
+from rhc.metrics import METRICS
+
+
+PORT = 12349
+
+
+def test_counter_gauge():
+    r = metrics.Registry()
+    c = r.counter('requests', 'requests handled')
+    c.inc()
+    c.inc(2)
+    assert r.counter('requests') is c
+    g = r.gauge('depth')
+    g.inc()
+    g.dec(3)
+    r.gauge('computed', fn=lambda: 42)
+    assert r.collect() == {'requests': 3, 'depth': -2, 'computed': 42}
+
+    with pytest.raises(ValueError):
+        r.gauge('requests')
+
+
+def test_histogram():
+    r = metrics.Registry()
+    h = r.histogram('size', (10, 100))
+    for value in (1, 10, 11, 500):
+        h.observe(value)
+    assert r.collect()['size'] == {
+        'buckets': [(10, 2), (100, 3), ('+Inf', 4)],
+        'sum': 522,
+        'count': 4,
+    }
+
+    text = r.to_text()
+    assert '# TYPE size histogram' in text
+    assert 'size_bucket{le="10"} 2' in text
+    assert 'size_bucket{le="+Inf"} 4' in text
+    assert 'size_count 4' in text
+
+
+def test_text():
+    r = metrics.Registry()
+    r.counter('a', 'the a').inc(5)
+    assert r.to_text() == '# HELP a the a\n# TYPE a counter\na 5\n'
+    assert json.loads(r.to_json()) == {'a': 5}
+
+
+class Echo(network.BasicHandler):
+
+    def on_data(self, data):
+        self.send(data)
+
+
+class Client(network.BasicHandler):
+
+    def on_ready(self):
+        self.send('12345')
+
+    def on_data(self, data):
+        self.close()
+
+
+def test_network():
+    before = METRICS.collect()
+    n = network.Server()
+    n.add_server(PORT, Echo)
+    c = n.add_connection(('localhost', PORT), Client)
+    while c.is_open:
+        n.service()
+        assert METRICS['rhc_connections_open'].collect() - before['rhc_connections_open'] <= 2
+    n.close()
+    after = METRICS.collect()
+    assert after['rhc_bytes_sent'] - before['rhc_bytes_sent'] == 10
+    assert after['rhc_bytes_received'] - before['rhc_bytes_received'] == 10
+    assert after['rhc_poll_wakeups'] > before['rhc_poll_wakeups']
+    assert after['rhc_poll_events']['count'] > before['rhc_poll_events']['count']
+
+
+class Request(object):
+
+    def __init__(self, query=None, headers=None):
+        self.http_query = query or {}
+        self.http_headers = headers or {}
+
+
+def test_stats():
+    code, content, headers, message, content_type = metrics.stats(Request())
+    assert 'rhc_bytes_sent' in json.loads(content)
+    assert content_type.startswith('application/json')
+
+    code, content, headers, message, content_type = metrics.stats(Request({'format': 'text'}))
+    assert '# TYPE rhc_bytes_sent counter' in content
+    assert content_type.startswith('text/plain')
@@ -10,10 +10,16 @@ def test_server():
     config = p.config.server.test
     assert config.port == 12345
     assert config.is_active is True
+    assert config.backlog == 100
+    assert config.http_max_decompressed_length == 100 * 1024 * 1024
     assert config.ssl.is_active is False
     assert config.ssl.keyfile is None
     assert config.ssl.certfile is None
 
+    p = Parser.parse(['SERVER test 12345 backlog=1024'])
+    assert p.servers['test'].backlog == 1024
+    assert p.config.server.test.backlog == 1024
+
 
 def test_route():
     p = Parser.parse([
@@ -56,6 +62,7 @@ def test_connection():
     assert c.timeout == 5.0
     assert c.handler is None
     assert c.wrapper is None
+    assert c.compress is False
 
     config = p.config.connection.foo
     assert config.url == 'http://foo.com:10101'
@@ -64,7 +71,7 @@ def test_connection():
     assert config.timeout == 5.0
 
     p = Parser.parse([
-        'CONNECTION bar http://bar.com:11101 is_json=false is_debug=true timeout=10.5 handler=the.handler wrapper=the.wrapper',
+        'CONNECTION bar http://bar.com:11101 is_json=false is_debug=true timeout=10.5 handler=the.handler wrapper=the.wrapper compress=true',
     ])
     assert p
     c = p.connections['bar']
@@ -75,6 +82,7 @@ def test_connection():
     assert c.timeout == 10.5
     assert c.handler == 'the.handler'
     assert c.wrapper == 'the.wrapper'
+    assert c.compress is True
 
     config = p.config.connection.bar
     assert config.url == 'http://bar.com:11101'
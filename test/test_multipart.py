@@ -0,0 +1,87 @@
+import pytest
+from StringIO import StringIO
+
+from rhc.multipart import MultipartParser, MultipartError
+
+
+BOUNDARY = '----WebKitFormBoundaryzNeA5Pv9NTCGzDAc'
+MESSAGE = (
+    'preamble\r\n'
+    '--' + BOUNDARY + '\r\n'
+    'Content-Disposition: form-data; name="foo"\r\n'
+    '\r\n'
+    'whatever\r\n'
+    '--' + BOUNDARY + '\r\n'
+    'Content-Disposition: form-data; name="uploadedfile"; filename="tmp.py"\r\n'
+    'Content-Type: text/x-python-script\r\n'
+    '\r\n'
+    'import sys\r\n\r\n--not-the-boundary\r\n'
+    '--' + BOUNDARY + '--\r\n'
+    'epilogue'
+)
+
+
+def parse(data, size, **kwargs):
+    parser = MultipartParser(BOUNDARY, **kwargs)
+    for i in range(0, len(data), size):
+        parser.feed(data[i:i + size])
+    parser.close()
+    return parser.parts
+
+
+@pytest.mark.parametrize('size', [1, 2, 7, 100, len(MESSAGE)])
+def test_split(size):
+    parts = parse(MESSAGE, size)
+    assert len(parts) == 2
+    assert parts[0].disposition == {'name': '"foo"'}
+    assert parts[0].content == 'whatever'
+    assert parts[1].headers['Content-Type'] == 'text/x-python-script'
+    assert parts[1].disposition['filename'] == '"tmp.py"'
+    assert parts[1].content == 'import sys\r\n\r\n--not-the-boundary'
+
+
+def test_no_headers():
+    parts = parse('--' + BOUNDARY + '\r\n\r\nabc\r\n--' + BOUNDARY + '--', 3)
+    assert parts[0].headers == {}
+    assert parts[0].content == 'abc'
+
+
+def test_spill():
+    parts = parse(MESSAGE, 5, spill_threshold=8)
+    assert not parts[0].file._rolled
+    assert parts[1].file._rolled
+    assert parts[1].file.read() == 'import sys\r\n\r\n--not-the-boundary'
+
+
+def test_callbacks():
+    targets = {}
+    ended = []
+
+    def on_part(part):
+        if 'filename' in part.disposition:
+            targets[part.disposition['filename']] = StringIO()
+            return targets[part.disposition['filename']]
+
+    parts = parse(MESSAGE, 10, on_part=on_part, on_part_end=ended.append)
+    assert ended == parts
+    assert parts[1].file is targets['"tmp.py"']
+    assert targets['"tmp.py"'].getvalue() == 'import sys\r\n\r\n--not-the-boundary'
+
+
+def test_incomplete():
+    parser = MultipartParser(BOUNDARY)
+    parser.feed(MESSAGE[:100])
+    with pytest.raises(MultipartError):
+        parser.close()
+
+
+def test_bad_boundary():
+    parser = MultipartParser(BOUNDARY)
+    with pytest.raises(MultipartError):
+        parser.feed('--' + BOUNDARY + 'xx')
+
+
+def test_header_too_long():
+    parser = MultipartParser(BOUNDARY, max_header_length=10)
+    with pytest.raises(MultipartError):
+        parser.feed('--' + BOUNDARY + '\r\nContent-Disposition: form-data')
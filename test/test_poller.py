@@ -0,0 +1,102 @@
+import select
+
+import pytest
+
+import rhc.tcpsocket as network
+
+
+PORT = 12345
+
+
+POLLERS = [network.PollPoller]
+if hasattr(select, 'epoll'):
+    POLLERS.append(network.EPollPoller)
+
+
+class EchoServer(network.BasicHandler):
+
+    def on_data(self, data):
+        self.send(data)
+
+
+class EchoClient(network.BasicHandler):
+
+    def on_ready(self):
+        self.count = 0
+        self.send(b'ping')
+
+    def on_data(self, data):
+        assert data == b'ping'
+        self.count += 1
+        if self.count == 10:
+            self.close()
+        else:
+            self.send(data)
+
+
+@pytest.mark.parametrize('poller', POLLERS)
+def test_echo(poller):
+    n = network.Server(poller())
+    n.add_server(PORT, EchoServer)
+    c = n.add_connection(('localhost', PORT), EchoClient)
+    while c.is_open:
+        n.service()
+    assert c.count == 10
+    n.close()
+    assert len(n._poller) == 0
+
+
+@pytest.mark.skipif(not hasattr(select, 'epoll'), reason='no epoll')
+def test_close_releases_epoll():
+    n = network.Server(network.EPollPoller())
+    n.add_server(PORT, EchoServer)
+    epoll = n._poller._epoll
+    n.close()
+    assert epoll.closed
+    n.add_server(PORT, EchoServer)  # reuse opens a new one
+    c = n.add_connection(('localhost', PORT), EchoClient)
+    while c.is_open:
+        n.service()
+    assert c.count == 10
+    n.close()
+
+
+class StalePoller(network.PollPoller):
+
+    def poll(self, timeout):
+        return [(-1, network.EVENT_READ)]  # a fileno closed by an earlier callback
+
+
+def test_closed_in_batch():
+    n = network.Server(StalePoller())
+    assert n._service(0) is True  # skipped, without a KeyError
+
+
+class CountingPoll(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def register(self, fileno, mask):
+        self.calls.append(('register', fileno, mask))
+
+    def modify(self, fileno, mask):
+        self.calls.append(('modify', fileno, mask))
+
+    def unregister(self, fileno):
+        self.calls.append(('unregister', fileno))
+
+
+def test_unchanged_mask():
+    p = network.PollPoller()
+    p._poll = CountingPoll()
+    p.register(10, network.EVENT_READ)
+    p.register(10, network.EVENT_READ)
+    p.register(10, network.EVENT_READ)
+    assert p._poll.calls == [('register', 10, network.EVENT_READ)]
+    p.register(10, network.EVENT_WRITE)
+    assert p._poll.calls[-1] == ('modify', 10, network.EVENT_WRITE)
+    p.unregister(10)
+    p.unregister(10)
+    assert p._poll.calls[-1] == ('unregister', 10)
+    assert len(p._poll.calls) == 3
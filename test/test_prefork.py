@@ -0,0 +1,54 @@
+import os
+import signal
+import time
+
+import rhc.prefork as prefork
+import rhc.tcpsocket as network
+
+
+PORT = 12345
+
+
+def test_reuse_port():
+    n1 = network.Server()
+    n2 = network.Server()
+    n1.add_server(PORT, network.BasicHandler, reuse_port=True)
+    n2.add_server(PORT, network.BasicHandler, reuse_port=True)  # would be EADDRINUSE without SO_REUSEPORT
+    n1.close()
+    n2.close()
+
+
+def read_lines(fd, count):
+    data = ''
+    while data.count('\n') < count:
+        data += os.read(fd, 100)
+    return data.split()
+
+
+def test_restart_and_stop():
+    r, w = os.pipe()
+
+    def worker(index):
+        os.write(w, '%d\n' % index)
+        while True:
+            time.sleep(1)
+
+    s = prefork.Supervisor(worker, 2, restart_delay=0)
+    s.start()
+    try:
+        assert len(s) == 2
+        assert sorted(read_lines(r, 2)) == ['0', '1']
+
+        pid, index = s._pids.items()[0]
+        os.kill(pid, signal.SIGKILL)  # crash
+        assert s._wait() is True
+        assert len(s) == 2
+        assert pid not in s._pids
+        assert read_lines(r, 1) == [str(index)]  # restarted with same index
+    finally:
+        s.stop()
+        while s._wait():
+            pass
+    assert len(s) == 0
+    os.close(r)
+    os.close(w)
@@ -26,3 +26,11 @@ class RESTHandlerTest(unittest.TestCase):
         self.assertEqual(h, 2)
         h, g = self.c._match('/foo', 'put')
         self.assertEqual(h, 5)
+
+    def test_headers(self):
+        self.c.add('/bar$', 6, headers={'Cache-Control': 'no-cache'})
+        h, g, mapping = self.c._lookup('/bar', 'GET')
+        self.assertEqual(h, 6)
+        self.assertEqual(mapping.header_block, 'Cache-Control: no-cache\r\n')
+        h, g, mapping = self.c._lookup('/foo', 'GET')
+        self.assertEqual(mapping.header_block, '')
@@ -0,0 +1,70 @@
+import re
+
+import pytest
+
+from rhc.router import Router, literal_prefix
+
+
+@pytest.mark.parametrize('pattern, prefix', [
+    ('/foo/bar$', '/foo/bar'),
+    (r'^/foo/(\d+)$', '/foo/'),
+    ('/foos?$', '/foo'),
+    ('/foo+', '/foo'),
+    ('/fo{2}', '/f'),
+    (r'/a\.b/c', '/a.b/c'),
+    (r'/a\d', '/a'),
+    ('/a|/b', ''),
+    ('/(a|b)/c', '/'),
+    ('/[|]/c', '/'),
+    ('.*', ''),
+    ('(?i)/foo', ''),
+])
+def test_literal_prefix(pattern, prefix):
+    assert literal_prefix(pattern) == prefix
+
+
+PATTERNS = [
+    ('/items$', 'get'),
+    (r'/items/(\d+)$', 'get'),
+    (r'/items/(\d+)$', 'put'),
+    ('/items/new$', 'get'),  # hidden by the previous get
+    (r'/items/(\w+)$', 'get'),
+    (r'/users/(?P<name>\w+)$', 'get'),
+    (r'/(\w+)/(\w+)/x$', 'get'),
+    ('(?i)/CASE$', 'get'),
+    ('/(a+)-\\1$', 'get'),
+    ('/items', 'post'),
+    ('/itemz$', 'get'),
+    ('/(.*)$', 'delete'),
+    (r'/other/(\d+)$', 'get'),
+    (r'/v(\d)/(\w+)$', 'get'),
+    ('.*', 'get'),
+]
+RESOURCES = [
+    '/items', '/items/12', '/items/new', '/items/abc', '/users/bob', '/a/b/x', '/case', '/CASE',
+    '/aa-aa', '/aa-a', '/itemz', '/item', '/items/12/more', '/other/3', '/v1/foo', '/nothing', '',
+]
+
+
+def linear(resource, method):
+    for index, (pattern, m) in enumerate(PATTERNS):
+        match = re.match(pattern, resource)
+        if match and m == method:
+            return index + 1, match.groups()
+    return None, None
+
+
+@pytest.mark.parametrize('resource', RESOURCES)
+@pytest.mark.parametrize('method', ['get', 'PUT', 'post', 'delete', 'head'])
+def test_equivalent(resource, method):
+    router = Router([(re.compile(p), {m: i + 1}, None) for i, (p, m) in enumerate(PATTERNS)])  # handlers must be truthy
+    handler, groups, _ = router.lookup(resource, method)
+    assert (handler, groups) == linear(resource, method.lower())
+
+
+def test_many_groups():
+    routes = [(re.compile(r'/?(x)(%d)/(\w+)$' % i), {'get': i + 1}, i) for i in range(200)]  # no literal prefix
+    router = Router(routes)
+    assert len(router._tables['get'].blocks) > 1
+    for i in (0, 33, 199):
+        assert router.lookup('/x%d/abc' % i, 'GET') == (i + 1, ('x', str(i), 'abc'), i)
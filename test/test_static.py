@@ -0,0 +1,177 @@
+import os
+import time
+
+import pytest
+
+import rhc.static as static
+import rhc.tcpsocket as network
+from rhc.loop import Loop
+from rhc.micro_fsm.parser import Parser
+from rhc.resthandler import RESTMapper
+
+from rest_client import responses, serve
+
+
+PORT = 12345
+
+
+class Request(object):
+
+    def __init__(self, **headers):
+        self.http_headers = headers
+
+
+@pytest.fixture
+def root(tmpdir):
+    tmpdir.join('hello.txt').write('hello world')
+    tmpdir.join('empty.txt').write('')
+    tmpdir.mkdir('sub').join('data.json').write('{}')
+    return str(tmpdir)
+
+
+def test_serve(root):
+    result = static.serve(Request(), root, 'hello.txt')
+    assert result.code == 200
+    assert str(result.content) == 'hello world'
+    assert result.headers['Content-Type'] == 'text/plain'
+    assert result.headers['ETag']
+    assert result.headers['Accept-Ranges'] == 'bytes'
+
+    result = static.serve(Request(), root, '/sub/data.json')
+    assert str(result.content) == '{}'
+    assert result.headers['Content-Type'] == 'application/json'
+
+    result = static.serve(Request(), root, 'empty.txt')
+    assert result.code == 200
+    assert result.content == ''
+
+
+def test_not_found(root):
+    assert static.serve(Request(), root, 'nope.txt').code == 404
+    assert static.serve(Request(), root, 'sub').code == 404  # directory
+    assert static.serve(Request(), os.path.join(root, 'sub'), '../hello.txt').code == 404  # outside of root
+
+
+def test_conditional(root):
+    etag = static.serve(Request(), root, 'hello.txt').headers['ETag']
+    assert static.serve(Request(**{'if-none-match': etag}), root, 'hello.txt').code == 304
+    assert static.serve(Request(**{'if-none-match': '"other", %s' % etag}), root, 'hello.txt').code == 304
+    assert static.serve(Request(**{'if-none-match': '"other"'}), root, 'hello.txt').code == 200
+
+    later = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(time.time() + 60))
+    earlier = time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(time.time() - 3600))
+    assert static.serve(Request(**{'if-modified-since': later}), root, 'hello.txt').code == 304
+    assert static.serve(Request(**{'if-modified-since': earlier}), root, 'hello.txt').code == 200
+
+
+def test_range(root):
+    result = static.serve(Request(range='bytes=0-4'), root, 'hello.txt')
+    assert result.code == 206
+    assert str(result.content) == 'hello'
+    assert result.headers['Content-Range'] == 'bytes 0-4/11'
+
+    result = static.serve(Request(range='bytes=6-'), root, 'hello.txt')
+    assert str(result.content) == 'world'
+
+    result = static.serve(Request(range='bytes=-5'), root, 'hello.txt')
+    assert str(result.content) == 'world'
+
+    result = static.serve(Request(range='bytes=6-100'), root, 'hello.txt')
+    assert result.headers['Content-Range'] == 'bytes 6-10/11'
+
+    result = static.serve(Request(range='bytes=20-30'), root, 'hello.txt')
+    assert result.code == 416
+    assert result.headers['Content-Range'] == 'bytes */11'
+
+    result = static.serve(Request(range='bytes=-0'), root, 'hello.txt')
+    assert result.code == 416
+    assert result.headers['Content-Range'] == 'bytes */11'
+
+    result = static.serve(Request(range='bytes=0-1,3-4'), root, 'hello.txt')
+    assert result.code == 200  # multiple ranges not supported; send everything
+
+    result = static.serve(Request(range='bytes=0-4', **{'if-range': '"stale"'}), root, 'hello.txt')
+    assert result.code == 200
+
+
+def test_parse_range():
+    assert static._parse_range('bytes=-5', 11) == (6, 10)
+    assert static._parse_range('bytes=-20', 11) == (0, 10)
+    assert static._parse_range('bytes=x-5', 11) is None
+    with pytest.raises(ValueError):
+        static._parse_range('bytes=-0', 11)
+    with pytest.raises(ValueError):
+        static._parse_range('bytes=-5', 0)  # nothing to take a suffix of
+
+
+def test_large(root, monkeypatch):
+    monkeypatch.setattr(static.StaticFile, 'SMALL_FILE', 4)
+    monkeypatch.setattr(static.StaticFile, 'CHUNK_SIZE', 4)
+    result = static.serve(Request(), root, 'hello.txt', static.FileCache())
+    assert list(result.content) == ['hell', 'o wo', 'rld']
+
+    result = static.serve(Request(range='bytes=3-7'), root, 'hello.txt', static.FileCache())
+    assert result.code == 206
+    assert ''.join(result.content) == 'lo wo'
+
+
+def test_truncated(root, monkeypatch):
+    monkeypatch.setattr(static.StaticFile, 'SMALL_FILE', 4)
+    monkeypatch.setattr(static.StaticFile, 'CHUNK_SIZE', 4)
+    content = static.serve(Request(), root, 'hello.txt', static.FileCache()).content
+    assert next(content) == 'hell'
+    with open(os.path.join(root, 'hello.txt'), 'w') as out:
+        out.write('hi')  # truncated in place, while the response is in flight
+    with pytest.raises(IOError):
+        next(content)
+
+
+def test_cache(root):
+    cache = static.FileCache(size=1)
+    path = os.path.join(root, 'hello.txt')
+    f = cache.get(path)
+    assert cache.get(path) is f
+    cache.get(os.path.join(root, 'empty.txt'))
+    assert len(cache) == 1
+    assert cache.get(path) is not f  # evicted
+
+    f = cache.get(path)
+    with open(path, 'w') as out:
+        out.write('changed!')
+    os.utime(path, (time.time() + 10, time.time() + 10))
+    f2 = cache.get(path)
+    assert f2 is not f
+    assert str(f2.content) == 'changed!'
+
+
+def test_parser():
+    p = Parser.parse([
+        'SERVER test 12345',
+        'STATIC /assets/(.*)$ /var/www',
+        'ROUTE /foo$',
+        'GET a.b',
+        'STATIC /more/(.*)$ /var/more',
+    ])
+    routes = p.servers['test'].routes
+    assert routes[0].pattern == '/assets/(.*)$'
+    assert routes[0].root == '/var/www'
+    assert routes[1].methods['get'] == 'a.b'
+    assert routes[2].root == '/var/more'
+
+    with pytest.raises(Exception):
+        Parser.parse([
+            'SERVER test 12345',
+            'ROUTE /foo$',
+            'STATIC /assets/(.*)$ /var/www',
+            'GET a.b',
+        ])
+
+
+def test_loopback(root):
+    mapper = RESTMapper()
+    mapper.add_static('/assets/(.*)$', root)
+    c, = serve(Loop(network.Server()), mapper, PORT, [[('/assets/hello.txt', 'Range: bytes=6-\r\nConnection: close\r\n')]])
+    [(code, headers, content)] = responses(c)
+    assert c.response.startswith('HTTP/1.1 206 Partial Content')
+    assert headers['Content-Length'] == '5'
+    assert content == 'world'
@@ -0,0 +1,120 @@
+import threading
+import time
+
+import pytest
+
+import rhc.tcpsocket as network
+import rhc.timer as timer
+from rhc.loop import Loop
+from rhc.micro_fsm.parser import Parser
+from rhc.resthandler import RESTMapper
+from rhc.threadpool import PoolFull, ThreadPool, threaded
+
+from rest_client import responses, serve
+
+
+PORT = 12348
+
+
+class Result(object):
+
+    def __init__(self):
+        self.results = []
+
+    def __call__(self, rc, result):
+        self.results.append((rc, result, threading.current_thread().name))
+
+
+@pytest.fixture
+def loop():
+    return Loop(network.Server(), timer.Timer())
+
+
+@pytest.fixture
+def pool(loop):
+    p = ThreadPool(size=2, queue_depth=2, server=loop.server)
+    yield p
+    p.close()
+
+
+def test_run(loop, pool):
+    r = Result()
+    ticks = []
+    loop.call_later(.01, ticks.append, 1)
+    pool.run(r, time.sleep, .05)
+    pool.run(r, int, 'x')
+    loop.run(until=lambda: len(r.results) == 2)
+    assert ticks == [1]  # the loop kept running while the sleep blocked a worker
+    assert sorted(rc for rc, result, name in r.results) == [0, 1]
+    assert all(name == threading.current_thread().name for rc, result, name in r.results)
+    assert pool.completed == 2
+    assert pool.wait_count == 2
+    assert pool.active == 0
+
+
+def test_reject(loop, pool):
+    event = threading.Event()
+    r = Result()
+    try:
+        pool.run(r, event.wait)
+        pool.run(r, event.wait)
+        while pool.queued:  # wait until both workers are busy
+            time.sleep(.001)
+        pool.run(r, event.wait)
+        pool.run(r, event.wait)
+        with pytest.raises(PoolFull):
+            pool.run(r, event.wait)
+        assert pool.rejected == 1
+
+        pool.reject = False
+        pool.run(r, lambda: 'inline')
+        assert r.results == [(0, 'inline', threading.current_thread().name)]
+    finally:
+        event.set()
+    loop.run(until=lambda: len(r.results) == 5)
+    assert pool.wait_max > 0
+
+
+def test_server_close(loop, pool):
+    r = Result()
+    pool.run(r, lambda: 1)
+    loop.run(until=lambda: r.results)
+    loop.server.close()  # closes the wakeup registration, not the pipe
+    pool.run(r, lambda: 2)
+    loop.run(until=lambda: len(r.results) == 2)
+    assert [result for rc, result, name in r.results] == [1, 2]
+
+
+def test_rest(loop, pool):
+
+    @threaded(pool=pool)
+    def ok(request):
+        return threading.current_thread().name
+
+    @threaded(pool=pool)
+    def broken(request):
+        raise ValueError('bad')
+
+    mapper = RESTMapper()
+    mapper.add('/ok$', ok)
+    mapper.add('/broken$', broken)
+    clients = serve(loop, mapper, PORT, [[('/ok', 'Connection: close\r\n')], [('/broken', 'Connection: close\r\n')]])
+
+    [(code, headers, content)] = responses(clients[0])
+    assert clients[0].response.startswith('HTTP/1.1 200 OK')
+    assert content.startswith('rhc-pool-')
+    assert clients[1].response.startswith('HTTP/1.1 501')
+
+
+def test_parser():
+    p = Parser.parse([
+        'SERVER test 12345',
+        'ROUTE /foo$',
+        'GET a.b thread=true',
+        'PUT a.c',
+    ])
+    route = p.servers['test'].routes[0]
+    assert route.methods['get'] == 'a.b'
+    assert route.threaded == set(['get'])
+    assert p.config.threadpool.size == 4
+    assert p.config.threadpool.reject is True